@@ -0,0 +1,219 @@
+import sys
+import os
+import time
+import numpy as np
+from numba import njit
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from kalpana3d.math_core import vec3
+from kalpana3d import math_scalar as ms
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.render import (render_kernel, render_kernel_scalar, calc_normal_scalar, calc_normal_tetra,
+                              TRACE_DEFAULT, TRACE_ENHANCED)
+from kalpana3d.mesher import generate_mesh_cached
+from kalpana3d.math_core import mix
+from kalpana3d.noise import fbm, fbm_many
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import (tree_sdf, tree_params, tree_baked_sdf, tree_baked_sdf_grad, tree_baked_params,
+                              tree_volume_sdf, tree_volume_params)
+from final_demo import make_tree_sdf, make_tree_sdf_scalar
+
+def best_time(fn, repeats=3):
+    # Best wall time of several runs, the first call (compilation) excluded
+    fn()
+    best = 1e30
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_math_core(rc):
+    print("== math_core vs math_scalar (tree scene) ==")
+    sdf_array = make_tree_sdf(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    sdf_scalar = make_tree_sdf_scalar(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    
+    # Per ray
+    width, height = 160, 120
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    out_array = np.zeros((height, width, 3), dtype=np.float32)
+    out_scalar = np.zeros((height, width, 3), dtype=np.float32)
+    t_array = best_time(lambda: render_kernel(width, height, ro, lookat, 60.0, sdf_array, out_array))
+    t_scalar = best_time(lambda: render_kernel_scalar(width, height, ro, lookat, 60.0, sdf_scalar, out_scalar))
+    rays = width * height
+    print(f"render  vec3:    {t_array / rays * 1e6:8.2f} us/ray")
+    print(f"render  scalar:  {t_scalar / rays * 1e6:8.2f} us/ray  ({t_array / t_scalar:.2f}x)")
+    print(f"        max pixel difference: {np.abs(out_array - out_scalar).max():.2e}")
+    
+    # Per cell
+    min_bound = vec3(-2.0, -0.5, -2.0)
+    max_bound = vec3(2.0, 3.5, 2.0)
+    res = 48
+    resolution = vec3(res, res, res)
+    t_array = best_time(lambda: generate_mesh_cached(min_bound, max_bound, resolution, sdf_array, 0.0))
+    t_scalar = best_time(lambda: generate_mesh_cached(min_bound, max_bound, resolution, sdf_scalar, 0.0))
+    cells = res ** 3
+    print(f"mesh    vec3:    {t_array / cells * 1e6:8.2f} us/cell")
+    print(f"mesh    scalar:  {t_scalar / cells * 1e6:8.2f} us/cell  ({t_array / t_scalar:.2f}x)")
+
+@njit(fastmath=True)
+def eval_points(sdf_func, points, params, out):
+    for i in range(points.shape[0]):
+        out[i] = sdf_func(points[i], params)
+
+def bench_bake(scene):
+    print("== baked primitive constants (tree scene) ==")
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2.0, 3.0, (100000, 3)).astype(np.float32)
+    out_plain = np.empty(len(points))
+    out_baked = np.empty(len(points))
+    params = tree_params(scene)
+    baked = tree_baked_params(scene)
+    t_plain = best_time(lambda: eval_points(tree_sdf, points, params, out_plain))
+    t_baked = best_time(lambda: eval_points(tree_baked_sdf, points, baked, out_baked))
+    n = len(points)
+    print(f"sdf     plain:   {t_plain / n * 1e9:8.1f} ns/sample")
+    print(f"sdf     baked:   {t_baked / n * 1e9:8.1f} ns/sample  ({t_plain / t_baked:.2f}x)")
+    print(f"        max difference: {np.abs(out_plain - out_baked).max():.2e}")
+
+@njit(fastmath=True)
+def eval_normals(points, params, mode, out):
+    # Normals of tree_baked_sdf: 0 central, 1 tetrahedral, 2 gradient
+    for i in range(points.shape[0]):
+        p = (points[i, 0], points[i, 1], points[i, 2])
+        if mode == 0:
+            n = calc_normal_scalar(p, tree_baked_sdf, params)
+        elif mode == 1:
+            n = calc_normal_tetra(p, tree_baked_sdf, params)
+        else:
+            n = ms.normalize(tree_baked_sdf_grad(p, params)[1])
+        out[i, 0] = n[0]
+        out[i, 1] = n[1]
+        out[i, 2] = n[2]
+
+def bench_normals(scene):
+    print("== normals (tree scene) ==")
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2.0, 3.0, (100000, 3)).astype(np.float32)
+    params = tree_baked_params(scene)
+    out = [np.empty((len(points), 3)) for _ in range(3)]
+    times = [best_time(lambda: eval_normals(points, params, mode, out[mode])) for mode in range(3)]
+    n = len(points)
+    print(f"normal  central: {times[0] / n * 1e9:8.1f} ns/sample")
+    print(f"normal  tetra:   {times[1] / n * 1e9:8.1f} ns/sample  ({times[0] / times[1]:.2f}x)")
+    print(f"normal  grad:    {times[2] / n * 1e9:8.1f} ns/sample  ({times[0] / times[2]:.2f}x)")
+    print(f"        max difference: {np.abs(out[2] - out[0]).max():.2e}")
+
+# Reference noise: the previous sin-based lattice hash, for bench_noise
+
+@njit(fastmath=True)
+def hash3_sin(x, y, z):
+    h = np.float32(x * np.float32(12.9898) + y * np.float32(78.233) + z * np.float32(45.164))
+    val = np.sin(h) * 43758.5453123
+    return val - np.floor(val)
+
+@njit(fastmath=True)
+def noise3_sin(x, y, z):
+    ix = np.floor(x)
+    iy = np.floor(y)
+    iz = np.floor(z)
+    fx = x - ix
+    fy = y - iy
+    fz = z - iz
+    ux = fx * fx * (3.0 - 2.0 * fx)
+    uy = fy * fy * (3.0 - 2.0 * fy)
+    uz = fz * fz * (3.0 - 2.0 * fz)
+    return mix(mix(mix(hash3_sin(ix, iy, iz), hash3_sin(ix + 1.0, iy, iz), ux),
+                   mix(hash3_sin(ix, iy + 1.0, iz), hash3_sin(ix + 1.0, iy + 1.0, iz), ux), uy),
+               mix(mix(hash3_sin(ix, iy, iz + 1.0), hash3_sin(ix + 1.0, iy, iz + 1.0), ux),
+                   mix(hash3_sin(ix, iy + 1.0, iz + 1.0), hash3_sin(ix + 1.0, iy + 1.0, iz + 1.0), ux), uy), uz)
+
+@njit(fastmath=True)
+def fbm_sin_points(points, octaves, out):
+    for i in range(points.shape[0]):
+        v = 0.0
+        a = 0.5
+        x = float(points[i, 0])
+        y = float(points[i, 1])
+        z = float(points[i, 2])
+        for _ in range(octaves):
+            v += a * noise3_sin(x, y, z)
+            x = x * 2.0 + 100.0
+            y = y * 2.0 + 100.0
+            z = z * 2.0 + 100.0
+            a *= 0.5
+        out[i] = v
+
+@njit(fastmath=True)
+def fbm_points(points, octaves, out):
+    for i in range(points.shape[0]):
+        out[i] = fbm(points[i], octaves)
+
+def bench_noise(scene):
+    print("== fbm, 3 octaves ==")
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-8.0, 8.0, (200000, 3))
+    out_sin = np.empty(len(points))
+    out = np.empty(len(points))
+    t_sin = best_time(lambda: fbm_sin_points(points, 3, out_sin))
+    t_int = best_time(lambda: fbm_points(points, 3, out))
+    t_many = best_time(lambda: fbm_many(points, 3, out))
+    n = len(points)
+    print(f"fbm     sin hash:  {t_sin / n * 1e9:8.1f} ns/sample")
+    print(f"fbm     int hash:  {t_int / n * 1e9:8.1f} ns/sample  ({t_sin / t_int:.2f}x)")
+    print(f"fbm_many:          {t_many / n * 1e9:8.1f} ns/sample  ({t_sin / t_many:.2f}x)")
+    
+    points = rng.uniform(-2.0, 3.0, (100000, 3)).astype(np.float32)
+    out = np.empty(len(points))
+    t_sdf = best_time(lambda: eval_points(tree_baked_sdf, points, tree_baked_params(scene), out))
+    t_volume = best_time(lambda: eval_points(tree_volume_sdf, points, tree_volume_params(scene), out))
+    print(f"sdf     fbm bark:    {t_sdf / len(points) * 1e9:7.1f} ns/sample")
+    print(f"sdf     volume bark: {t_volume / len(points) * 1e9:7.1f} ns/sample  ({t_sdf / t_volume:.2f}x)")
+
+# Reference bark: fbm added straight to the distance, for bench_displacement
+
+def make_plain_bark_sdf(rc_a, rc_b, rc_r1, rc_r2, count):
+    @njit(fastmath=True)
+    def tree_sdf(p):
+        p_twisted = sdfs.opTwist(p, 0.5)
+        d = 1000.0
+        for i in range(count):
+            d_branch = sdfs.sdRoundCone(p_twisted, rc_a[i], rc_b[i], rc_r1[i], rc_r2[i])
+            if i == 0:
+                d = d_branch
+            else:
+                d = sdfs.opSmoothUnion(d, d_branch, 0.2)
+        return d + fbm(ms.scale(p_twisted, 4.0), 3) * 0.02
+    return tree_sdf
+
+def bench_displacement(rc):
+    print("== bark displacement (render) ==")
+    sdf_sum = make_plain_bark_sdf(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    sdf_bounded = make_tree_sdf_scalar(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    width, height = 320, 240
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    rays = width * height
+    out = np.zeros((height, width, 3), dtype=np.float32)
+    steps = np.zeros((height, width), dtype=np.int32)
+    for name, trace in (("plain", TRACE_DEFAULT), ("enhanced", TRACE_ENHANCED)):
+        t_sum = best_time(lambda: render_kernel_scalar(width, height, ro, lookat, 60.0, sdf_sum, out, trace, steps))
+        steps_sum = steps.mean()
+        t_bounded = best_time(lambda: render_kernel_scalar(width, height, ro, lookat, 60.0, sdf_bounded, out, trace, steps))
+        print(f"{name:8s} sum:     {t_sum / rays * 1e6:8.2f} us/ray, {steps_sum:.2f} steps")
+        print(f"{name:8s} bounded: {t_bounded / rays * 1e6:8.2f} us/ray, {steps.mean():.2f} steps  ({t_sum / t_bounded:.2f}x)")
+
+def main():
+    yaml_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples/tree.yaml')
+    scene = load_scene(yaml_path)
+    rc = scene['round_cones']
+    bench_math_core(rc)
+    bench_bake(scene)
+    bench_normals(scene)
+    bench_noise(scene)
+    bench_displacement(rc)
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from kalpana3d.math_core import vec3
 from kalpana3d.sdf import sdRoundCone, opUnion, opSmoothUnion, opTwist
-from kalpana3d.noise import fbm
-from kalpana3d.render import render_image
-from kalpana3d.mesher import generate_mesh, compute_mesh_counts
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.noise import fbm_displace
+from kalpana3d.render import render_views
+from kalpana3d.mesher import generate_mesh_sparse
 from kalpana3d.export import export_obj
 from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params, warmup
 
 def make_tree_sdf(rc_a, rc_b, rc_r1, rc_r2, count):
     # We capture the arrays. Numba should handle this if we call njit inside or return a jitted function.
@@ -49,10 +51,28 @@ def make_tree_sdf(rc_a, rc_b, rc_r1, rc_r2, count):
         # Bark detail
         # Apply noise to the final distance field
         # Use p_twisted for noise consistency
-        n = fbm(p_twisted * 4.0, 3)
-        d += n * 0.02 # Small displacement
+        return fbm_displace(d, p_twisted, 4.0, 3, 0.02)
         
-        return d
+    return tree_sdf
+
+def make_tree_sdf_scalar(rc_a, rc_b, rc_r1, rc_r2, count):
+    # Same tree built on kalpana3d.sdf_scalar: points are triples and no
+    # temporaries are allocated per evaluation
+    
+    @njit(fastmath=True)
+    def tree_sdf(p):
+        p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+        
+        d = 1000.0
+        for i in range(count):
+            d_branch = sdfs.sdRoundCone(p_twisted, rc_a[i], rc_b[i], rc_r1[i], rc_r2[i])
+            if i == 0:
+                d = d_branch
+            else:
+                d = sdfs.opSmoothUnion(d, d_branch, 0.2)
+                
+        # Bark detail
+        return fbm_displace(d, p_twisted, 4.0, 3, 0.02)
         
     return tree_sdf
 
@@ -66,27 +86,25 @@ def main():
         print("No round cones found in tree.yaml!")
         return
         
-    # Create SDF
-    print("Compiling SDF...")
-    sdf_func = make_tree_sdf(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    # The tree SDF takes the scene arrays as params, so its kernels are
+    # compiled once and loaded from the disk cache on later runs
+    print("Compiling SDF (cached)...")
+    start_time = time.time()
+    params = tree_baked_params(scene)
+    warmup(tree_baked_sdf, params)
+    print(f"Warmup took {time.time() - start_time:.2f} seconds.")
     
-    # 1. Render Full View
+    # 1. Render Full View and 2. Detail View, in one launch
     width = 800
     height = 600
-    ro = vec3(0.0, 1.5, 4.0)
-    lookat = vec3(0.0, 1.5, 0.0)
     fov = 60.0
-    
-    img_path_full = 'gallery/images/final_tree_full.png'
-    print("Rendering Full View...")
-    render_image(width, height, ro, lookat, fov, sdf_func, img_path_full)
-    
-    # 2. Render Detail View
-    ro_detail = vec3(0.5, 1.0, 1.0)
-    lookat_detail = vec3(0.0, 1.0, 0.0)
-    img_path_detail = 'gallery/images/final_tree_detail.png'
-    print("Rendering Detail View...")
-    render_image(width, height, ro_detail, lookat_detail, fov, sdf_func, img_path_detail)
+    cameras = [
+        (vec3(0.0, 1.5, 4.0), vec3(0.0, 1.5, 0.0)),
+        (vec3(0.5, 1.0, 1.0), vec3(0.0, 1.0, 0.0)),
+    ]
+    img_paths = ['gallery/images/final_tree_full.png', 'gallery/images/final_tree_detail.png']
+    print("Rendering Full and Detail Views...")
+    render_views(cameras, width, height, fov, tree_baked_sdf, img_paths, sdf_params=params)
     
     # 3. Export Mesh
     print("Generating Mesh...")
@@ -96,16 +114,17 @@ def main():
     iso_level = 0.0
     
     start_time = time.time()
-    count = compute_mesh_counts(min_bound, max_bound, resolution, sdf_func, iso_level)
-    print(f"Counted {count} triangles.")
+    # Only blocks near the bark are sampled; margin covers the fbm displacement
+    vertices, faces = generate_mesh_sparse(min_bound, max_bound, resolution, tree_baked_sdf, iso_level, margin=0.05, sdf_params=params)
+    count = len(faces)
+    print(f"Generated {count} triangles, {len(vertices)} vertices.")
     
     if count > 0:
-        vertices = generate_mesh(min_bound, max_bound, resolution, sdf_func, iso_level, count)
         end_time = time.time()
         print(f"Meshing took {end_time - start_time:.2f} seconds.")
         
         obj_path = 'gallery/models/final_tree.obj'
-        export_obj(vertices, obj_path)
+        export_obj(vertices, obj_path, faces)
     else:
         print("No triangles to export.")
 
@@ -0,0 +1,171 @@
+import numpy as np
+from numba import njit
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d import math_scalar as ms
+from kalpana3d.tape import (eval_primitive, scene_primitives, assemble, FAR,
+                            OP_SPHERE, OP_BOX, OP_CAPSULE, OP_ROUND_CONE, OP_TORUS)
+
+# Bounding volume hierarchy over scene primitives
+# Nodes are stored depth first, so the first child of an inner node is the next
+# node and node_skip holds the node following its subtree (for a first child,
+# its sibling). Traversal is a single loop without a stack: it descends into
+# the nearer child, recording in one bit per depth of a 64-bit trail which
+# child that was, and climbs back through node_parent to take the other child
+# once a subtree is done, so the tree is at most MAX_DEPTH deep. Node boxes are
+# padded by the smooth-union k: a primitive at least k farther than the current
+# distance leaves a smooth union unchanged, so every subtree whose padded box is
+# farther than the current distance is skipped (a box containing q is always
+# visited, its primitives may be overlapping).
+# The BVH is a params tuple, see bvh_sdf:
+# (node_min, node_max, node_skip, node_parent, node_first, node_count, code, consts, k)
+# where code/consts hold the primitives in leaf order, laid out as a tape.
+
+# Inner node levels a traversal trail can record
+MAX_DEPTH = 62
+
+def primitive_bounds(op, operands):
+    # Axis-aligned box (lo, hi) enclosing a primitive
+    v = np.asarray(operands, dtype=np.float64)
+    if op == OP_SPHERE:
+        return v[0:3] - v[3], v[0:3] + v[3]
+    if op == OP_BOX:
+        return v[0:3] - v[3:6], v[0:3] + v[3:6]
+    if op == OP_CAPSULE:
+        return np.minimum(v[0:3], v[3:6]) - v[6], np.maximum(v[0:3], v[3:6]) + v[6]
+    if op == OP_ROUND_CONE:
+        lo = np.minimum(v[0:3] - v[6], v[3:6] - v[7])
+        hi = np.maximum(v[0:3] + v[6], v[3:6] + v[7])
+        return lo, hi
+    if op == OP_TORUS:
+        r = v[3] + v[4]
+        ext = np.array([r, v[4], r])
+        return v[0:3] - ext, v[0:3] + ext
+    raise ValueError(f"Opcode {op} is not a primitive")
+
+def build_bvh(primitives, smooth=0.0, leaf_size=4):
+    """
+    Builds a BVH over (opcode, operands) primitives, as listed by
+    tape.scene_primitives. smooth is the smooth-union k joining them
+    (0 for a plain union). Returns the params tuple for bvh_sdf.
+    """
+    n = len(primitives)
+    lo = np.empty((n, 3))
+    hi = np.empty((n, 3))
+    for i, (op, operands) in enumerate(primitives):
+        lo[i], hi[i] = primitive_bounds(op, operands)
+    lo -= smooth
+    hi += smooth
+    centers = 0.5 * (lo + hi)
+
+    node_min = []
+    node_max = []
+    node_skip = []
+    node_parent = []
+    node_first = []
+    node_count = []
+    order = []
+
+    def build(idx, parent, depth):
+        node = len(node_min)
+        node_min.append(lo[idx].min(axis=0))
+        node_max.append(hi[idx].max(axis=0))
+        node_skip.append(-1)
+        node_parent.append(parent)
+        if len(idx) <= leaf_size:
+            node_first.append(len(order))
+            node_count.append(len(idx))
+            order.extend(idx)
+        else:
+            if depth >= MAX_DEPTH:
+                raise ValueError(f"BVH deeper than {MAX_DEPTH} levels")
+            node_first.append(0)
+            node_count.append(0)
+            # Median split along the widest axis of the primitive centers
+            c = centers[idx]
+            axis = np.argmax(c.max(axis=0) - c.min(axis=0))
+            idx = idx[np.argsort(c[:, axis], kind='stable')]
+            half = len(idx) // 2
+            build(idx[:half], node, depth + 1)
+            build(idx[half:], node, depth + 1)
+        node_skip[node] = len(node_min)
+
+    if n > 0:
+        build(np.arange(n), -1, 0)
+
+    code, consts = assemble([primitives[i] for i in order])
+    return (np.array(node_min, dtype=np.float32).reshape(-1, 3),
+            np.array(node_max, dtype=np.float32).reshape(-1, 3),
+            np.array(node_skip, dtype=np.int32),
+            np.array(node_parent, dtype=np.int32),
+            np.array(node_first, dtype=np.int32),
+            np.array(node_count, dtype=np.int32),
+            code, consts, float(smooth))
+
+def build_scene_bvh(scene, smooth=0.0, leaf_size=4):
+    """
+    build_bvh over every primitive of a load_scene result.
+    """
+    return build_bvh(scene_primitives(scene), smooth, leaf_size)
+
+@njit(fastmath=True)
+def box_distance(q, lo, hi):
+    # Distance from q to the box [lo, hi], 0 inside
+    dx = max(lo[0] - q[0], 0.0, q[0] - hi[0])
+    dy = max(lo[1] - q[1], 0.0, q[1] - hi[1])
+    dz = max(lo[2] - q[2], 0.0, q[2] - hi[2])
+    return np.sqrt(dx*dx + dy*dy + dz*dz)
+
+@njit(fastmath=True)
+def bvh_distance(q, bvh):
+    # Union (smooth union when k > 0) of the primitives that can reach q.
+    # Nearer children are visited first, so d shrinks early and culls more.
+    node_min, node_max, node_skip, node_parent, node_first, node_count, code, consts, k = bvh
+    d = FAR
+    if node_skip.shape[0] == 0:
+        return d
+    i = 0
+    trail = 0
+    depth = 0
+    bd = box_distance(q, node_min[0], node_max[0])
+    while True:
+        # Only q outside a box bounds the distance of what it holds
+        if bd <= 0.0 or bd < d:
+            n = node_count[i]
+            if n == 0:
+                # Into the nearer child, bit depth of the trail set when it is the right one
+                left = i + 1
+                right = node_skip[left]
+                bl = box_distance(q, node_min[left], node_max[left])
+                br = box_distance(q, node_min[right], node_max[right])
+                bit = 1 if br < bl else 0
+                trail = (trail & ~(1 << depth)) | (bit << depth)
+                depth += 1
+                i = right if bit else left
+                bd = br if bit else bl
+                continue
+            first = node_first[i]
+            for j in range(first, first + n):
+                dp = eval_primitive(code[j, 0], q, consts, code[j, 1])
+                if k > 0.0:
+                    d = sdfs.opSmoothUnion(d, dp, k)
+                else:
+                    d = sdfs.opUnion(d, dp)
+        # Subtree i is done: a near child is followed by its sibling, a far
+        # child completes its parent
+        while i != 0:
+            depth -= 1
+            bit = (trail >> depth) & 1
+            left = node_parent[i] + 1
+            if (i == left) != (bit == 1):
+                i = node_skip[left] if bit == 0 else left
+                depth += 1
+                break
+            i = node_parent[i]
+        if i == 0:
+            return d
+        bd = box_distance(q, node_min[i], node_max[i])
+
+@njit(fastmath=True)
+def bvh_sdf(p, bvh):
+    # Scene SDF form (see kalpana3d.scenes), params = build_bvh result
+    return bvh_distance(ms.v3(p[0], p[1], p[2]), bvh)
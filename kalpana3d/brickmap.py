@@ -0,0 +1,194 @@
+import os
+import numpy as np
+from numba import njit, prange
+from kalpana3d.kernel_cache import call_sdf, scene_kernels
+
+# Brick maps
+# An expensive SDF is baked once into a sparse volume and looked up instead of
+# evaluated. The baked box is split into bricks of brick^3 cells. Every brick
+# gets the SDF value at its center (coarse); only bricks the surface can cross
+# (|center value| within the half diagonal plus margin, the culling test of
+# mesher.sample_grid_sparse) also store their (brick + 1)^3 lattice samples, so
+# neighbouring bricks share their faces and the trilinear lookup is continuous
+# across them. Samples are 16-bit fixed point: a Lipschitz-1 SDF stays within
+# twice the half diagonal plus margin in a stored brick, which sets the scale.
+# Elsewhere the lookup returns the center value moved toward zero by the
+# distance to the center (and the margin), a conservative distance with the
+# right sign.
+# The brick map is a params tuple, see brickmap_sdf:
+# (origin, step, brick, scale, coarse, index, bricks)
+# with index[bx, by, bz] the row of a brick in bricks, -1 when not stored.
+
+QUANT_MAX = 32767
+
+@njit(fastmath=True, inline='always')
+def brick_center_value(origin, step, brick, b, dims, sdf_func, coarse, params=None):
+    # SDF value at the center of brick b (flat index into dims)
+    bx = b // (dims[1] * dims[2])
+    by = (b // dims[2]) % dims[1]
+    bz = b % dims[2]
+    p = np.empty(3, dtype=np.float32)
+    p[0] = origin[0] + (bx + 0.5) * brick * step[0]
+    p[1] = origin[1] + (by + 0.5) * brick * step[1]
+    p[2] = origin[2] + (bz + 0.5) * brick * step[2]
+    coarse[bx, by, bz] = call_sdf(sdf_func, p, params)
+
+@njit(fastmath=True, inline='always')
+def sample_brick(origin, step, brick, block, inv_scale, sdf_func, out, params=None):
+    # Quantized lattice samples of the brick at block (bx, by, bz) into out
+    p = np.empty(3, dtype=np.float32)
+    for i in range(brick + 1):
+        p[0] = origin[0] + (block[0] * brick + i) * step[0]
+        for j in range(brick + 1):
+            p[1] = origin[1] + (block[1] * brick + j) * step[1]
+            for k in range(brick + 1):
+                p[2] = origin[2] + (block[2] * brick + k) * step[2]
+                q = call_sdf(sdf_func, p, params) * inv_scale
+                out[i, j, k] = np.int16(round(min(max(q, -QUANT_MAX), QUANT_MAX)))
+
+@njit(fastmath=True, parallel=True)
+def sample_brick_centers(origin, step, brick, sdf_func, coarse):
+    dims = coarse.shape
+    for b in prange(dims[0] * dims[1] * dims[2]):
+        brick_center_value(origin, step, brick, b, dims, sdf_func, coarse)
+
+@njit(fastmath=True, parallel=True)
+def sample_bricks(origin, step, brick, blocks, inv_scale, sdf_func, bricks):
+    for i in prange(blocks.shape[0]):
+        sample_brick(origin, step, brick, blocks[i], inv_scale, sdf_func, bricks[i])
+
+def bake_brickmap(min_bound, max_bound, resolution, sdf_func, brick=8, margin=0.0, sdf_params=None):
+    """
+    Bakes sdf_func over the box at the given lattice resolution (cells per axis,
+    rounded up to whole bricks) into a brick map for brickmap_sdf. The box must
+    enclose the surface. margin widens the band of stored bricks for SDFs that
+    are not 1-Lipschitz. sdf_params takes a scene SDF sdf_func(p, sdf_params)
+    with disk-cached kernels. Bricks are sampled in parallel.
+    """
+    origin = np.asarray(min_bound, dtype=np.float32)
+    step = ((np.asarray(max_bound, dtype=np.float32) - origin) / np.asarray(resolution, dtype=np.float32)).astype(np.float32)
+    dims = tuple(-(-int(r) // brick) for r in resolution)
+    sdf_arg = sdf_func
+    centers = sample_brick_centers
+    sample = sample_bricks
+    if sdf_params is not None:
+        kernels = scene_kernels(sdf_func)
+        sdf_arg = sdf_params
+        centers = kernels.bake_brick_centers
+        sample = kernels.bake_bricks
+
+    coarse = np.empty(dims, dtype=np.float32)
+    centers(origin, step, brick, sdf_arg, coarse)
+
+    half_diag = 0.5 * brick * float(np.linalg.norm(step))
+    keep = np.abs(coarse) <= half_diag + margin
+    index = np.full(dims, -1, dtype=np.int32)
+    index[keep] = np.arange(np.count_nonzero(keep), dtype=np.int32)
+    # The margin also pads the coarse distances, which then stay conservative
+    # for an SDF that is off by up to margin within a brick
+    coarse -= np.copysign(np.float32(margin), coarse)
+    blocks = np.argwhere(keep).astype(np.int64)
+
+    scale = (2.0 * half_diag + margin) / QUANT_MAX
+    bricks = np.empty((len(blocks), brick + 1, brick + 1, brick + 1), dtype=np.int16)
+    sample(origin, step, brick, blocks, 1.0 / scale, sdf_arg, bricks)
+    return (origin, step, int(brick), float(scale), coarse, index, bricks)
+
+@njit(fastmath=True)
+def brickmap_sdf(p, bmap):
+    # Scene SDF form (see kalpana3d.scenes), params = bake_brickmap result
+    origin, step, brick, scale, coarse, index, bricks = bmap
+    nbx, nby, nbz = index.shape
+
+    # Lattice coordinates of p clamped into the box, and the distance to it
+    x = (p[0] - origin[0]) / step[0]
+    y = (p[1] - origin[1]) / step[1]
+    z = (p[2] - origin[2]) / step[2]
+    cx = min(max(x, 0.0), nbx * brick)
+    cy = min(max(y, 0.0), nby * brick)
+    cz = min(max(z, 0.0), nbz * brick)
+    ox = (x - cx) * step[0]
+    oy = (y - cy) * step[1]
+    oz = (z - cz) * step[2]
+    outside = np.sqrt(ox*ox + oy*oy + oz*oz)
+
+    # Brick of the point; a float multiply, integer division is slow here
+    inv_brick = 1.0 / brick
+    bx = min(int(cx * inv_brick), nbx - 1)
+    by = min(int(cy * inv_brick), nby - 1)
+    bz = min(int(cz * inv_brick), nbz - 1)
+    i = index[bx, by, bz]
+    if i < 0:
+        # Coarse brick: the center value, less the distance from the center
+        rx = (cx - (bx + 0.5) * brick) * step[0]
+        ry = (cy - (by + 0.5) * brick) * step[1]
+        rz = (cz - (bz + 0.5) * brick) * step[2]
+        r = np.sqrt(rx*rx + ry*ry + rz*rz)
+        dc = coarse[bx, by, bz]
+        d = dc - np.copysign(r, dc)
+    else:
+        fx = cx - bx * brick
+        fy = cy - by * brick
+        fz = cz - bz * brick
+        i0 = min(int(fx), brick - 1)
+        j0 = min(int(fy), brick - 1)
+        k0 = min(int(fz), brick - 1)
+        tx = fx - i0
+        ty = fy - j0
+        tz = fz - k0
+        # Along z first, the contiguous axis
+        c00 = bricks[i, i0, j0, k0] + (bricks[i, i0, j0, k0 + 1] - float(bricks[i, i0, j0, k0])) * tz
+        c01 = bricks[i, i0, j0 + 1, k0] + (bricks[i, i0, j0 + 1, k0 + 1] - float(bricks[i, i0, j0 + 1, k0])) * tz
+        c10 = bricks[i, i0 + 1, j0, k0] + (bricks[i, i0 + 1, j0, k0 + 1] - float(bricks[i, i0 + 1, j0, k0])) * tz
+        c11 = bricks[i, i0 + 1, j0 + 1, k0] + (bricks[i, i0 + 1, j0 + 1, k0 + 1] - float(bricks[i, i0 + 1, j0 + 1, k0])) * tz
+        c0 = c00 + (c01 - c00) * ty
+        c1 = c10 + (c11 - c10) * ty
+        d = (c0 + (c1 - c0) * tx) * scale
+
+    # Outside the box the surface is at least as far as the box
+    if outside > 0.0:
+        return max(outside, d - outside)
+    return d
+
+def make_brickmap_sdf(bmap):
+    """
+    Returns brickmap_sdf over bmap as a jitted sdf_func(p), for the kernels that
+    take a plain SDF (render_kernel, compute_mesh_counts, generate_mesh...).
+    Numba bakes the captured arrays into the compiled function as constants:
+    every map compiles its own kernel holding a copy of its bricks, and a
+    memory-mapped map (load_brickmap) is read in full. For large or mapped
+    maps pass brickmap_sdf with the map as sdf_params instead.
+    """
+    origin, step, brick, scale, coarse, index, bricks = bmap
+
+    @njit(fastmath=True)
+    def sdf_func(p):
+        return brickmap_sdf(p, (origin, step, brick, scale, coarse, index, bricks))
+    return sdf_func
+
+BRICKMAP_FILES = ('coarse', 'index', 'bricks')
+
+def save_brickmap(path, bmap):
+    """
+    Saves a brick map to the directory path, one .npy file per array.
+    """
+    origin, step, brick, scale, coarse, index, bricks = bmap
+    os.makedirs(path, exist_ok=True)
+    header = np.concatenate([origin, step, [brick, scale]]).astype(np.float64)
+    for name, array in zip(('header',) + BRICKMAP_FILES, (header, coarse, index, bricks)):
+        # Write then rename, so a concurrent load never sees a partial file
+        tmp_path = os.path.join(path, f"{name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(path, name + '.npy'))
+
+def load_brickmap(path, mmap=True):
+    """
+    Loads a brick map saved by save_brickmap. With mmap the bricks are
+    memory-mapped read-only, so only the bricks a lookup touches are read.
+    """
+    header = np.load(os.path.join(path, 'header.npy'))
+    coarse, index, bricks = (np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap and name == 'bricks' else None)
+                             for name in BRICKMAP_FILES)
+    return (header[0:3].astype(np.float32), header[3:6].astype(np.float32), int(header[6]), float(header[7]),
+            coarse, index, bricks)
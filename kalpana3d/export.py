@@ -1,24 +1,114 @@
+import os
 import numpy as np
+from kalpana3d.mesh_file import STL_DTYPE, PLY_FACE_DTYPE, ply_header, soup_faces
 
-def export_obj(vertices, filename):
+# Rows formatted per string operation when writing text formats
+BLOCK_ROWS = 65536
+
+def write_rows(f, line_fmt, rows):
+    # Format a 2D array with one line_fmt per row, a block of rows per % operation
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        f.write((line_fmt * len(block)) % tuple(block.ravel().tolist()))
+
+def export_obj(vertices, filename, faces=None):
     """
     Exports a list of vertices to an OBJ file.
     vertices: np.array of shape (N, 3)
+    faces: optional np.array of shape (M, 3) with 0-based vertex indices.
+           If omitted, every 3 consecutive vertices form a triangle.
     """
+    if faces is None:
+        faces = soup_faces(len(vertices))
+    num_triangles = len(faces)
+
     with open(filename, 'w') as f:
         f.write("# Kalpana3D OBJ Export\n")
         f.write(f"# Vertices: {len(vertices)}\n")
-        
-        # Write vertices
-        for v in vertices:
-            f.write(f"v {v[0]:.6f} {v[1]:.6f} {v[2]:.6f}\n")
-            
-        # Write faces
-        # Since we are exporting raw triangles (unindexed), every 3 vertices form a face
-        num_triangles = len(vertices) // 3
-        for i in range(num_triangles):
-            # OBJ indices are 1-based
-            idx = i * 3 + 1
-            f.write(f"f {idx} {idx+1} {idx+2}\n")
-            
+
+        write_rows(f, "v %.6f %.6f %.6f\n", np.asarray(vertices, dtype=np.float32))
+        # OBJ indices are 1-based
+        write_rows(f, "f %d %d %d\n", np.asarray(faces, dtype=np.int64) + 1)
+
     print(f"Exported {filename} ({num_triangles} triangles)")
+
+def export_ply(vertices, filename, faces=None):
+    """
+    Exports a binary little-endian PLY file.
+    vertices: np.array of shape (N, 3)
+    faces: optional np.array of shape (M, 3) with 0-based vertex indices.
+           If omitted, every 3 consecutive vertices form a triangle.
+    """
+    if faces is None:
+        faces = soup_faces(len(vertices))
+
+    face_data = np.empty(len(faces), dtype=PLY_FACE_DTYPE)
+    face_data['n'] = 3
+    face_data['idx'] = faces
+
+    with open(filename, 'wb') as f:
+        f.write(ply_header(len(vertices), len(faces)))
+        np.ascontiguousarray(vertices, dtype='<f4').tofile(f)
+        face_data.tofile(f)
+
+    print(f"Exported {filename} ({len(faces)} triangles)")
+
+def export_stl(vertices, filename, faces=None):
+    """
+    Exports a binary STL file.
+    vertices: np.array of shape (N, 3)
+    faces: optional np.array of shape (M, 3) with 0-based vertex indices.
+           If omitted, every 3 consecutive vertices form a triangle.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    tris = vertices.reshape(-1, 3, 3) if faces is None else vertices[faces]
+
+    # Facet normals
+    n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    l = np.linalg.norm(n, axis=1, keepdims=True)
+    n = np.divide(n, l, out=np.zeros_like(n), where=l > 1e-12)
+
+    records = np.zeros(len(tris), dtype=STL_DTYPE)
+    records['normal'] = n
+    records['v'] = tris
+
+    with open(filename, 'wb') as f:
+        f.write(b"Kalpana3D STL Export".ljust(80, b"\0"))
+        np.array([len(tris)], dtype='<u4').tofile(f)
+        records.tofile(f)
+
+    print(f"Exported {filename} ({len(tris)} triangles)")
+
+def export_mesh(vertices, filename, faces=None):
+    """
+    Exports a mesh, choosing the format from the file extension (.obj, .ply, .stl).
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.obj':
+        export_obj(vertices, filename, faces)
+    elif ext == '.ply':
+        export_ply(vertices, filename, faces)
+    elif ext == '.stl':
+        export_stl(vertices, filename, faces)
+    else:
+        raise ValueError(f"Unsupported mesh format: {ext}")
+
+def export_obj_stream(chunks, filename):
+    """
+    Streams (vertices, faces) chunks to an OBJ file as they arrive.
+    faces hold global 0-based indices into all vertices written so far,
+    as produced by mesher.iter_mesh_bricks.
+    """
+    num_vertices = 0
+    num_triangles = 0
+    with open(filename, 'w') as f:
+        f.write("# Kalpana3D OBJ Export (streamed)\n")
+
+        for vertices, faces in chunks:
+            write_rows(f, "v %.6f %.6f %.6f\n", np.asarray(vertices, dtype=np.float32))
+            # OBJ indices are 1-based
+            write_rows(f, "f %d %d %d\n", np.asarray(faces, dtype=np.int64) + 1)
+            num_vertices += len(vertices)
+            num_triangles += len(faces)
+
+    print(f"Exported {filename} ({num_triangles} triangles, {num_vertices} vertices)")
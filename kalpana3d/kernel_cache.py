@@ -0,0 +1,171 @@
+import os
+import sys
+import hashlib
+import inspect
+import importlib.util
+import numba
+from numba import types
+from numba.extending import overload
+
+# Persistent compile cache for scene SDFs
+# Numba cannot cache a kernel that takes a jitted function as an argument, and
+# closures capturing scene arrays are new functions on every run. A cacheable
+# scene SDF is instead a module-level function sdf_func(p, params), where params
+# holds the scene data as arrays (see kalpana3d.scenes). For each such function
+# a small module is generated whose parallel drivers call sdf_func as a global
+# and are compiled with cache=True, so later runs load them from disk.
+# The drivers mirror render/mesher/brickmap kernels with params in place of sdf_func.
+# A gradient SDF {name}_grad(p, params) -> (d, gradient) next to the scene SDF
+# is picked up for NORMAL_GRADIENT normals (see render).
+
+CACHE_DIR = os.environ.get('KALPANA3D_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'kalpana3d'))
+
+def call_sdf(sdf_func, p, params):
+    # sdf_func(p) when params is None or omitted, sdf_func(p, params) otherwise
+    if params is None:
+        return sdf_func(p)
+    return sdf_func(p, params)
+
+@overload(call_sdf, inline='always')
+def ol_call_sdf(sdf_func, p, params):
+    if isinstance(params, (types.NoneType, types.Omitted)):
+        return lambda sdf_func, p, params: sdf_func(p)
+    return lambda sdf_func, p, params: sdf_func(p, params)
+
+KERNELS_TEMPLATE = '''\
+# Generated by kalpana3d.kernel_cache for {module}.{name}, do not edit
+import numpy as np
+from numba import njit, prange
+from kalpana3d import math_scalar as ms
+from kalpana3d.render import (render_row_scalar, render_tile, render_view_tile, render_level_row, render_seeded_row,
+                              TRACE_DEFAULT)
+from kalpana3d.mesher import sample_plane, classify_block, sample_block
+from kalpana3d.brickmap import brick_center_value, sample_brick
+from {module} import {name} as sdf_func
+try:
+    from {module} import {name}_grad as grad_func
+except ImportError:
+    grad_func = None
+
+@njit(fastmath=True, parallel=True, cache=True)
+def render_kernel(width, height, ro, lookat, fov, params, output_buffer, trace=TRACE_DEFAULT, step_counts=None):
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for y in prange(height):
+        render_row_scalar(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params, trace, step_counts,
+                          grad_func)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def render_tiles(width, height, ro, lookat, fov, params, output_buffer, tiles, tile_size, cost_map,
+                 trace=TRACE_DEFAULT, step_counts=None):
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for i in prange(tiles.shape[0]):
+        x0 = tiles[i, 0]
+        y0 = tiles[i, 1]
+        cost_map[y0 // tile_size, x0 // tile_size] = render_tile(x0, y0, tile_size, width, height, ro_t, lookat_t, fov,
+                                                                 sdf_func, output_buffer, params, trace, step_counts,
+                                                                 grad_func)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def render_views(width, height, cameras, fov, params, arena, view_tiles, tile_size, cost_map, trace=TRACE_DEFAULT):
+    for i in prange(view_tiles.shape[0]):
+        render_view_tile(i, view_tiles, tile_size, width, height, cameras, fov, sdf_func, arena, cost_map,
+                         params, trace, grad_func)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def render_seeded(width, height, ro, lookat, fov, params, output_buffer, seed, depth, step_counts, trace=TRACE_DEFAULT):
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for y in prange(height):
+        render_seeded_row(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params, trace,
+                          seed, depth, step_counts, grad_func)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def render_level(width, height, ro, lookat, fov, params, scale, first, output_buffer, depth, normals,
+                 trace=TRACE_DEFAULT, normal_cos=0.9, seed_fraction=0.9):
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    rows = -(-height // scale)
+    counts = np.zeros(rows, dtype=np.int64)
+    for gy in prange(rows):
+        counts[gy] = render_level_row(gy, scale, first, width, height, ro_t, lookat_t, fov, sdf_func, params, trace,
+                                      normal_cos, seed_fraction, output_buffer, depth, normals, grad_func)
+    return counts.sum()
+
+@njit(fastmath=True, parallel=True, cache=True)
+def sample_planes(min_bound, step, x0, res_y, res_z, params, planes):
+    for i in prange(planes.shape[0]):
+        sample_plane(min_bound, step, x0 + i, res_y, res_z, sdf_func, planes[i], params)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def classify_blocks(min_bound, step, res, origins, size, params, iso_level, margin, center_vals):
+    keep = np.empty(origins.shape[0], dtype=np.bool_)
+    for i in prange(origins.shape[0]):
+        keep[i] = classify_block(min_bound, step, res, origins[i], size, sdf_func, iso_level, margin, center_vals, i, params)
+    return keep
+
+@njit(fastmath=True, parallel=True, cache=True)
+def sample_blocks(min_bound, step, origins, size, active, params, grid):
+    for i in prange(origins.shape[0]):
+        sample_block(min_bound, step, origins[i], size, active, sdf_func, grid, params)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def bake_brick_centers(origin, step, brick, params, coarse):
+    dims = coarse.shape
+    for b in prange(dims[0] * dims[1] * dims[2]):
+        brick_center_value(origin, step, brick, b, dims, sdf_func, coarse, params)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def bake_bricks(origin, step, brick, blocks, inv_scale, params, bricks):
+    for i in prange(blocks.shape[0]):
+        sample_brick(origin, step, brick, blocks[i], inv_scale, sdf_func, bricks[i], params)
+'''
+
+# Generated modules already imported in this process, by scene SDF
+loaded_kernels = {}
+
+def kernel_key(sdf_func):
+    # Changes whenever the scene module, kalpana3d or numba changes
+    h = hashlib.sha1()
+    h.update(numba.__version__.encode())
+    h.update(f"{sdf_func.__module__}.{sdf_func.__qualname__}".encode())
+    h.update(inspect.getsource(sys.modules[sdf_func.__module__]).encode())
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(package_dir, name), 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+def scene_kernels(sdf_func):
+    """
+    Returns the generated kernel module for a module-level scene SDF
+    sdf_func(p, params), writing it to CACHE_DIR on first use.
+    """
+    py_func = getattr(sdf_func, 'py_func', sdf_func)
+    if '<locals>' in py_func.__qualname__ or py_func.__module__ == '__main__':
+        raise ValueError(f"{py_func.__qualname__} must be defined at module level of an importable module to be cached")
+
+    if py_func in loaded_kernels:
+        return loaded_kernels[py_func]
+
+    key = kernel_key(py_func)
+    name = f"k3d_{py_func.__name__}_{key}"
+    path = os.path.join(CACHE_DIR, name + '.py')
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        source = KERNELS_TEMPLATE.format(module=py_func.__module__, name=py_func.__name__)
+        # Write then rename, so concurrent jobs never import a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(source)
+        os.replace(tmp_path, path)
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    loaded_kernels[py_func] = module
+    return module
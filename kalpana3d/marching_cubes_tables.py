@@ -293,3 +293,23 @@ tri_table = np.array([
     [0, 3, 8, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1],
     [-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1],
 ], dtype=np.int32)
+
+# Corner offsets in Bourke's ordering (x, y, z)
+corner_offsets = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 0, 1], [0, 0, 1],
+    [0, 1, 0], [1, 1, 0], [1, 1, 1], [0, 1, 1],
+], dtype=np.int32)
+
+# Pair of corners joined by each of the 12 cube edges
+edge_corners = np.array([
+    [0, 1], [1, 2], [2, 3], [3, 0],
+    [4, 5], [5, 6], [6, 7], [7, 4],
+    [0, 4], [1, 5], [2, 6], [3, 7],
+], dtype=np.int32)
+
+# Lattice edge of each cube edge: offset of its lower corner (x, y, z) and its axis
+edge_lattice = np.array([
+    [0, 0, 0, 0], [1, 0, 0, 2], [0, 0, 1, 0], [0, 0, 0, 2],
+    [0, 1, 0, 0], [1, 1, 0, 2], [0, 1, 1, 0], [0, 1, 0, 2],
+    [0, 0, 0, 1], [1, 0, 0, 1], [1, 0, 1, 1], [0, 0, 1, 1],
+], dtype=np.int32)
@@ -0,0 +1,60 @@
+import numpy as np
+from numba import njit
+
+# Allocation-free vector math on scalar triples.
+# Vectors are plain (x, y, z) float64 tuples, which Numba keeps in registers
+# instead of allocating an array per operation. Every function only indexes
+# its inputs, so a vec3 array is accepted wherever a triple is expected.
+
+@njit(fastmath=True)
+def v3(x, y, z):
+    return (float(x), float(y), float(z))
+
+@njit(fastmath=True)
+def add(a, b):
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+@njit(fastmath=True)
+def sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+@njit(fastmath=True)
+def scale(a, s):
+    return (a[0] * s, a[1] * s, a[2] * s)
+
+@njit(fastmath=True)
+def mul(a, b):
+    return (a[0] * b[0], a[1] * b[1], a[2] * b[2])
+
+@njit(fastmath=True)
+def madd(a, b, s):
+    # a + b * s
+    return (a[0] + b[0] * s, a[1] + b[1] * s, a[2] + b[2] * s)
+
+@njit(fastmath=True)
+def dot(a, b):
+    return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+@njit(fastmath=True)
+def length(v):
+    return np.sqrt(dot(v, v))
+
+@njit(fastmath=True)
+def normalize(v):
+    l = length(v)
+    if l < 1e-8:
+        return (0.0, 0.0, 0.0)
+    inv = 1.0 / l
+    return (v[0] * inv, v[1] * inv, v[2] * inv)
+
+@njit(fastmath=True)
+def cross(a, b):
+    return (a[1]*b[2] - a[2]*b[1],
+            a[2]*b[0] - a[0]*b[2],
+            a[0]*b[1] - a[1]*b[0])
+
+@njit(fastmath=True)
+def mix(a, b, t):
+    return (a[0] + (b[0] - a[0]) * t,
+            a[1] + (b[1] - a[1]) * t,
+            a[2] + (b[2] - a[2]) * t)
@@ -0,0 +1,126 @@
+import os
+import numpy as np
+
+# Binary mesh files
+# Record layouts and headers of the binary PLY and STL formats, shared by the
+# exporters (export.py) and the meshers that write into mapped files (mesher.py).
+
+# Triangles processed per block when finishing a mapped file
+BLOCK_ROWS = 65536
+
+# Binary STL triangle record
+STL_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('v', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+# Binary PLY face record: vertex count followed by 3 indices
+PLY_FACE_DTYPE = np.dtype([
+    ('n', 'u1'),
+    ('idx', '<i4', (3,)),
+])
+
+# Digits reserved for the counts of a header that is patched after writing
+COUNT_WIDTH = 12
+
+def ply_header(num_vertices, num_faces, count_width=0):
+    # count_width > 0 zero-pads the counts so the header keeps its size when patched.
+    # The header is padded to a multiple of 4 bytes so the vertex data is aligned.
+    vertex_count = str(num_vertices).rjust(count_width, '0')
+    face_count = str(num_faces).rjust(count_width, '0')
+    head = "ply\nformat binary_little_endian 1.0\n"
+    body = (
+        f"element vertex {vertex_count}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        f"element face {face_count}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+    comment = "comment Kalpana3D PLY Export"
+    pad = -(len(head) + len(comment) + 1 + len(body)) % 4
+    return (head + comment + " " * pad + "\n" + body).encode('ascii')
+
+def soup_faces(num_vertices):
+    # Faces of an unindexed triangle soup: every 3 consecutive vertices
+    return np.arange(num_vertices // 3 * 3, dtype=np.int64).reshape(-1, 3)
+
+# Memory-mapped output
+# A binary PLY/STL file is created with a placeholder header and mapped so that
+# a mesher can write triangles straight into it through an (N, 3, 3) float32 view.
+# PLY stores the triangle soup as its vertex list; STL stores it in its records.
+
+def map_mesh_file(filename, offset, capacity):
+    # Map capacity triangles after the header, returns (memmap, triangle view)
+    if filename.lower().endswith('.stl'):
+        mm = np.memmap(filename, dtype=STL_DTYPE, mode='r+', offset=offset, shape=(capacity,))
+        return mm, mm['v']
+    mm = np.memmap(filename, dtype='<f4', mode='r+', offset=offset, shape=(capacity, 3, 3))
+    return mm, mm
+
+def open_mesh_memmap(filename, capacity):
+    """
+    Creates a binary .ply or .stl file with room for capacity triangles.
+    Returns (mm, tris): the file mapping and an (capacity, 3, 3) float32 view to write triangles into.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.stl':
+        header = b"Kalpana3D STL Export".ljust(80, b"\0") + np.zeros(1, dtype='<u4').tobytes()
+        record_size = STL_DTYPE.itemsize
+    elif ext == '.ply':
+        header = ply_header(0, 0, COUNT_WIDTH)
+        record_size = 36
+    else:
+        raise ValueError(f"Unsupported memory-mapped mesh format: {ext}")
+        
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + capacity * record_size)
+    return map_mesh_file(filename, len(header), capacity)
+
+def resize_mesh_memmap(filename, mm, capacity):
+    """
+    Grows the file behind mm to hold capacity triangles and maps it again.
+    Triangles already written are kept. Returns the new (mm, tris).
+    """
+    offset = mm.offset
+    mm.flush()
+    with open(filename, 'r+b') as f:
+        f.truncate(offset + capacity * (mm.nbytes // len(mm)))
+    return map_mesh_file(filename, offset, capacity)
+
+def close_mesh_memmap(filename, mm, num_triangles):
+    """
+    Finishes a file created by open_mesh_memmap holding num_triangles triangles:
+    drops the unused capacity, adds the STL facet normals or the PLY face list,
+    and patches the header counts.
+    """
+    offset = mm.offset
+    if filename.lower().endswith('.stl'):
+        for start in range(0, num_triangles, BLOCK_ROWS):
+            tris = mm['v'][start:min(start + BLOCK_ROWS, num_triangles)]
+            n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+            l = np.linalg.norm(n, axis=1, keepdims=True)
+            mm['normal'][start:start + len(tris)] = np.divide(n, l, out=np.zeros_like(n), where=l > 1e-12)
+        mm.flush()
+        with open(filename, 'r+b') as f:
+            f.truncate(offset + num_triangles * STL_DTYPE.itemsize)
+            f.seek(80)
+            f.write(np.array([num_triangles], dtype='<u4').tobytes())
+    else:
+        mm.flush()
+        with open(filename, 'r+b') as f:
+            f.truncate(offset + num_triangles * 36)
+            f.seek(0, os.SEEK_END)
+            for start in range(0, num_triangles, BLOCK_ROWS):
+                count = min(BLOCK_ROWS, num_triangles - start)
+                face_data = np.empty(count, dtype=PLY_FACE_DTYPE)
+                face_data['n'] = 3
+                face_data['idx'] = soup_faces(3 * count) + 3 * start
+                face_data.tofile(f)
+            f.seek(0)
+            f.write(ply_header(3 * num_triangles, num_triangles, COUNT_WIDTH))
+            
+    print(f"Exported {filename} ({num_triangles} triangles)")
@@ -1,7 +1,12 @@
 import numpy as np
-from numba import njit, prange
+from numba import njit, prange, get_num_threads
 from kalpana3d.math_core import vec3, normalize, cross, dot, mix
-from kalpana3d.marching_cubes_tables import edge_table, tri_table
+from kalpana3d.kernel_cache import call_sdf, scene_kernels
+from kalpana3d.mesh_file import open_mesh_memmap, resize_mesh_memmap, close_mesh_memmap
+from kalpana3d.marching_cubes_tables import edge_table, tri_table, corner_offsets, edge_corners, edge_lattice
+
+# Number of triangles emitted for each cube index
+tri_counts = ((tri_table != -1).sum(axis=1) // 3).astype(np.int32)
 
 @njit(fastmath=True)
 def get_grid_value(p, sdf_func):
@@ -241,3 +246,692 @@ def generate_mesh(min_bound, max_bound, resolution, sdf_func, iso_level, max_tri
                     tri_idx += 1
                     
     return vertices[:tri_idx*3]
+
+# Cached meshing
+# Every lattice point is sampled exactly once and the samples are shared by
+# the cube-index classification and the edge interpolation of all 8 cells
+# touching that point. Planes are indexed [y, z] at a fixed x.
+
+@njit(fastmath=True)
+def edge_mu(iso_level, val1, val2):
+    # Interpolation weight along an edge, same snapping rules as vertex_interp
+    iso = np.float32(iso_level)
+    eps = np.float32(0.00001)
+    if abs(iso - val1) < eps:
+        return np.float32(0.0)
+    if abs(iso - val2) < eps:
+        return np.float32(1.0)
+    if abs(val1 - val2) < eps:
+        return np.float32(0.0)
+    return np.float32((iso - val1) / (val2 - val1))
+
+@njit(fastmath=True, inline='always')
+def sample_plane(min_bound, step, x, res_y, res_z, sdf_func, plane, params=None):
+    # Evaluate the field on lattice plane x, plane is (res_y+1, res_z+1)
+    p = np.empty(3, dtype=np.float32)
+    p[0] = min_bound[0] + x * step[0]
+    for y in range(res_y + 1):
+        p[1] = min_bound[1] + y * step[1]
+        for z in range(res_z + 1):
+            p[2] = min_bound[2] + z * step[2]
+            plane[y, z] = call_sdf(sdf_func, p, params)
+
+@njit(fastmath=True)
+def load_corners(v0, v1, y, z, vals):
+    # Gather the 8 corner samples of cell (y, z) between planes v0 (x) and v1 (x+1)
+    vals[0] = v0[y, z]
+    vals[1] = v1[y, z]
+    vals[2] = v1[y, z + 1]
+    vals[3] = v0[y, z + 1]
+    vals[4] = v0[y + 1, z]
+    vals[5] = v1[y + 1, z]
+    vals[6] = v1[y + 1, z + 1]
+    vals[7] = v0[y + 1, z + 1]
+
+@njit(fastmath=True)
+def cube_index_of(vals, iso_level):
+    cube_index = 0
+    for i in range(8):
+        if vals[i] < iso_level:
+            cube_index |= (1 << i)
+    return cube_index
+
+@njit(fastmath=True)
+def count_slab(v0, v1, iso_level):
+    # Triangles produced by the cells between two sampled planes
+    res_y = v0.shape[0] - 1
+    res_z = v0.shape[1] - 1
+    vals = np.empty(8, dtype=np.float32)
+    count = 0
+    for y in range(res_y):
+        for z in range(res_z):
+            load_corners(v0, v1, y, z, vals)
+            count += tri_counts[cube_index_of(vals, iso_level)]
+    return count
+
+@njit(fastmath=True)
+def emit_slab(v0, v1, x, min_bound, step, iso_level, tris, tri_idx):
+    # Write the triangles of the cells between planes x and x+1 into tris, an
+    # (N, 3, 3) array, starting at triangle tri_idx. The caller guarantees the capacity.
+    res_y = v0.shape[0] - 1
+    res_z = v0.shape[1] - 1
+    vals = np.empty(8, dtype=np.float32)
+    base = np.empty(3, dtype=np.float32)
+    vert_list = np.empty((12, 3), dtype=np.float32)
+    
+    base[0] = min_bound[0] + x * step[0]
+    for y in range(res_y):
+        base[1] = min_bound[1] + y * step[1]
+        for z in range(res_z):
+            load_corners(v0, v1, y, z, vals)
+            cube_index = cube_index_of(vals, iso_level)
+            edges = edge_table[cube_index]
+            if edges == 0:
+                continue
+            base[2] = min_bound[2] + z * step[2]
+            
+            for e in range(12):
+                if edges & (1 << e):
+                    c1 = edge_corners[e, 0]
+                    c2 = edge_corners[e, 1]
+                    mu = edge_mu(iso_level, vals[c1], vals[c2])
+                    for k in range(3):
+                        a = base[k] + corner_offsets[c1, k] * step[k]
+                        b = base[k] + corner_offsets[c2, k] * step[k]
+                        vert_list[e, k] = a + mu * (b - a)
+            
+            for i in range(0, 16, 3):
+                if tri_table[cube_index, i] == -1:
+                    break
+                tris[tri_idx, 0] = vert_list[tri_table[cube_index, i]]
+                tris[tri_idx, 1] = vert_list[tri_table[cube_index, i+1]]
+                tris[tri_idx, 2] = vert_list[tri_table[cube_index, i+2]]
+                tri_idx += 1
+    return tri_idx
+
+@njit(fastmath=True, parallel=True)
+def sample_planes(min_bound, step, x0, res_y, res_z, sdf_func, planes):
+    # Fill planes[i] with lattice plane x0 + i, one plane per task
+    for i in prange(planes.shape[0]):
+        sample_plane(min_bound, step, x0 + i, res_y, res_z, sdf_func, planes[i])
+
+@njit(fastmath=True)
+def sample_grid(min_bound, max_bound, resolution, sdf_func):
+    # Full float32 lattice of (res+1)^3 samples
+    step = (max_bound - min_bound) / resolution
+    res_x = int(resolution[0])
+    res_y = int(resolution[1])
+    res_z = int(resolution[2])
+    
+    grid = np.empty((res_x + 1, res_y + 1, res_z + 1), dtype=np.float32)
+    sample_planes(min_bound, step, 0, res_y, res_z, sdf_func, grid)
+    return grid
+
+def sample_planes_batch(min_bound, step, x0, res_y, res_z, batch_func, planes):
+    # Like sample_planes for a batched SDF (see kalpana3d.sdf_batch):
+    # batch_func(points, out) is called once per plane with all of its points
+    points = np.empty(((res_y + 1) * (res_z + 1), 3), dtype=np.float32)
+    points[:, 1] = np.repeat(min_bound[1] + np.arange(res_y + 1) * step[1], res_z + 1)
+    points[:, 2] = np.tile(min_bound[2] + np.arange(res_z + 1) * step[2], res_y + 1)
+    for i in range(planes.shape[0]):
+        points[:, 0] = min_bound[0] + (x0 + i) * step[0]
+        batch_func(points, planes[i].reshape(-1))
+
+def plane_sampler(sdf_func, batch=False, sdf_params=None):
+    # (sample, sdf_arg) such that sample(min_bound, step, x0, res_y, res_z, sdf_arg, planes)
+    # fills planes from a jitted SDF, a batched SDF (batch=True) or a scene SDF
+    # sdf_func(p, sdf_params) through its disk-cached kernels (see kernel_cache)
+    if batch:
+        return sample_planes_batch, sdf_func
+    if sdf_params is not None:
+        return scene_kernels(sdf_func).sample_planes, sdf_params
+    return sample_planes, sdf_func
+
+def sample_grid_batch(min_bound, max_bound, resolution, batch_func):
+    # sample_grid for a batched SDF
+    step = ((max_bound - min_bound) / resolution).astype(np.float32)
+    res_x = int(resolution[0])
+    res_y = int(resolution[1])
+    res_z = int(resolution[2])
+    
+    grid = np.empty((res_x + 1, res_y + 1, res_z + 1), dtype=np.float32)
+    sample_planes_batch(min_bound, step, 0, res_y, res_z, batch_func, grid)
+    return grid
+
+@njit(fastmath=True, parallel=True, cache=True)
+def slab_offsets(planes, iso_level, n_slabs):
+    # The cells between consecutive sampled planes are split into n_slabs slabs
+    # along X. Each slab is classified in parallel; the exclusive prefix sum of
+    # the per-slab counts gives every slab its output offset (last entry = total).
+    n_cells_x = planes.shape[0] - 1
+    n_slabs = max(1, min(n_slabs, n_cells_x))
+    offsets = np.zeros(n_slabs + 1, dtype=np.int64)
+    for s in prange(n_slabs):
+        c = 0
+        for x in range(s * n_cells_x // n_slabs, (s + 1) * n_cells_x // n_slabs):
+            c += count_slab(planes[x], planes[x + 1], iso_level)
+        offsets[s + 1] = c
+    return np.cumsum(offsets)
+
+@njit(fastmath=True, parallel=True, cache=True)
+def emit_planes(planes, x0, min_bound, step, iso_level, offsets, tris, tri_start):
+    # Slabs emit in parallel straight into tris (N, 3, 3) at tri_start + offsets[s],
+    # where planes[0] is lattice plane x0
+    n_cells_x = planes.shape[0] - 1
+    n_slabs = offsets.shape[0] - 1
+    for s in prange(n_slabs):
+        tri_idx = tri_start + offsets[s]
+        for x in range(s * n_cells_x // n_slabs, (s + 1) * n_cells_x // n_slabs):
+            tri_idx = emit_slab(planes[x], planes[x + 1], x0 + x, min_bound, step, iso_level, tris, tri_idx)
+
+@njit(fastmath=True, cache=True)
+def mesh_planes(planes, x0, min_bound, step, iso_level, n_slabs):
+    # Triangle soup for the cells between consecutive sampled planes
+    # n_slabs < 1 gives one slab per cell layer; the Python drivers pass a count
+    # based on get_num_threads, which would keep this kernel out of the disk cache
+    if planes.shape[0] < 2:
+        return np.empty((0, 3), dtype=np.float32)
+    if n_slabs < 1:
+        n_slabs = planes.shape[0] - 1
+    offsets = slab_offsets(planes, iso_level, n_slabs)
+    vertices = np.empty((offsets[-1] * 3, 3), dtype=np.float32)
+    emit_planes(planes, x0, min_bound, step, iso_level, offsets, vertices.reshape((-1, 3, 3)), 0)
+    return vertices
+
+@njit(fastmath=True, cache=True)
+def mesh_grid(grid, min_bound, max_bound, iso_level, n_slabs=0):
+    # Triangle soup from a pre-sampled grid, no further SDF calls
+    step = np.empty(3, dtype=np.float32)
+    for k in range(3):
+        step[k] = (max_bound[k] - min_bound[k]) / (grid.shape[k] - 1)
+    return mesh_planes(grid, 0, min_bound, step, iso_level, n_slabs)
+
+@njit(fastmath=True)
+def generate_mesh_slabs(min_bound, max_bound, resolution, sdf_func, iso_level):
+    # Single sweep along X keeping only two rolling planes of samples.
+    # The output buffer grows geometrically, so no count pass is needed.
+    step = (max_bound - min_bound) / resolution
+    res_x = int(resolution[0])
+    res_y = int(resolution[1])
+    res_z = int(resolution[2])
+    
+    v0 = np.empty((res_y + 1, res_z + 1), dtype=np.float32)
+    v1 = np.empty((res_y + 1, res_z + 1), dtype=np.float32)
+    sample_plane(min_bound, step, 0, res_y, res_z, sdf_func, v0)
+    
+    capacity = 1024
+    vertices = np.empty((capacity * 3, 3), dtype=np.float32)
+    tri_idx = 0
+    
+    for x in range(res_x):
+        sample_plane(min_bound, step, x + 1, res_y, res_z, sdf_func, v1)
+        
+        needed = tri_idx + count_slab(v0, v1, iso_level)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity * 3, 3), dtype=np.float32)
+            grown[:tri_idx*3] = vertices[:tri_idx*3]
+            vertices = grown
+        
+        tri_idx = emit_slab(v0, v1, x, min_bound, step, iso_level, vertices.reshape((-1, 3, 3)), tri_idx)
+        v0, v1 = v1, v0
+        
+    return vertices[:tri_idx*3]
+
+# Indexed meshing
+# Every crossed lattice edge gets exactly one vertex. Lattice edge (x, y, z, axis)
+# joins point (x, y, z) to its +axis neighbour; edge_index maps it to a vertex
+# index, or -1 when the surface does not cross it.
+
+@njit(fastmath=True)
+def count_plane_edges(grid, x, iso_level):
+    # Crossed lattice edges whose lower point lies on plane x
+    res_x = grid.shape[0] - 1
+    res_y = grid.shape[1] - 1
+    res_z = grid.shape[2] - 1
+    count = 0
+    for y in range(res_y + 1):
+        for z in range(res_z + 1):
+            inside = grid[x, y, z] < iso_level
+            if x < res_x and (grid[x + 1, y, z] < iso_level) != inside:
+                count += 1
+            if y < res_y and (grid[x, y + 1, z] < iso_level) != inside:
+                count += 1
+            if z < res_z and (grid[x, y, z + 1] < iso_level) != inside:
+                count += 1
+    return count
+
+@njit(fastmath=True)
+def index_plane_edges(grid, x, min_bound, step, iso_level, edge_index, vertices, idx):
+    # Place one vertex on each crossed edge of plane x, numbering them from idx
+    res_x = grid.shape[0] - 1
+    res_y = grid.shape[1] - 1
+    res_z = grid.shape[2] - 1
+    for y in range(res_y + 1):
+        for z in range(res_z + 1):
+            val = grid[x, y, z]
+            inside = val < iso_level
+            for axis in range(3):
+                edge_index[x, y, z, axis] = -1
+                nx = x + (axis == 0)
+                ny = y + (axis == 1)
+                nz = z + (axis == 2)
+                if nx > res_x or ny > res_y or nz > res_z:
+                    continue
+                other = grid[nx, ny, nz]
+                if (other < iso_level) == inside:
+                    continue
+                mu = edge_mu(iso_level, val, other)
+                vertices[idx, 0] = min_bound[0] + x * step[0]
+                vertices[idx, 1] = min_bound[1] + y * step[1]
+                vertices[idx, 2] = min_bound[2] + z * step[2]
+                vertices[idx, axis] += mu * step[axis]
+                edge_index[x, y, z, axis] = idx
+                idx += 1
+    return idx
+
+@njit(fastmath=True)
+def emit_slab_faces(grid, edge_index, x, iso_level, faces, tri_idx):
+    # Faces of the cells between planes x and x+1, as indices into the welded vertices
+    res_y = grid.shape[1] - 1
+    res_z = grid.shape[2] - 1
+    vals = np.empty(8, dtype=np.float32)
+    for y in range(res_y):
+        for z in range(res_z):
+            load_corners(grid[x], grid[x + 1], y, z, vals)
+            cube_index = cube_index_of(vals, iso_level)
+            for i in range(0, 16, 3):
+                if tri_table[cube_index, i] == -1:
+                    break
+                for j in range(3):
+                    e = tri_table[cube_index, i + j]
+                    faces[tri_idx, j] = edge_index[x + edge_lattice[e, 0],
+                                                   y + edge_lattice[e, 1],
+                                                   z + edge_lattice[e, 2],
+                                                   edge_lattice[e, 3]]
+                tri_idx += 1
+    return tri_idx
+
+@njit(fastmath=True, parallel=True, cache=True)
+def mesh_grid_indexed(grid, min_bound, max_bound, iso_level, n_slabs=0):
+    # Welded (vertices, faces) from a pre-sampled grid
+    step = np.empty(3, dtype=np.float32)
+    for k in range(3):
+        step[k] = (max_bound[k] - min_bound[k]) / (grid.shape[k] - 1)
+    n_planes = grid.shape[0]
+    
+    # Vertices: count crossed edges per plane, prefix sum, then number them
+    vert_offsets = np.zeros(n_planes + 1, dtype=np.int64)
+    for x in prange(n_planes):
+        vert_offsets[x + 1] = count_plane_edges(grid, x, iso_level)
+    vert_offsets = np.cumsum(vert_offsets)
+    
+    vertices = np.empty((vert_offsets[n_planes], 3), dtype=np.float32)
+    edge_index = np.empty((grid.shape[0], grid.shape[1], grid.shape[2], 3), dtype=np.int32)
+    for x in prange(n_planes):
+        index_plane_edges(grid, x, min_bound, step, iso_level, edge_index, vertices, vert_offsets[x])
+    
+    # Faces: same slab split as mesh_planes
+    n_cells_x = n_planes - 1
+    if n_slabs < 1:
+        n_slabs = n_cells_x
+    n_slabs = max(1, min(n_slabs, n_cells_x))
+    
+    tri_offsets = np.zeros(n_slabs + 1, dtype=np.int64)
+    for s in prange(n_slabs):
+        c = 0
+        for x in range(s * n_cells_x // n_slabs, (s + 1) * n_cells_x // n_slabs):
+            c += count_slab(grid[x], grid[x + 1], iso_level)
+        tri_offsets[s + 1] = c
+    tri_offsets = np.cumsum(tri_offsets)
+    
+    faces = np.empty((tri_offsets[n_slabs], 3), dtype=np.int32)
+    for s in prange(n_slabs):
+        tri_idx = tri_offsets[s]
+        for x in range(s * n_cells_x // n_slabs, (s + 1) * n_cells_x // n_slabs):
+            tri_idx = emit_slab_faces(grid, edge_index, x, iso_level, faces, tri_idx)
+    return vertices, faces
+
+# Sparse meshing
+# Blocks of cells are culled with the distance bound of the SDF: if the value at
+# a block center exceeds the block half-diagonal, no surface crosses the block
+# and its lattice points can take the center value instead of being sampled.
+# Block origins are (N, 3) lattice indices, size is the block edge in cells.
+
+@njit(fastmath=True, inline='always')
+def classify_block(min_bound, step, res, origin, size, sdf_func, iso_level, margin, center_vals, i, params=None):
+    # True if block i may hold surface; center_vals[i] receives the SDF value at its center
+    p = np.empty(3, dtype=np.float32)
+    diag_sq = 0.0
+    for k in range(3):
+        ext = min(size, res[k] - origin[k])
+        p[k] = min_bound[k] + (origin[k] + 0.5 * ext) * step[k]
+        diag_sq += (ext * step[k]) ** 2
+    d = call_sdf(sdf_func, p, params)
+    center_vals[i] = d
+    return abs(d - iso_level) <= 0.5 * np.sqrt(diag_sq) + margin
+
+@njit(fastmath=True, parallel=True)
+def classify_blocks(min_bound, step, res, origins, size, sdf_func, iso_level, margin, center_vals):
+    # Returns a keep mask; center_vals receives the SDF value at each block center
+    n = origins.shape[0]
+    keep = np.empty(n, dtype=np.bool_)
+    for i in prange(n):
+        keep[i] = classify_block(min_bound, step, res, origins[i], size, sdf_func, iso_level, margin, center_vals, i)
+    return keep
+
+@njit(fastmath=True, parallel=True, cache=True)
+def fill_blocks(grid, origins, size, vals):
+    # Write a constant into the closed lattice box of each culled block
+    for i in prange(origins.shape[0]):
+        x0 = origins[i, 0]
+        y0 = origins[i, 1]
+        z0 = origins[i, 2]
+        x1 = min(x0 + size, grid.shape[0] - 1)
+        y1 = min(y0 + size, grid.shape[1] - 1)
+        z1 = min(z0 + size, grid.shape[2] - 1)
+        grid[x0:x1 + 1, y0:y1 + 1, z0:z1 + 1] = vals[i]
+
+@njit(fastmath=True, inline='always')
+def sample_block(min_bound, step, origin, size, active, sdf_func, grid, params=None):
+    # Sample the closed lattice box of an active block. A point on a shared
+    # face is left to the active block owning it (half-open), so each point
+    # is evaluated once unless its owner was culled.
+    nb = active.shape
+    p = np.empty(3, dtype=np.float32)
+    x0 = origin[0]
+    y0 = origin[1]
+    z0 = origin[2]
+    bx = x0 // size
+    by = y0 // size
+    bz = z0 // size
+    for x in range(x0, min(x0 + size, grid.shape[0] - 1) + 1):
+        ox = min(x // size, nb[0] - 1)
+        p[0] = min_bound[0] + x * step[0]
+        for y in range(y0, min(y0 + size, grid.shape[1] - 1) + 1):
+            oy = min(y // size, nb[1] - 1)
+            p[1] = min_bound[1] + y * step[1]
+            for z in range(z0, min(z0 + size, grid.shape[2] - 1) + 1):
+                oz = min(z // size, nb[2] - 1)
+                if (ox != bx or oy != by or oz != bz) and active[ox, oy, oz]:
+                    continue
+                p[2] = min_bound[2] + z * step[2]
+                grid[x, y, z] = call_sdf(sdf_func, p, params)
+
+@njit(fastmath=True, parallel=True)
+def sample_blocks(min_bound, step, origins, size, active, sdf_func, grid):
+    for i in prange(origins.shape[0]):
+        sample_block(min_bound, step, origins[i], size, active, sdf_func, grid)
+
+def sample_grid_sparse(min_bound, max_bound, resolution, sdf_func, iso_level, block_size=8, levels=2, margin=0.0, sdf_params=None):
+    """
+    Grid like sample_grid, but the SDF is only evaluated in blocks near the surface.
+    Blocks start at block_size * 2**levels cells and are split down to block_size.
+    The culling test assumes a 1-Lipschitz SDF; raise margin for fields that are not
+    (e.g. noise displacement). Returns (grid, n_active_blocks).
+    """
+    sdf_arg = sdf_func
+    classify = classify_blocks
+    sample = sample_blocks
+    if sdf_params is not None:
+        kernels = scene_kernels(sdf_func)
+        sdf_arg = sdf_params
+        classify = kernels.classify_blocks
+        sample = kernels.sample_blocks
+    
+    step = ((max_bound - min_bound) / resolution).astype(np.float32)
+    res = np.array([int(r) for r in resolution], dtype=np.int64)
+    grid = np.empty(tuple(res + 1), dtype=np.float32)
+    
+    size = block_size << levels
+    axes = [np.arange(0, r, size, dtype=np.int64) for r in res]
+    origins = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+    children = corner_offsets.astype(np.int64)
+    
+    while True:
+        vals = np.empty(len(origins), dtype=np.float32)
+        keep = classify(min_bound, step, res, origins, size, sdf_arg, iso_level, margin, vals)
+        fill_blocks(grid, origins[~keep], size, vals[~keep])
+        origins = origins[keep]
+        if size <= block_size or len(origins) == 0:
+            break
+        # Split survivors into their 8 children
+        size //= 2
+        origins = (origins[:, None, :] + children[None, :, :] * size).reshape(-1, 3)
+        origins = origins[(origins < res).all(axis=1)]
+    
+    active = np.zeros(tuple((res + size - 1) // size), dtype=np.bool_)
+    active[tuple((origins // size).T)] = True
+    sample(min_bound, step, origins, size, active, sdf_arg, grid)
+    return grid, len(origins)
+
+# Brick meshing
+# The volume is meshed in fixed-size bricks so memory stays bounded by the brick
+# size. Vertices on a brick face are owned by the brick processed first; later
+# bricks look them up in seam tables holding the global vertex index of every
+# lattice edge on the last face written along each axis.
+
+@njit(fastmath=True, parallel=True)
+def sample_box(min_bound, step, x0, y0, z0, sdf_func, box):
+    # box[i, j, k] = field at lattice point (x0+i, y0+j, z0+k)
+    for i in prange(box.shape[0]):
+        p = np.empty(3, dtype=np.float32)
+        p[0] = min_bound[0] + (x0 + i) * step[0]
+        for j in range(box.shape[1]):
+            p[1] = min_bound[1] + (y0 + j) * step[1]
+            for k in range(box.shape[2]):
+                p[2] = min_bound[2] + (z0 + k) * step[2]
+                box[i, j, k] = sdf_func(p)
+
+@njit(fastmath=True)
+def mesh_brick(box, x0, y0, z0, min_bound, step, iso_level,
+               seam_x, seam_y, seam_z, next_x, next_y, next_z, base_index):
+    # Welded mesh of one brick. seam_x is indexed [y, z, axis] over the whole
+    # YZ plane, seam_y [local x, z, axis] over the current X layer and
+    # seam_z [local x, local y, axis]; next_* receive this brick's upper faces.
+    # Returns the vertices created here and faces holding global indices.
+    nx = box.shape[0] - 1
+    ny = box.shape[1] - 1
+    nz = box.shape[2] - 1
+    
+    capacity = 0
+    for x in range(nx + 1):
+        capacity += count_plane_edges(box, x, iso_level)
+    vertices = np.empty((capacity, 3), dtype=np.float32)
+    edge_index = np.empty((nx + 1, ny + 1, nz + 1, 3), dtype=np.int64)
+    
+    n_new = 0
+    for x in range(nx + 1):
+        for y in range(ny + 1):
+            for z in range(nz + 1):
+                val = box[x, y, z]
+                inside = val < iso_level
+                for axis in range(3):
+                    edge_index[x, y, z, axis] = -1
+                    ex = x + (axis == 0)
+                    ey = y + (axis == 1)
+                    ez = z + (axis == 2)
+                    if ex > nx or ey > ny or ez > nz:
+                        continue
+                    other = box[ex, ey, ez]
+                    if (other < iso_level) == inside:
+                        continue
+                    
+                    # Edge lying on a lower face shared with an earlier brick
+                    idx = -1
+                    if x == 0 and x0 > 0 and axis != 0:
+                        idx = seam_x[y0 + y, z0 + z, axis]
+                    elif y == 0 and y0 > 0 and axis != 1:
+                        idx = seam_y[x, z0 + z, axis]
+                    elif z == 0 and z0 > 0 and axis != 2:
+                        idx = seam_z[x, y, axis]
+                    
+                    if idx < 0:
+                        mu = edge_mu(iso_level, val, other)
+                        vertices[n_new, 0] = min_bound[0] + (x0 + x) * step[0]
+                        vertices[n_new, 1] = min_bound[1] + (y0 + y) * step[1]
+                        vertices[n_new, 2] = min_bound[2] + (z0 + z) * step[2]
+                        vertices[n_new, axis] += mu * step[axis]
+                        idx = base_index + n_new
+                        n_new += 1
+                    edge_index[x, y, z, axis] = idx
+    
+    # Publish the upper faces for the bricks that follow
+    for y in range(ny + 1):
+        for z in range(nz + 1):
+            next_x[y0 + y, z0 + z, 1] = edge_index[nx, y, z, 1]
+            next_x[y0 + y, z0 + z, 2] = edge_index[nx, y, z, 2]
+    for x in range(nx + 1):
+        for z in range(nz + 1):
+            next_y[x, z0 + z, 0] = edge_index[x, ny, z, 0]
+            next_y[x, z0 + z, 2] = edge_index[x, ny, z, 2]
+    for x in range(nx + 1):
+        for y in range(ny + 1):
+            next_z[x, y, 0] = edge_index[x, y, nz, 0]
+            next_z[x, y, 1] = edge_index[x, y, nz, 1]
+    
+    n_tris = 0
+    for x in range(nx):
+        n_tris += count_slab(box[x], box[x + 1], iso_level)
+    faces = np.empty((n_tris, 3), dtype=np.int64)
+    tri_idx = 0
+    for x in range(nx):
+        tri_idx = emit_slab_faces(box, edge_index, x, iso_level, faces, tri_idx)
+    
+    return vertices[:n_new], faces
+
+def iter_mesh_bricks(min_bound, max_bound, resolution, sdf_func, iso_level, brick_size=64):
+    """
+    Meshes the volume in bricks of brick_size^3 cells and yields (vertices, faces)
+    chunks as they are produced. Vertices are welded across bricks: each chunk only
+    holds the vertices it introduces, and faces index into the concatenation of
+    all chunks yielded so far (global, 0-based). Peak memory is one brick plus
+    seam tables of a few YZ planes.
+    """
+    step = ((max_bound - min_bound) / resolution).astype(np.float32)
+    res_x = int(resolution[0])
+    res_y = int(resolution[1])
+    res_z = int(resolution[2])
+    b = brick_size
+    
+    seam_x = np.full((res_y + 1, res_z + 1, 3), -1, dtype=np.int64)
+    next_x = np.full((res_y + 1, res_z + 1, 3), -1, dtype=np.int64)
+    seam_y = np.full((b + 1, res_z + 1, 3), -1, dtype=np.int64)
+    next_y = np.full((b + 1, res_z + 1, 3), -1, dtype=np.int64)
+    seam_z = np.full((b + 1, b + 1, 3), -1, dtype=np.int64)
+    next_z = np.full((b + 1, b + 1, 3), -1, dtype=np.int64)
+    
+    n_vertices = 0
+    for x0 in range(0, res_x, b):
+        x1 = min(x0 + b, res_x)
+        for y0 in range(0, res_y, b):
+            y1 = min(y0 + b, res_y)
+            for z0 in range(0, res_z, b):
+                z1 = min(z0 + b, res_z)
+                box = np.empty((x1 - x0 + 1, y1 - y0 + 1, z1 - z0 + 1), dtype=np.float32)
+                sample_box(min_bound, step, x0, y0, z0, sdf_func, box)
+                vertices, faces = mesh_brick(box, x0, y0, z0, min_bound, step, iso_level,
+                                             seam_x, seam_y, seam_z, next_x, next_y, next_z,
+                                             n_vertices)
+                n_vertices += len(vertices)
+                if len(faces) > 0 or len(vertices) > 0:
+                    yield vertices, faces
+                seam_z, next_z = next_z, seam_z
+            seam_y, next_y = next_y, seam_y
+        seam_x, next_x = next_x, seam_x
+
+def iter_plane_bands(min_bound, step, resolution, sdf_func, max_grid_bytes, batch=False, sdf_params=None):
+    # Yields (x0, planes) with planes[0] = lattice plane x0, sampled in parallel.
+    # Bands hold as many X planes as fit in max_grid_bytes; the last plane of a
+    # band is carried over as the first plane of the next one.
+    # batch and sdf_params select the SDF form, see plane_sampler.
+    sample, sdf_arg = plane_sampler(sdf_func, batch, sdf_params)
+    res_x = int(resolution[0])
+    res_y = int(resolution[1])
+    res_z = int(resolution[2])
+    
+    plane_bytes = (res_y + 1) * (res_z + 1) * 4
+    band = min(res_x, max(1, max_grid_bytes // plane_bytes - 1))
+    planes = np.empty((band + 1, res_y + 1, res_z + 1), dtype=np.float32)
+    sample(min_bound, step, 0, res_y, res_z, sdf_arg, planes[:1])
+    
+    for x0 in range(0, res_x, band):
+        n = min(band, res_x - x0)
+        sample(min_bound, step, x0 + 1, res_y, res_z, sdf_arg, planes[1:n + 1])
+        yield x0, planes[:n + 1]
+        planes[0] = planes[n]
+
+def generate_mesh_cached(min_bound, max_bound, resolution, sdf_func, iso_level, max_grid_bytes=512 * 1024 * 1024, n_slabs=0, batch=False, sdf_params=None):
+    """
+    Triangle soup like generate_mesh, but the SDF is evaluated once per lattice point.
+    The volume is processed in bands of X planes that fit in max_grid_bytes (the whole
+    grid when possible); each band is sampled and meshed in parallel. max_grid_bytes=0
+    degrades to two rolling planes. batch=True takes a batched sdf_func(points, out);
+    sdf_params takes a scene SDF sdf_func(p, sdf_params) with disk-cached kernels.
+    """
+    step = ((max_bound - min_bound) / resolution).astype(np.float32)
+    if n_slabs < 1:
+        n_slabs = 4 * get_num_threads()
+    chunks = []
+    for x0, planes in iter_plane_bands(min_bound, step, resolution, sdf_func, max_grid_bytes, batch, sdf_params):
+        chunks.append(mesh_planes(planes, x0, min_bound, step, iso_level, n_slabs))
+        
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks)
+
+def generate_mesh_to_file(min_bound, max_bound, resolution, sdf_func, iso_level, filename,
+                          max_grid_bytes=512 * 1024 * 1024, n_slabs=0, capacity=1 << 16, batch=False, sdf_params=None):
+    """
+    Triangle soup written straight into a memory-mapped binary .ply or .stl file.
+    Triangles land in the file as each band is meshed, without an in-RAM copy;
+    the file grows as needed and its header counts are patched at the end.
+    batch and sdf_params as in generate_mesh_cached. Returns the number of triangles.
+    """
+    step = ((max_bound - min_bound) / resolution).astype(np.float32)
+    if n_slabs < 1:
+        n_slabs = 4 * get_num_threads()
+    
+    mm, tris = open_mesh_memmap(filename, capacity)
+    num_triangles = 0
+    for x0, planes in iter_plane_bands(min_bound, step, resolution, sdf_func, max_grid_bytes, batch, sdf_params):
+        offsets = slab_offsets(planes, iso_level, n_slabs)
+        needed = num_triangles + offsets[-1]
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            mm, tris = resize_mesh_memmap(filename, mm, capacity)
+        emit_planes(planes, x0, min_bound, step, iso_level, offsets, tris, num_triangles)
+        num_triangles = needed
+        
+    close_mesh_memmap(filename, mm, num_triangles)
+    return num_triangles
+
+def generate_indexed_mesh(min_bound, max_bound, resolution, sdf_func, iso_level, n_slabs=0, batch=False, sdf_params=None):
+    """
+    Welded mesh with one vertex per crossed lattice edge.
+    Returns (vertices, faces): float32 (V, 3) positions and int32 (F, 3) vertex indices.
+    batch and sdf_params as in generate_mesh_cached.
+    """
+    if batch:
+        grid = sample_grid_batch(min_bound, max_bound, resolution, sdf_func)
+    elif sdf_params is not None:
+        step = ((max_bound - min_bound) / resolution).astype(np.float32)
+        res_x, res_y, res_z = (int(r) for r in resolution)
+        grid = np.empty((res_x + 1, res_y + 1, res_z + 1), dtype=np.float32)
+        scene_kernels(sdf_func).sample_planes(min_bound, step, 0, res_y, res_z, sdf_params, grid)
+    else:
+        grid = sample_grid(min_bound, max_bound, resolution, sdf_func)
+    if n_slabs < 1:
+        n_slabs = 4 * get_num_threads()
+    return mesh_grid_indexed(grid, min_bound, max_bound, iso_level, n_slabs)
+
+def generate_mesh_sparse(min_bound, max_bound, resolution, sdf_func, iso_level, block_size=8, levels=2, margin=0.0, n_slabs=0, sdf_params=None):
+    """
+    Welded (vertices, faces) like generate_indexed_mesh, with SDF evaluation limited
+    to the narrow band around the surface (see sample_grid_sparse).
+    """
+    grid, _ = sample_grid_sparse(min_bound, max_bound, resolution, sdf_func, iso_level, block_size, levels, margin, sdf_params)
+    if n_slabs < 1:
+        n_slabs = 4 * get_num_threads()
+    return mesh_grid_indexed(grid, min_bound, max_bound, iso_level, n_slabs)
@@ -1,47 +1,299 @@
 import numpy as np
-from numba import njit
-from kalpana3d.math_core import vec3, dot, mix
+from numba import njit, prange
+from kalpana3d.math_core import mix
+
+# Noise is evaluated on scalars, so p may be a vec3 array or a scalar triple
+# (see math_scalar) and no temporary vectors are allocated.
+# Lattice points are hashed with integer bit mixing: each axis coordinate is
+# multiplied by its own odd constant, the three products are summed and the
+# result goes through a 32-bit avalanche mixer (lowbias32). The per-axis
+# products are shared by the 8 corners of a cell, so a corner costs two adds
+# and the mixer instead of a sin. Arithmetic is done on uint64 and masked to
+# 32 bits, so results are identical on every platform.
+
+MASK32 = 0xFFFFFFFF
+PRIME_X = 0x8DA6B343
+PRIME_Y = 0xD8163841
+PRIME_Z = 0xCB1AB31F
+
+@njit(fastmath=True, inline='always')
+def axis_hash(i, prime):
+    # Lattice coordinate i (a float holding an integer) times an axis constant
+    return (np.uint64(np.int64(i) & MASK32) * np.uint64(prime)) & np.uint64(MASK32)
+
+@njit(fastmath=True, inline='always')
+def corner_hash(hx, hy, hz):
+    # Mixes the axis hashes of a lattice point to a float in [0, 1)
+    h = (hx + hy + hz) & np.uint64(MASK32)
+    h ^= h >> np.uint64(16)
+    h = (h * np.uint64(0x7FEB352D)) & np.uint64(MASK32)
+    h ^= h >> np.uint64(15)
+    h = (h * np.uint64(0x846CA68B)) & np.uint64(MASK32)
+    h ^= h >> np.uint64(16)
+    return float(h >> np.uint64(8)) * (1.0 / 16777216.0)
+
+@njit(fastmath=True)
+def hash3(x, y, z):
+    # Hash of the lattice point (x, y, z), integer-valued floats
+    return corner_hash(axis_hash(x, PRIME_X), axis_hash(y, PRIME_Y), axis_hash(z, PRIME_Z))
 
 @njit(fastmath=True)
 def hash13(p):
-    # p is vec3
-    # Ensure p is float32
-    h = dot(p, vec3(12.9898, 78.233, 45.164))
-    # fract(sin(h)*43758.5453123)
+    # Hash in [0, 1) of the point p itself (a vec3 or a triple), every point
+    # hashing differently: the sin-based hash noise used before, in float32 like
+    # it. Noise does not use it, see hash3 for lattice points.
+    h = np.float32(np.float32(12.9898) * np.float32(p[0]) + np.float32(78.233) * np.float32(p[1])
+                   + np.float32(45.164) * np.float32(p[2]))
     val = np.sin(h) * 43758.5453123
     return val - np.floor(val)
 
 @njit(fastmath=True)
-def noise(p):
-    i = np.floor(p)
-    f = p - i
+def noise3(x, y, z):
+    ix = np.floor(x)
+    iy = np.floor(y)
+    iz = np.floor(z)
+    fx = x - ix
+    fy = y - iy
+    fz = z - iz
     
     # Cubic smoothing
     # f * f * (3.0 - 2.0 * f)
-    u = f * f * (3.0 - 2.0 * f)
+    ux = fx * fx * (3.0 - 2.0 * fx)
+    uy = fy * fy * (3.0 - 2.0 * fy)
+    uz = fz * fz * (3.0 - 2.0 * fz)
+    
+    # Axis hashes of the cell, shared by the 8 corners
+    hx0 = axis_hash(ix, PRIME_X)
+    hx1 = axis_hash(ix + 1.0, PRIME_X)
+    hy0 = axis_hash(iy, PRIME_Y)
+    hy1 = axis_hash(iy + 1.0, PRIME_Y)
+    hz0 = axis_hash(iz, PRIME_Z)
+    hz1 = axis_hash(iz + 1.0, PRIME_Z)
     
     # 8 corners
-    # We need to hash the corners
-    # This is slow if we call hash13 8 times.
-    
-    res = mix(mix(mix( hash13(i + vec3(0.0,0.0,0.0)), 
-                        hash13(i + vec3(1.0,0.0,0.0)), u[0]),
-                   mix( hash13(i + vec3(0.0,1.0,0.0)), 
-                        hash13(i + vec3(1.0,1.0,0.0)), u[0]), u[1]),
-               mix(mix( hash13(i + vec3(0.0,0.0,1.0)), 
-                        hash13(i + vec3(1.0,0.0,1.0)), u[0]),
-                   mix( hash13(i + vec3(0.0,1.0,1.0)), 
-                        hash13(i + vec3(1.0,1.0,1.0)), u[0]), u[1]), u[2])
+    res = mix(mix(mix( corner_hash(hx0, hy0, hz0), 
+                        corner_hash(hx1, hy0, hz0), ux),
+                   mix( corner_hash(hx0, hy1, hz0), 
+                        corner_hash(hx1, hy1, hz0), ux), uy),
+               mix(mix( corner_hash(hx0, hy0, hz1), 
+                        corner_hash(hx1, hy0, hz1), ux),
+                   mix( corner_hash(hx0, hy1, hz1), 
+                        corner_hash(hx1, hy1, hz1), ux), uy), uz)
     return res
 
+@njit(fastmath=True, inline='always')
+def wrap(i, period):
+    # Lattice coordinate i modulo period
+    return i - period * np.floor(i / period)
+
+@njit(fastmath=True)
+def noise3_tiled(x, y, z, period, seed):
+    # noise3 repeating every period units (a whole number) along each axis;
+    # seed selects an independent pattern
+    ix = np.floor(x)
+    iy = np.floor(y)
+    iz = np.floor(z)
+    fx = x - ix
+    fy = y - iy
+    fz = z - iz
+    
+    ux = fx * fx * (3.0 - 2.0 * fx)
+    uy = fy * fy * (3.0 - 2.0 * fy)
+    uz = fz * fz * (3.0 - 2.0 * fz)
+    
+    # The seed offsets every lattice sum before mixing
+    hs = axis_hash(seed, 0x9E3779B9)
+    hx0 = (axis_hash(wrap(ix, period), PRIME_X) + hs) & np.uint64(MASK32)
+    hx1 = (axis_hash(wrap(ix + 1.0, period), PRIME_X) + hs) & np.uint64(MASK32)
+    hy0 = axis_hash(wrap(iy, period), PRIME_Y)
+    hy1 = axis_hash(wrap(iy + 1.0, period), PRIME_Y)
+    hz0 = axis_hash(wrap(iz, period), PRIME_Z)
+    hz1 = axis_hash(wrap(iz + 1.0, period), PRIME_Z)
+    
+    return mix(mix(mix(corner_hash(hx0, hy0, hz0), corner_hash(hx1, hy0, hz0), ux),
+                   mix(corner_hash(hx0, hy1, hz0), corner_hash(hx1, hy1, hz0), ux), uy),
+               mix(mix(corner_hash(hx0, hy0, hz1), corner_hash(hx1, hy0, hz1), ux),
+                   mix(corner_hash(hx0, hy1, hz1), corner_hash(hx1, hy1, hz1), ux), uy), uz)
+
+@njit(fastmath=True)
+def noise(p):
+    return noise3(float(p[0]), float(p[1]), float(p[2]))
+
 @njit(fastmath=True)
 def fbm(p, octaves):
     v = 0.0
     a = 0.5
-    shift = vec3(100.0, 100.0, 100.0)
+    x = float(p[0])
+    y = float(p[1])
+    z = float(p[2])
     # Numba loop
     for i in range(octaves):
-        v += a * noise(p)
-        p = p * 2.0 + shift
+        v += a * noise3(x, y, z)
+        x = x * 2.0 + 100.0
+        y = y * 2.0 + 100.0
+        z = z * 2.0 + 100.0
+        a *= 0.5
+    return v
+
+@njit(fastmath=True)
+def noise3_grad(x, y, z):
+    # noise3 and its gradient, as (value, dx, dy, dz)
+    ix = np.floor(x)
+    iy = np.floor(y)
+    iz = np.floor(z)
+    fx = x - ix
+    fy = y - iy
+    fz = z - iz
+    
+    ux = fx * fx * (3.0 - 2.0 * fx)
+    uy = fy * fy * (3.0 - 2.0 * fy)
+    uz = fz * fz * (3.0 - 2.0 * fz)
+    dux = 6.0 * fx * (1.0 - fx)
+    duy = 6.0 * fy * (1.0 - fy)
+    duz = 6.0 * fz * (1.0 - fz)
+    
+    hx0 = axis_hash(ix, PRIME_X)
+    hx1 = axis_hash(ix + 1.0, PRIME_X)
+    hy0 = axis_hash(iy, PRIME_Y)
+    hy1 = axis_hash(iy + 1.0, PRIME_Y)
+    hz0 = axis_hash(iz, PRIME_Z)
+    hz1 = axis_hash(iz + 1.0, PRIME_Z)
+    
+    a = corner_hash(hx0, hy0, hz0)
+    b = corner_hash(hx1, hy0, hz0)
+    c = corner_hash(hx0, hy1, hz0)
+    d = corner_hash(hx1, hy1, hz0)
+    e = corner_hash(hx0, hy0, hz1)
+    f = corner_hash(hx1, hy0, hz1)
+    g = corner_hash(hx0, hy1, hz1)
+    h = corner_hash(hx1, hy1, hz1)
+    
+    # Trilinear blend expanded in powers of u
+    k1 = b - a
+    k2 = c - a
+    k3 = e - a
+    k4 = a - b - c + d
+    k5 = a - c - e + g
+    k6 = a - b - e + f
+    k7 = -a + b + c - d + e - f - g + h
+    v = a + k1*ux + k2*uy + k3*uz + k4*ux*uy + k5*uy*uz + k6*uz*ux + k7*ux*uy*uz
+    return (v,
+            dux * (k1 + k4*uy + k6*uz + k7*uy*uz),
+            duy * (k2 + k5*uz + k4*ux + k7*uz*ux),
+            duz * (k3 + k6*ux + k5*uy + k7*ux*uy))
+
+@njit(fastmath=True)
+def fbm_grad(p, octaves):
+    # fbm and its gradient, as (value, (dx, dy, dz))
+    v = 0.0
+    gx = 0.0
+    gy = 0.0
+    gz = 0.0
+    a = 0.5
+    # Octave i samples at 2**i times the frequency, which scales its gradient
+    freq = 1.0
+    x = float(p[0])
+    y = float(p[1])
+    z = float(p[2])
+    for i in range(octaves):
+        n, dx, dy, dz = noise3_grad(x, y, z)
+        v += a * n
+        gx += a * freq * dx
+        gy += a * freq * dy
+        gz += a * freq * dz
+        x = x * 2.0 + 100.0
+        y = y * 2.0 + 100.0
+        z = z * 2.0 + 100.0
+        a *= 0.5
+        freq *= 2.0
+    return v, (gx, gy, gz)
+
+@njit(fastmath=True, parallel=True)
+def fbm_many(points, octaves, out=None):
+    """
+    fbm of every row of an (N, 3) points array, in parallel.
+    Returns out, a new float64 array unless given.
+    """
+    if out is None:
+        out = np.empty(points.shape[0])
+    for i in prange(points.shape[0]):
+        out[i] = fbm(points[i], octaves)
+    return out
+
+@njit(fastmath=True)
+def fbm_tiled(p, octaves, period, seed=0):
+    # fbm repeating every period units along each axis: octave i runs at 2**i
+    # times the frequency, so its noise repeats every period * 2**i lattice cells
+    v = 0.0
+    a = 0.5
+    x = float(p[0])
+    y = float(p[1])
+    z = float(p[2])
+    cells = float(period)
+    for i in range(octaves):
+        v += a * noise3_tiled(x, y, z, cells, seed)
+        x = x * 2.0 + 100.0
+        y = y * 2.0 + 100.0
+        z = z * 2.0 + 100.0
         a *= 0.5
+        cells *= 2.0
     return v
+
+# Displacement bounds
+# Adding noise to a distance breaks its Lipschitz-1 property, so a sphere
+# tracer stepping by the sum can overshoot the surface. noise3 lies in [0, 1)
+# and the smoothstep blend has a slope of at most 1.5, so each component of its
+# gradient is at most 1.5. Octave i of fbm is noise3 at 2**i times the
+# frequency and 0.5**(i+1) the amplitude, so every octave adds the same bound.
+
+NOISE3_LIPSCHITZ = 1.5 * np.sqrt(3.0)
+
+@njit(fastmath=True)
+def fbm_range(octaves):
+    # Bounds (lo, hi) of fbm values
+    return 0.0, 1.0 - 0.5 ** octaves
+
+@njit(fastmath=True)
+def fbm_lipschitz(octaves):
+    # Bound on the gradient norm of fbm
+    return octaves * 0.5 * NOISE3_LIPSCHITZ
+
+@njit(fastmath=True, inline='always')
+def displace_bounds(amplitude, lo, hi, lipschitz, scale):
+    # For d + amplitude * n, n in [lo, hi] with gradient norm up to lipschitz at
+    # p * scale: the lowest displacement, the Lipschitz bound of the sum and the
+    # base distance past which d + lowest is the larger of the two distance bounds
+    low = min(amplitude * lo, amplitude * hi)
+    high = max(amplitude * lo, amplitude * hi)
+    l = 1.0 + abs(amplitude) * scale * lipschitz
+    if l <= 1.0:
+        return low, 1.0, low
+    return low, l, (high - l * low) / (l - 1.0)
+
+@njit(fastmath=True)
+def fbm_displace(d, p, scale, octaves, amplitude):
+    # d + fbm(p * scale) * amplitude, d a Lipschitz-1 distance at p, as a
+    # Lipschitz-1 distance bound with the same surface, safe to sphere trace.
+    # Two bounds hold: the sum divided by its Lipschitz bound, and d plus the
+    # lowest displacement (the surface lies inside d < -lowest). Their max is
+    # returned; far enough out the second always wins, and fbm is skipped.
+    lo, hi = fbm_range(octaves)
+    low, l, far = displace_bounds(amplitude, lo, hi, fbm_lipschitz(octaves), scale)
+    if d >= far:
+        return d + low
+    n = fbm((float(p[0]) * scale, float(p[1]) * scale, float(p[2]) * scale), octaves)
+    return max((d + n * amplitude) / l, d + low)
+
+@njit(fastmath=True)
+def fbm_displace_grad(d, g, p, scale, octaves, amplitude):
+    # fbm_displace and its gradient, g the gradient of d at p
+    lo, hi = fbm_range(octaves)
+    low, l, far = displace_bounds(amplitude, lo, hi, fbm_lipschitz(octaves), scale)
+    if d >= far:
+        return d + low, g
+    n, g_n = fbm_grad((float(p[0]) * scale, float(p[1]) * scale, float(p[2]) * scale), octaves)
+    d_n = (d + n * amplitude) / l
+    if d_n < d + low:
+        return d + low, g
+    a = amplitude * scale
+    return d_n, ((g[0] + g_n[0] * a) / l, (g[1] + g_n[1] * a) / l, (g[2] + g_n[2] * a) / l)
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+from numba import njit, prange
+from kalpana3d.noise import fbm_tiled, displace_bounds
+from kalpana3d.kernel_cache import CACHE_DIR
+
+# Baked noise volumes
+# fbm costs 8 lattice hashes per octave. When a scene only needs a fixed band
+# of it (e.g. bark displacement), the field is baked once into a res^3 float32
+# volume covering one period of fbm_tiled, and sampled with a trilinear fetch
+# (sample_volume). The volume tiles, so any point maps into it. Volumes are
+# stored in CACHE_DIR as .npy files keyed by their parameters and a version of
+# the noise hash, and kept in memory once loaded. The default 64^3 volume
+# (1 MB) stays in cache; larger ones are finer but fetch slower.
+
+# Bump when noise.fbm_tiled changes, so stale volumes are not reused. fill_volume
+# is not disk-cached by numba, which would not notice a change to fbm_tiled.
+NOISE_VERSION = 1
+
+# Volumes already loaded in this process, by file name
+loaded_volumes = {}
+
+@njit(fastmath=True, parallel=True)
+def fill_volume(volume, octaves, period, seed):
+    # volume[i, j, k] = fbm_tiled at (i, j, k) * period / res
+    res = volume.shape[0]
+    step = period / res
+    for i in prange(res):
+        for j in range(res):
+            for k in range(res):
+                volume[i, j, k] = fbm_tiled((i * step, j * step, k * step), octaves, period, seed)
+
+@njit(fastmath=True, inline='always')
+def volume_cell(x, res):
+    # Cell index, next index and fraction of coordinate x (in voxels) wrapped into [0, res)
+    x = x - res * np.floor(x / res)
+    i = min(int(x), res - 1)
+    return i, i + 1 if i + 1 < res else 0, x - i
+
+@njit(fastmath=True)
+def sample_volume(volume, p, period):
+    # Trilinear lookup of a baked volume at p, wrapped into one period
+    res = volume.shape[0]
+    s = res / period
+    i0, i1, tx = volume_cell(p[0] * s, res)
+    j0, j1, ty = volume_cell(p[1] * s, res)
+    k0, k1, tz = volume_cell(p[2] * s, res)
+    
+    # Along z first, the contiguous axis
+    c00 = volume[i0, j0, k0] + (volume[i0, j0, k1] - volume[i0, j0, k0]) * tz
+    c01 = volume[i0, j1, k0] + (volume[i0, j1, k1] - volume[i0, j1, k0]) * tz
+    c10 = volume[i1, j0, k0] + (volume[i1, j0, k1] - volume[i1, j0, k0]) * tz
+    c11 = volume[i1, j1, k0] + (volume[i1, j1, k1] - volume[i1, j1, k0]) * tz
+    c0 = c00 + (c01 - c00) * ty
+    c1 = c10 + (c11 - c10) * ty
+    return c0 + (c1 - c0) * tx
+
+def volume_bounds(volume, period):
+    """
+    Bounds (lo, hi, lipschitz) of sample_volume over a baked volume: its value
+    range and a bound on its gradient norm, for volume_displace. Along each axis
+    the trilinear lookup is steepest on the largest step between neighbours.
+    """
+    h = period / volume.shape[0]
+    slopes = [np.abs(np.roll(volume, -1, axis) - volume).max() / h for axis in range(3)]
+    return float(volume.min()), float(volume.max()), float(np.sqrt(np.sum(np.square(slopes))))
+
+@njit(fastmath=True)
+def volume_displace(d, volume, p, scale, period, amplitude, lo, hi, lipschitz):
+    # noise.fbm_displace with the noise read from a baked volume, lo, hi and
+    # lipschitz from volume_bounds
+    low, l, far = displace_bounds(amplitude, lo, hi, lipschitz, scale)
+    if d >= far:
+        return d + low
+    n = sample_volume(volume, (float(p[0]) * scale, float(p[1]) * scale, float(p[2]) * scale), period)
+    return max((d + n * amplitude) / l, d + low)
+
+def volume_path(octaves, seed, period, res, dtype):
+    # Cache file of a volume with these parameters
+    name = f"noise_v{NOISE_VERSION}_o{octaves}_s{seed}_p{period}_r{res}_{np.dtype(dtype).name}.npy"
+    return os.path.join(CACHE_DIR, name)
+
+def bake_noise_volume(octaves=3, seed=0, period=8, res=64, dtype=np.float32):
+    """
+    Returns the (res, res, res) float32 volume of fbm_tiled over one period,
+    for sample_volume. Baked on first use and cached in CACHE_DIR; dtype=np.float16
+    halves the file, the returned volume is float32 either way.
+    """
+    path = volume_path(octaves, seed, period, res, dtype)
+    if path in loaded_volumes:
+        return loaded_volumes[path]
+    
+    if os.path.exists(path):
+        volume = np.load(path).astype(np.float32)
+    else:
+        volume = np.empty((res, res, res), dtype=np.float32)
+        fill_volume(volume, octaves, period, seed)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename, so concurrent jobs never load a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, volume.astype(dtype))
+        os.replace(tmp_path, path)
+        volume = volume.astype(dtype).astype(np.float32)
+    
+    loaded_volumes[path] = volume
+    return volume
@@ -1,117 +1,321 @@
+import os
+import json
+import struct
+import hashlib
+import zipfile
 import yaml
 import numpy as np
+from kalpana3d.kernel_cache import CACHE_DIR
 
-def load_scene(filename):
-    with open(filename, 'r') as f:
-        data = yaml.safe_load(f)
-        
+# Scene files
+# A scene is a YAML document with a 'scene' mapping of primitive lists. Each
+# primitive type becomes a dict of float32 arrays, one per field, plus 'count'
+# (zero-length arrays for an empty list, {'count': 0} alone when the list is
+# missing). SCENE_FIELDS lists, per type, the
+# array name, the YAML key and the number of components of each field.
+# Parsed scenes are cached in CACHE_DIR as uncompressed .npz files keyed by the
+# scene file's path, size and mtime, so a repeated load skips YAML entirely.
+
+SCENE_FIELDS = {
+    'spheres': (('pos', 'p', 3), ('radius', 'r', 1)),
+    'capsules': (('a', 'a', 3), ('b', 'b', 3), ('radius', 'r', 1)),
+    'boxes': (('pos', 'p', 3), ('dims', 'b', 3)),
+    'round_cones': (('a', 'a', 3), ('b', 'b', 3), ('r1', 'r1', 1), ('r2', 'r2', 1)),
+    'torus': (('pos', 'p', 3), ('r_main', 'r_main', 1), ('r_tube', 'r_tube', 1)),
+}
+
+# Bump when the cached layout changes, so stale caches are not reused
+SCENE_CACHE_VERSION = 1
+
+# The libyaml-backed loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def scene_arrays(data):
+    # load_scene dicts from a parsed YAML document, one np.asarray per field
     scene_data = {}
-    
-    # Spheres
-    if 'spheres' in data['scene']:
-        items = data['scene']['spheres']
-        count = len(items)
-        pos = np.zeros((count, 3), dtype=np.float32)
-        radii = np.zeros(count, dtype=np.float32)
-        
-        for i, item in enumerate(items):
-            pos[i] = item['p']
-            radii[i] = item['r']
-            
-        scene_data['spheres'] = {
-            'pos': pos,
-            'radius': radii,
-            'count': count
-        }
-    else:
-        scene_data['spheres'] = {'count': 0}
-        
-    # Capsules
-    if 'capsules' in data['scene']:
-        items = data['scene']['capsules']
-        count = len(items)
-        a = np.zeros((count, 3), dtype=np.float32)
-        b = np.zeros((count, 3), dtype=np.float32)
-        radii = np.zeros(count, dtype=np.float32)
-        
-        for i, item in enumerate(items):
-            a[i] = item['a']
-            b[i] = item['b']
-            radii[i] = item['r']
-            
-        scene_data['capsules'] = {
-            'a': a,
-            'b': b,
-            'radius': radii,
-            'count': count
-        }
-    else:
-        scene_data['capsules'] = {'count': 0}
-        
-    # Boxes
-    if 'boxes' in data['scene']:
-        items = data['scene']['boxes']
-        count = len(items)
-        pos = np.zeros((count, 3), dtype=np.float32)
-        dims = np.zeros((count, 3), dtype=np.float32)
-        
-        for i, item in enumerate(items):
-            pos[i] = item['p']
-            dims[i] = item['b']
-            
-        scene_data['boxes'] = {
-            'pos': pos,
-            'dims': dims,
-            'count': count
-        }
-    else:
-        scene_data['boxes'] = {'count': 0}
-        
-    # Round Cones (Tapered Capsules)
-    if 'round_cones' in data['scene']:
-        items = data['scene']['round_cones']
-        count = len(items)
-        a = np.zeros((count, 3), dtype=np.float32)
-        b = np.zeros((count, 3), dtype=np.float32)
-        r1 = np.zeros(count, dtype=np.float32)
-        r2 = np.zeros(count, dtype=np.float32)
-        
-        for i, item in enumerate(items):
-            a[i] = item['a']
-            b[i] = item['b']
-            r1[i] = item['r1']
-            r2[i] = item['r2']
-            
-        scene_data['round_cones'] = {
-            'a': a,
-            'b': b,
-            'r1': r1,
-            'r2': r2,
-            'count': count
-        }
-    else:
-        scene_data['round_cones'] = {'count': 0}
-
-    # Torus
-    if 'torus' in data['scene']:
-        items = data['scene']['torus']
-        count = len(items)
-        pos = np.zeros((count, 3), dtype=np.float32)
-        r_main = np.zeros(count, dtype=np.float32)
-        r_tube = np.zeros(count, dtype=np.float32)
-        
-        for i, item in enumerate(items):
-            pos[i] = item['p']
-            r_main[i] = item['r_main']
-            r_tube[i] = item['r_tube']
-            
-        scene_data['torus'] = {
-            'pos': pos,
-            'r_main': r_main,
-            'r_tube': r_tube,
-            'count': count
-        }
+    for kind, fields in SCENE_FIELDS.items():
+        items = data['scene'].get(kind)
+        if items is None:
+            scene_data[kind] = {'count': 0}
+            continue
+        prims = {}
+        for name, key, width in fields:
+            values = np.asarray([item[key] for item in items], dtype=np.float32)
+            prims[name] = values.reshape(-1, width) if width > 1 else values
+        prims['count'] = len(items)
+        scene_data[kind] = prims
+    return scene_data
+
+def scene_cache_path(filename):
+    # Cache file of a scene file, by absolute path
+    digest = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"scene_{digest}.npz")
+
+def scene_cache_key(filename):
+    st = os.stat(filename)
+    return np.array([SCENE_CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def map_npz(path):
+    # Memory-maps every member of an uncompressed .npz (as written by np.savez)
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be mapped")
+            # The member data follows its local header: 30 bytes, name and extra field
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if 0 in shape:
+                arrays[info.filename[:-4]] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[info.filename[:-4]] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                                       order='F' if fortran else 'C')
+    return arrays
+
+def load_scene_cache(filename, mmap):
+    # Scene dicts from the cache of filename, None when missing or stale
+    path = scene_cache_path(filename)
+    if not os.path.exists(path):
+        return None
+    try:
+        if mmap:
+            arrays = map_npz(path)
+        else:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    if 'key' not in arrays or not np.array_equal(arrays['key'], scene_cache_key(filename)):
+        return None
+
+    scene_data = {}
+    for kind, fields in SCENE_FIELDS.items():
+        if f"{kind}.{fields[0][0]}" not in arrays:
+            scene_data[kind] = {'count': 0}
+            continue
+        prims = {name: arrays[f"{kind}.{name}"] for name, _, _ in fields}
+        prims['count'] = len(prims[fields[0][0]])
+        scene_data[kind] = prims
+    return scene_data
+
+def save_scene_cache(filename, key, scene_data):
+    arrays = {'key': key}
+    for kind, fields in SCENE_FIELDS.items():
+        if fields[0][0] in scene_data[kind]:
+            for name, _, _ in fields:
+                arrays[f"{kind}.{name}"] = scene_data[kind][name]
+    path = scene_cache_path(filename)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write then rename, so concurrent jobs never load a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+# Streaming scenes
+# For scenes with millions of primitives, stream_scene never holds the whole
+# document: primitives are read one at a time, either from YAML parser events
+# or from a JSON-lines file (.jsonl, one {"type": kind, key: value...} object
+# per line, see write_scene_jsonl). They are gathered in chunks of chunk_size
+# and each chunk is written with one np.asarray per field into growable float32
+# SoA buffers, so peak memory stays close to the final arrays.
+
+def yaml_scene_items(f):
+    # Yields (kind, item dict) for every primitive of a YAML scene, from parser events,
+    # and (kind, None) at the end of each kind list, so that empty lists are seen.
+    # A primitive is a mapping at depth 4: document mapping, 'scene', kind list, item.
+    # Only primitives are built, with their scalars left as strings for append_chunk;
+    # everything else is walked for its keys and dropped.
+    stack = []  # Containers being built, innermost last (None when not kept)
+    lists = []  # Whether each container is a sequence
+    keys = []   # Pending mapping key of each container (None for lists or when awaiting a key)
+    path = []   # Key of each container in its parent
+    for event in yaml.parse(f, Loader=YAML_LOADER):
+        if isinstance(event, yaml.AliasEvent):
+            raise ValueError("Aliases are not supported in streamed scenes")
+        if isinstance(event, yaml.ScalarEvent):
+            top = stack[-1]
+            if lists[-1]:
+                if top is not None:
+                    top.append(event.value)
+            elif keys[-1] is None:
+                keys[-1] = event.value
+            else:
+                if top is not None:
+                    top[keys[-1]] = event.value
+                keys[-1] = None
+        elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            is_list = isinstance(event, yaml.SequenceStartEvent)
+            path.append(keys[-1] if keys else None)
+            # Kept from the items of a known kind list down
+            kept = len(stack) >= 3 and path[1] == 'scene' and lists[2] and path[2] in SCENE_FIELDS
+            stack.append(([] if is_list else {}) if kept else None)
+            lists.append(is_list)
+            keys.append(None)
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            value = stack.pop()
+            is_list = lists.pop()
+            keys.pop()
+            key = path.pop()
+            if not stack:
+                continue
+            if not lists[-1]:
+                keys[-1] = None
+            if len(stack) == 3 and isinstance(value, dict):
+                yield path[2], value
+            elif len(stack) == 2 and is_list and path[1] == 'scene':
+                yield key, None
+            elif stack[-1] is not None:
+                if lists[-1]:
+                    stack[-1].append(value)
+                else:
+                    stack[-1][key] = value
+
+def jsonl_scene_items(f):
+    # Yields (kind, item dict) for every line of a JSON-lines scene
+    for line in f:
+        if line.strip():
+            item = json.loads(line)
+            yield item.pop('type'), item
+
+def write_scene_jsonl(scene, filename):
+    """
+    Writes a load_scene result as a JSON-lines scene, one primitive per line.
+    """
+    with open(filename, 'w') as f:
+        for kind, fields in SCENE_FIELDS.items():
+            prims = scene[kind]
+            for i in range(prims['count']):
+                item = {'type': kind}
+                for name, key, width in fields:
+                    item[key] = prims[name][i].tolist()
+                f.write(json.dumps(item) + '\n')
+
+def append_chunk(prims, fields, chunk):
+    # Appends a list of item dicts to the SoA buffers of one primitive type,
+    # growing them by half their size (at least the chunk) when full. Only the
+    # SCENE_FIELDS keys are read, and converted here (YAML items hold strings).
+    count = prims['count']
+    n = len(chunk)
+    capacity = len(prims[fields[0][0]])
+    if count + n > capacity:
+        capacity = max(count + n, capacity + capacity // 2)
+        for name, _, width in fields:
+            grown = np.empty((capacity, width) if width > 1 else capacity, dtype=np.float32)
+            grown[:count] = prims[name][:count]
+            prims[name] = grown
+    for name, key, width in fields:
+        values = np.asarray([item[key] for item in chunk], dtype=np.float32)
+        prims[name][count:count + n] = values.reshape(-1, width) if width > 1 else values
+    prims['count'] = count + n
+
+def stream_scene(filename, chunk_size=4096, capacity=None):
+    """
+    load_scene without building the document in memory: primitives are streamed
+    from a YAML scene (parser events) or a .jsonl scene and appended in chunks to
+    growable float32 SoA buffers. capacity optionally maps primitive types to an
+    expected count, preallocating their buffers.
+    """
+    capacity = capacity or {}
+    buffers = {}
+    chunks = {kind: [] for kind in SCENE_FIELDS}
+    # Types with a list in the file, even an empty one
+    listed = set()
+    for kind, fields in SCENE_FIELDS.items():
+        n = capacity.get(kind, 0)
+        buffers[kind] = {name: np.empty((n, width) if width > 1 else n, dtype=np.float32) for name, _, width in fields}
+        buffers[kind]['count'] = 0
+
+    with open(filename, 'rb' if not filename.endswith('.jsonl') else 'r') as f:
+        items = jsonl_scene_items(f) if filename.endswith('.jsonl') else yaml_scene_items(f)
+        for kind, item in items:
+            # Other lists are skipped, as by scene_arrays
+            if kind not in SCENE_FIELDS:
+                continue
+            listed.add(kind)
+            if item is None:
+                continue
+            chunk = chunks[kind]
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                append_chunk(buffers[kind], SCENE_FIELDS[kind], chunk)
+                chunk.clear()
+
+    scene_data = {}
+    for kind, fields in SCENE_FIELDS.items():
+        prims = buffers[kind]
+        if chunks[kind]:
+            append_chunk(prims, fields, chunks[kind])
+        count = prims['count']
+        if kind not in listed:
+            scene_data[kind] = {'count': 0}
+            continue
+        # Trim the spare capacity
+        scene_data[kind] = {name: prims[name] if len(prims[name]) == count else prims[name][:count].copy()
+                            for name, _, _ in fields}
+        scene_data[kind]['count'] = count
+    return scene_data
+
+def load_scene(filename, cache=True, mmap=False, stream=False):
+    """
+    Loads a YAML scene into per-primitive dicts of float32 arrays (see
+    SCENE_FIELDS). With cache, the arrays are stored in CACHE_DIR after the
+    first parse and reloaded from there until the file changes; mmap then
+    memory-maps them read-only instead of reading them. The first load of a
+    file therefore writes its cache there (~/.cache/kalpana3d unless
+    KALPANA3D_CACHE_DIR is set); pass cache=False to avoid it. stream parses
+    with stream_scene, which .jsonl scenes always use.
+    """
+    if cache:
+        scene_data = load_scene_cache(filename, mmap)
+        if scene_data is not None:
+            return scene_data
+        # Keyed before parsing, so an edit during the parse is not cached as current
+        key = scene_cache_key(filename)
+
+    if stream or filename.endswith('.jsonl'):
+        scene_data = stream_scene(filename)
     else:
-        scene_data['torus'] = {'count': 0}
-        
+        with open(filename, 'rb') as f:
+            data = yaml.load(f, Loader=YAML_LOADER)
+        scene_data = scene_arrays(data)
+
+    if cache:
+        save_scene_cache(filename, key, scene_data)
+        if mmap:
+            return load_scene_cache(filename, mmap) or scene_data
     return scene_data
+
+def bake_scene(scene):
+    """
+    Adds the per-primitive terms of the capsule and round cone SDFs to a
+    load_scene result, as extra arrays of the same primitive dicts:
+    capsules get 'ba' (b - a) and 'inv_baba' (1 / |ba|^2); round cones get
+    'ba', 'l2' (|ba|^2), 'rr' (r1 - r2), 'a2' (l2 - rr^2) and 'il2' (1 / l2).
+    All are float32, like the scene arrays. They feed sdCapsuleBaked /
+    sdRoundConeBaked. Returns scene.
+    """
+    caps = scene['capsules']
+    if caps['count'] > 0:
+        ba = caps['b'] - caps['a']
+        caps['ba'] = ba
+        caps['inv_baba'] = np.float32(1.0) / np.einsum('ij,ij->i', ba, ba)
+
+    rc = scene['round_cones']
+    if rc['count'] > 0:
+        ba = rc['b'] - rc['a']
+        l2 = np.einsum('ij,ij->i', ba, ba)
+        rr = rc['r1'] - rc['r2']
+        rc['ba'] = ba
+        rc['l2'] = l2
+        rc['rr'] = rr
+        rc['a2'] = l2 - rr * rr
+        rc['il2'] = np.float32(1.0) / l2
+
+    return scene
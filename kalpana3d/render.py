@@ -1,7 +1,10 @@
 import numpy as np
-from numba import njit, prange
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit, prange, parallel_chunksize
 from PIL import Image
 from kalpana3d.math_core import vec3, normalize, cross, dot
+from kalpana3d import math_scalar as ms
+from kalpana3d.kernel_cache import call_sdf, scene_kernels
 
 @njit(fastmath=True)
 def get_camera_ray(uv, ro, lookat, fov):
@@ -88,14 +91,669 @@ def render_kernel(width, height, ro, lookat, fov, sdf_func, output_buffer):
             output_buffer[y, x, 1] = col[1]
             output_buffer[y, x, 2] = col[2]
 
-def render_image(width, height, ro, lookat, fov, sdf_func, filename):
+# Scalar-triple kernels
+# Same as above, but every vector is an (x, y, z) tuple (see math_scalar), so
+# nothing is heap-allocated per ray or per step. sdf_func must accept triples,
+# e.g. one built from kalpana3d.sdf_scalar.
+
+@njit(fastmath=True)
+def get_camera_ray_scalar(uv_x, uv_y, ro, lookat, fov):
+    f = ms.normalize(ms.sub(lookat, ro))
+    # World up is usually Y
+    r = ms.normalize(ms.cross((0.0, 1.0, 0.0), f))
+    u = ms.cross(f, r)
+    
+    # Zoom factor
+    zoom = 1.0 / np.tan(np.radians(fov) / 2.0)
+    
+    # Point on the image plane relative to ro
+    i = ms.madd(ms.madd(ms.scale(f, zoom), r, uv_x), u, uv_y)
+    return ms.normalize(i)
+
+@njit(fastmath=True, inline='always')
+def calc_normal_scalar(p, sdf_func, params=None):
+    eps = 0.0001
+    # Central difference
+    x = call_sdf(sdf_func, (p[0] + eps, p[1], p[2]), params) - call_sdf(sdf_func, (p[0] - eps, p[1], p[2]), params)
+    y = call_sdf(sdf_func, (p[0], p[1] + eps, p[2]), params) - call_sdf(sdf_func, (p[0], p[1] - eps, p[2]), params)
+    z = call_sdf(sdf_func, (p[0], p[1], p[2] + eps), params) - call_sdf(sdf_func, (p[0], p[1], p[2] - eps), params)
+    return ms.normalize((x, y, z))
+
+@njit(fastmath=True, inline='always')
+def calc_normal_tetra(p, sdf_func, params=None):
+    # Tetrahedral difference: 4 evaluations at the corners (+-1, +-1, +-1) of
+    # a tetrahedron instead of 6 for central differences
+    eps = 0.0001
+    d0 = call_sdf(sdf_func, (p[0] + eps, p[1] - eps, p[2] - eps), params)
+    d1 = call_sdf(sdf_func, (p[0] - eps, p[1] - eps, p[2] + eps), params)
+    d2 = call_sdf(sdf_func, (p[0] - eps, p[1] + eps, p[2] - eps), params)
+    d3 = call_sdf(sdf_func, (p[0] + eps, p[1] + eps, p[2] + eps), params)
+    return ms.normalize((d0 - d1 - d2 + d3, -d0 - d1 + d2 + d3, -d0 + d1 - d2 + d3))
+
+@njit(fastmath=True, inline='always')
+def ray_march_scalar(ro, rd, sdf_func, params=None):
+    dO = 0.0
+    for i in range(256):
+        p = ms.madd(ro, rd, dO)
+        dS = call_sdf(sdf_func, p, params)
+        if dS < 0.001:
+            return dO
+        if dO > 100.0:
+            break
+        dO += dS
+    return 100.0
+
+# Normal modes: central differences (6 evaluations), tetrahedral differences
+# (4), or the gradient returned by a gradient SDF (1). A gradient SDF has the
+# form grad_func(p, params) -> (d, (gx, gy, gz)), see sdf_scalar and
+# noise.fbm_grad; the cached kernels of a scene SDF named f use f_grad from the
+# same module when it exists. Without one, NORMAL_GRADIENT falls back to NORMAL_TETRA.
+NORMAL_CENTRAL = 0
+NORMAL_TETRA = 1
+NORMAL_GRADIENT = 2
+
+# Sphere tracing settings: (max_steps, eps, far, omega, cone_pixels, normal_mode).
+# omega > 1 over-relaxes the steps; cone_pixels > 0 grows the hit threshold
+# with distance to that many pixel footprints, so distant and grazing rays stop
+# once they are within a pixel of the surface. TRACE_DEFAULT is the plain trace.
+TRACE_DEFAULT = (256, 0.001, 100.0, 1.0, 0.0, NORMAL_CENTRAL)
+TRACE_ENHANCED = (256, 0.001, 100.0, 1.6, 0.25, NORMAL_GRADIENT)
+
+@njit(fastmath=True, inline='always')
+def ray_march_enhanced(ro, rd, sdf_func, params, max_steps, eps, far, omega, cone, t0=0.0):
+    # Over-relaxed sphere tracing: steps are omega times the distance. A relaxed
+    # step is only safe while the unbounding spheres of consecutive points
+    # overlap; when they don't (or the point landed inside), the step is undone
+    # and replaced by the plain step, then relaxation resumes.
+    # The hit threshold is max(eps, cone * t). Tracing starts at t0, or at 0
+    # when t0 turns out to be inside the surface. Returns (t, steps), t = far on a miss.
+    t = t0
+    step = 0.0
+    prev_d = 0.0
+    relaxed = False
+    for i in range(max_steps):
+        p = ms.madd(ro, rd, t)
+        d = call_sdf(sdf_func, p, params)
+        if i == 0 and t0 > 0.0 and d < 0.0:
+            t = 0.0
+            continue
+        if relaxed and (d < 0.0 or d + prev_d < step):
+            t += prev_d - step
+            step = prev_d
+            relaxed = False
+            continue
+        if d < max(eps, cone * t):
+            return t, i + 1
+        if t > far:
+            return far, i + 1
+        relaxed = omega > 1.0
+        step = d * omega if relaxed else d
+        prev_d = d
+        t += step
+    return far, max_steps
+
+@njit(fastmath=True, inline='always')
+def render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                 max_steps, eps, far, omega, cone, normal_mode, t0=0.0, depth=None, normals=None, grad_func=None):
+    # Shades pixel (x, y) into output_buffer, returns the trace steps.
+    # depth and normals, when given, receive the hit distance (far on a miss)
+    # and the surface normal.
+    light_pos = (2.0, 4.0, 3.0)
+    uv_y = -((y / height) * 2.0 - 1.0) # Flip Y so 0 is top
+    uv_x = ((x / width) * 2.0 - 1.0) * (width / height)
+    
+    rd = get_camera_ray_scalar(uv_x, uv_y, ro_t, lookat_t, fov)
+    d, steps = ray_march_enhanced(ro_t, rd, sdf_func, params, max_steps, eps, far, omega, cone, t0)
+    if depth is not None:
+        depth[y, x] = d
+    
+    # Background color
+    col_r = 0.1
+    col_g = 0.1
+    col_b = 0.15
+    
+    if d < far:
+        p = ms.madd(ro_t, rd, d)
+        if normal_mode == NORMAL_CENTRAL:
+            n = calc_normal_scalar(p, sdf_func, params)
+        elif grad_func is not None and normal_mode == NORMAL_GRADIENT:
+            n = ms.normalize(call_sdf(grad_func, p, params)[1])
+        else:
+            n = calc_normal_tetra(p, sdf_func, params)
+        if normals is not None:
+            normals[y, x, 0] = n[0]
+            normals[y, x, 1] = n[1]
+            normals[y, x, 2] = n[2]
+        
+        # Simple lighting, white material
+        l = ms.normalize(ms.sub(light_pos, p))
+        diff = max(ms.dot(n, l), 0.0)
+        ambient = 0.1
+        col_r = diff + ambient
+        col_g = col_r
+        col_b = col_r
+    
+    # Clamp
+    output_buffer[y, x, 0] = min(max(col_r, 0.0), 1.0)
+    output_buffer[y, x, 1] = min(max(col_g, 0.0), 1.0)
+    output_buffer[y, x, 2] = min(max(col_b, 0.0), 1.0)
+    return steps
+
+@njit(fastmath=True, inline='always')
+def pixel_cone(fov, height, cone_pixels):
+    # Width of cone_pixels pixels per unit of distance along the ray
+    return cone_pixels * 2.0 * np.tan(np.radians(fov) / 2.0) / height
+
+@njit(fastmath=True, inline='always')
+def render_row_scalar(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params=None,
+                      trace=TRACE_DEFAULT, step_counts=None, grad_func=None):
+    # One image row; params, when given, is passed on as sdf_func(p, params).
+    # grad_func, when given, is the gradient SDF used by NORMAL_GRADIENT.
+    # step_counts, when given, is (height, width) and receives the trace steps per pixel.
+    max_steps, eps, far, omega, cone_pixels, normal_mode = trace
+    cone = pixel_cone(fov, height, cone_pixels)
+    for x in range(width):
+        steps = render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                             max_steps, eps, far, omega, cone, normal_mode, grad_func=grad_func)
+        if step_counts is not None:
+            step_counts[y, x] = steps
+
+@njit(fastmath=True, parallel=True)
+def render_kernel_scalar(width, height, ro, lookat, fov, sdf_func, output_buffer, trace=TRACE_DEFAULT, step_counts=None,
+                         grad_func=None):
+    # output_buffer is (height, width, 3); ro and lookat may be vec3 or triples.
+    # trace, step_counts and grad_func as in render_row_scalar.
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for y in prange(height):
+        render_row_scalar(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, None, trace, step_counts,
+                          grad_func)
+
+# Tiled rendering
+# Rows through the object cost many times more than rows of sky, so splitting
+# the frame by rows leaves threads idle. The frame is cut into tile_size square
+# tiles instead, handed out in a shuffled order (see tile_order) one at a time,
+# so expensive tiles are spread over all threads. Each tile adds its total
+# trace steps to a cost map of shape (tiles down, tiles across).
+
+TILE_SIZE = 16
+
+def tile_order(width, height, tile_size=TILE_SIZE, seed=0):
+    """
+    Origins (x0, y0) of the tiles covering a width x height frame, as an
+    (N, 2) int64 array in a shuffled order.
+    """
+    ys, xs = np.mgrid[0:height:tile_size, 0:width:tile_size]
+    tiles = np.stack([xs.ravel(), ys.ravel()], axis=1).astype(np.int64)
+    return tiles[np.random.default_rng(seed).permutation(len(tiles))]
+
+def cost_map_shape(width, height, tile_size=TILE_SIZE):
+    # Shape of the per-tile cost map of a width x height frame
+    return (-(-height // tile_size), -(-width // tile_size))
+
+@njit(fastmath=True, inline='always')
+def render_tile(x0, y0, tile_size, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params=None,
+                trace=TRACE_DEFAULT, step_counts=None, grad_func=None):
+    # Renders the tile at (x0, y0), clipped to the frame; returns its total trace steps
+    max_steps, eps, far, omega, cone_pixels, normal_mode = trace
+    cone = pixel_cone(fov, height, cone_pixels)
+    cost = 0
+    for y in range(y0, min(y0 + tile_size, height)):
+        for x in range(x0, min(x0 + tile_size, width)):
+            steps = render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                                 max_steps, eps, far, omega, cone, normal_mode, grad_func=grad_func)
+            if step_counts is not None:
+                step_counts[y, x] = steps
+            cost += steps
+    return cost
+
+@njit(fastmath=True, parallel=True)
+def render_kernel_tiled(width, height, ro, lookat, fov, sdf_func, output_buffer, tiles, tile_size, cost_map,
+                        trace=TRACE_DEFAULT, step_counts=None, grad_func=None):
+    # render_kernel_scalar over the tiles of tile_order; cost_map has cost_map_shape
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for i in prange(tiles.shape[0]):
+        x0 = tiles[i, 0]
+        y0 = tiles[i, 1]
+        cost_map[y0 // tile_size, x0 // tile_size] = render_tile(x0, y0, tile_size, width, height, ro_t, lookat_t, fov,
+                                                                 sdf_func, output_buffer, None, trace, step_counts,
+                                                                 grad_func)
+
+# Multi-view rendering
+# Many cameras of one scene (e.g. a turntable) are traced in a single parallel
+# launch over (view, tile) pairs, so threads stay busy across view boundaries.
+# Views are rendered views_per_launch at a time into one arena holding two such
+# batches: while one batch is traced, the PNGs of the previous one are encoded
+# on a thread pool.
+
+def view_tile_order(views, width, height, tile_size=TILE_SIZE, seed=0):
+    """
+    (view, x0, y0) of every tile of views frames, as an (N, 3) int64 array
+    in a shuffled order.
+    """
+    tiles = tile_order(width, height, tile_size, seed)
+    view_tiles = np.empty((views * len(tiles), 3), dtype=np.int64)
+    view_tiles[:, 0] = np.repeat(np.arange(views), len(tiles))
+    view_tiles[:, 1:] = np.tile(tiles, (views, 1))
+    return view_tiles[np.random.default_rng(seed).permutation(len(view_tiles))]
+
+@njit(fastmath=True, inline='always')
+def render_view_tile(i, view_tiles, tile_size, width, height, cameras, fov, sdf_func, arena, cost_map, params=None,
+                     trace=TRACE_DEFAULT, grad_func=None):
+    # Tile i of view_tiles; cameras is (views, 2, 3) of (ro, lookat), arena (views, height, width, 3)
+    v = view_tiles[i, 0]
+    x0 = view_tiles[i, 1]
+    y0 = view_tiles[i, 2]
+    ro_t = ms.v3(cameras[v, 0, 0], cameras[v, 0, 1], cameras[v, 0, 2])
+    lookat_t = ms.v3(cameras[v, 1, 0], cameras[v, 1, 1], cameras[v, 1, 2])
+    cost_map[v, y0 // tile_size, x0 // tile_size] = render_tile(x0, y0, tile_size, width, height, ro_t, lookat_t, fov,
+                                                                sdf_func, arena[v], params, trace, None, grad_func)
+
+@njit(fastmath=True, parallel=True)
+def render_views_kernel(width, height, cameras, fov, sdf_func, arena, view_tiles, tile_size, cost_map,
+                        trace=TRACE_DEFAULT, grad_func=None):
+    # Every tile of view_tiles for an SDF taking triples
+    for i in prange(view_tiles.shape[0]):
+        render_view_tile(i, view_tiles, tile_size, width, height, cameras, fov, sdf_func, arena, cost_map,
+                         None, trace, grad_func)
+
+def turntable_cameras(views, radius, height, lookat):
+    """
+    (ro, lookat) pairs for views cameras evenly spaced on a circle of radius
+    around lookat, height above it, as a (views, 2, 3) array.
+    """
+    angles = 2.0 * np.pi * np.arange(views) / views
+    cameras = np.empty((views, 2, 3))
+    cameras[:, 0, 0] = lookat[0] + radius * np.sin(angles)
+    cameras[:, 0, 1] = lookat[1] + height
+    cameras[:, 0, 2] = lookat[2] + radius * np.cos(angles)
+    cameras[:, 1] = lookat
+    return cameras
+
+def render_views(cameras, width, height, fov, sdf_func, filenames, sdf_params=None, trace=TRACE_DEFAULT,
+                 tile_size=TILE_SIZE, views_per_launch=8, workers=4):
+    """
+    Renders each camera (ro, lookat) of cameras to the matching entry of
+    filenames, for an SDF taking triples or a scene SDF with sdf_params.
+    Returns the per-tile trace costs, shape (views,) + cost_map_shape.
+    """
+    cameras = np.asarray(cameras, dtype=np.float64).reshape(-1, 2, 3)
+    if len(filenames) != len(cameras):
+        raise ValueError(f"{len(cameras)} cameras but {len(filenames)} filenames")
+    views = len(cameras)
+    batch = max(1, min(views_per_launch, views))
+    arena = np.zeros((2, batch, height, width, 3), dtype=np.float32)
+    cost_maps = np.zeros((views,) + cost_map_shape(width, height, tile_size), dtype=np.int64)
+    kernel = scene_kernels(sdf_func).render_views if sdf_params is not None else None
+    
+    pending = ([], [])
+    with ThreadPoolExecutor(max_workers=workers) as pool, parallel_chunksize(1):
+        for b, start in enumerate(range(0, views, batch)):
+            count = min(batch, views - start)
+            half = arena[b % 2]
+            # The half is reused once its previous images are written
+            for future in pending[b % 2]:
+                future.result()
+            view_tiles = view_tile_order(count, width, height, tile_size, seed=b)
+            if kernel is not None:
+                kernel(width, height, cameras[start:start + count], fov, sdf_params, half, view_tiles, tile_size,
+                       cost_maps[start:start + count], trace)
+            else:
+                render_views_kernel(width, height, cameras[start:start + count], fov, sdf_func, half, view_tiles,
+                                    tile_size, cost_maps[start:start + count], trace)
+            pending[b % 2][:] = [pool.submit(save_image, half[j], filenames[start + j]) for j in range(count)]
+        for future in pending[0] + pending[1]:
+            future.result()
+    return cost_maps
+
+# Progressive rendering
+# A preview is traced on a coarse grid of every scale-th pixel, then the grid
+# is halved level by level down to every pixel. A pixel new to a level lies in
+# a cell of the previous level's samples: when the cell corners agree (all miss,
+# or all hit with normals within normal_cos of each other) its color, depth and
+# normal are interpolated from them; otherwise it is traced, starting at
+# seed_fraction of the nearest corner hit. After each level every sample fills
+# its scale x scale block, so the buffer is always a complete image.
+
+@njit(fastmath=True, inline='always')
+def render_level_row(gy, scale, first, width, height, ro_t, lookat_t, fov, sdf_func, params, trace,
+                     normal_cos, seed_fraction, output_buffer, depth, normals, grad_func=None):
+    # Samples of row gy of level scale; returns how many were traced
+    max_steps, eps, far, omega, cone_pixels, normal_mode = trace
+    cone = pixel_cone(fov, height, cone_pixels)
+    y = gy * scale
+    coarse = 2 * scale
+    traced = 0
+    for x in range(0, width, scale):
+        if first:
+            render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                         max_steps, eps, far, omega, cone, normal_mode, 0.0, depth, normals, grad_func)
+            traced += 1
+            continue
+        if x % coarse == 0 and y % coarse == 0:
+            continue
+        
+        # Corners of the enclosing cell of the previous level
+        x0 = x - x % coarse
+        y0 = y - y % coarse
+        x1 = x0 + coarse if x0 + coarse < width else x0
+        y1 = y0 + coarse if y0 + coarse < height else y0
+        hits = 0
+        t_min = far
+        agree = True
+        for cy in (y0, y1):
+            for cx in (x0, x1):
+                if depth[cy, cx] < far:
+                    hits += 1
+                    t_min = min(t_min, depth[cy, cx])
+                    c = (normals[cy, cx, 0] * normals[y0, x0, 0] + normals[cy, cx, 1] * normals[y0, x0, 1]
+                         + normals[cy, cx, 2] * normals[y0, x0, 2])
+                    if c < normal_cos:
+                        agree = False
+        
+        if hits == 0 or (hits == 4 and agree):
+            fx = (x - x0) / coarse if x1 > x0 else 0.0
+            fy = (y - y0) / coarse if y1 > y0 else 0.0
+            w00 = (1.0 - fx) * (1.0 - fy)
+            w10 = fx * (1.0 - fy)
+            w01 = (1.0 - fx) * fy
+            w11 = fx * fy
+            for c in range(3):
+                output_buffer[y, x, c] = (w00 * output_buffer[y0, x0, c] + w10 * output_buffer[y0, x1, c]
+                                          + w01 * output_buffer[y1, x0, c] + w11 * output_buffer[y1, x1, c])
+                normals[y, x, c] = (w00 * normals[y0, x0, c] + w10 * normals[y0, x1, c]
+                                    + w01 * normals[y1, x0, c] + w11 * normals[y1, x1, c])
+            depth[y, x] = far if hits == 0 else (w00 * depth[y0, x0] + w10 * depth[y0, x1]
+                                                 + w01 * depth[y1, x0] + w11 * depth[y1, x1])
+        else:
+            t0 = t_min * seed_fraction if hits > 0 else 0.0
+            render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                         max_steps, eps, far, omega, cone, normal_mode, t0, depth, normals, grad_func)
+            traced += 1
+    return traced
+
+@njit(fastmath=True, parallel=True, cache=True)
+def fill_level_blocks(output_buffer, scale):
+    # Every sample of level scale fills its scale x scale block
+    height, width = output_buffer.shape[0], output_buffer.shape[1]
+    for gy in prange(-(-height // scale)):
+        y = gy * scale
+        for x in range(0, width, scale):
+            for by in range(y, min(y + scale, height)):
+                for bx in range(x, min(x + scale, width)):
+                    if by != y or bx != x:
+                        output_buffer[by, bx, 0] = output_buffer[y, x, 0]
+                        output_buffer[by, bx, 1] = output_buffer[y, x, 1]
+                        output_buffer[by, bx, 2] = output_buffer[y, x, 2]
+
+@njit(fastmath=True, parallel=True)
+def render_level_kernel(width, height, ro, lookat, fov, sdf_func, scale, first, output_buffer, depth, normals,
+                        trace=TRACE_DEFAULT, normal_cos=0.9, seed_fraction=0.9, grad_func=None):
+    # One progressive level for an SDF taking triples; returns the traced pixel count
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    rows = -(-height // scale)
+    counts = np.zeros(rows, dtype=np.int64)
+    for gy in prange(rows):
+        counts[gy] = render_level_row(gy, scale, first, width, height, ro_t, lookat_t, fov, sdf_func, None, trace,
+                                      normal_cos, seed_fraction, output_buffer, depth, normals, grad_func)
+    return counts.sum()
+
+def render_progressive(width, height, ro, lookat, fov, sdf_func, sdf_params=None, start_scale=8,
+                       trace=TRACE_DEFAULT, normal_cos=0.9, seed_fraction=0.9):
+    """
+    Progressive render of an SDF taking triples, or of a scene SDF with
+    sdf_params. Yields (output_buffer, scale, traced) after each level, from
+    every start_scale-th pixel (a power of two) down to every pixel. The same
+    (height, width, 3) buffer is refined in place; copy it to keep a level.
+    traced is the number of rays traced for that level.
+    """
+    if start_scale < 1 or start_scale & (start_scale - 1):
+        raise ValueError(f"start_scale must be a power of two, got {start_scale}")
     output_buffer = np.zeros((height, width, 3), dtype=np.float32)
+    depth = np.zeros((height, width), dtype=np.float32)
+    normals = np.zeros((height, width, 3), dtype=np.float32)
     
-    # Numba will compile render_kernel for the specific sdf_func
-    render_kernel(width, height, ro, lookat, fov, sdf_func, output_buffer)
+    scale = start_scale
+    first = True
+    while scale >= 1:
+        if sdf_params is not None:
+            traced = scene_kernels(sdf_func).render_level(width, height, ro, lookat, fov, sdf_params, scale, first,
+                                                          output_buffer, depth, normals, trace, normal_cos, seed_fraction)
+        else:
+            traced = render_level_kernel(width, height, ro, lookat, fov, sdf_func, scale, first,
+                                         output_buffer, depth, normals, trace, normal_cos, seed_fraction)
+        if scale > 1:
+            fill_level_blocks(output_buffer, scale)
+        yield output_buffer, scale, traced
+        scale //= 2
+        first = False
+
+# Animation
+# Consecutive frames see mostly the same surfaces, so each frame keeps its depth
+# buffer and the next one starts its rays there: the hit points are projected
+# into the new camera (reproject_depth) and each pixel starts at seed_fraction
+# of the depth projected to it, or of the nearest one around it. Pixels that
+# nothing projects to (misses, disocclusions, new parts of the frame) and seeds
+# that land inside the surface are traced from the camera.
+
+@njit(fastmath=True, cache=True)
+def reproject_depth(depth, ro_prev, lookat_prev, ro, lookat, fov, far, seed_fraction, seed):
+    # depth of the previous camera to start distances seed for the new one
+    height, width = depth.shape
+    aspect = width / height
+    zoom = 1.0 / np.tan(np.radians(fov) / 2.0)
+    f = ms.normalize(ms.sub(lookat, ro))
+    r = ms.normalize(ms.cross((0.0, 1.0, 0.0), f))
+    u = ms.cross(f, r)
+    ro_p = ms.v3(ro_prev[0], ro_prev[1], ro_prev[2])
+    lookat_p = ms.v3(lookat_prev[0], lookat_prev[1], lookat_prev[2])
     
+    # far marks pixels nothing projects to (fastmath assumes no infinities)
+    splat = np.full((height, width), far, dtype=np.float32)
+    for y in range(height):
+        for x in range(width):
+            t = depth[y, x]
+            if t >= far:
+                continue
+            uv_y = -((y / height) * 2.0 - 1.0)
+            uv_x = ((x / width) * 2.0 - 1.0) * aspect
+            rd = get_camera_ray_scalar(uv_x, uv_y, ro_p, lookat_p, fov)
+            v = ms.sub(ms.madd(ro_p, rd, t), ro)
+            cz = ms.dot(v, f)
+            if cz <= 0.0:
+                continue
+            nx = int(np.floor(((zoom * ms.dot(v, r) / cz) / aspect + 1.0) * 0.5 * width + 0.5))
+            ny = int(np.floor((1.0 - zoom * ms.dot(v, u) / cz) * 0.5 * height + 0.5))
+            if 0 <= nx < width and 0 <= ny < height:
+                splat[ny, nx] = min(splat[ny, nx], ms.length(v))
+    
+    # Nearest depth of the 3x3 neighbourhood, which also closes splatting gaps
+    for y in range(height):
+        for x in range(width):
+            t = splat[y, x]
+            if t >= far:
+                for sy in range(max(y - 1, 0), min(y + 2, height)):
+                    for sx in range(max(x - 1, 0), min(x + 2, width)):
+                        t = min(t, splat[sy, sx])
+            seed[y, x] = t * seed_fraction if t < far else 0.0
+
+@njit(fastmath=True, inline='always')
+def render_seeded_row(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params, trace,
+                      seed, depth, step_counts, grad_func=None):
+    # One image row with rays starting at seed, keeping depth and step_counts
+    max_steps, eps, far, omega, cone_pixels, normal_mode = trace
+    cone = pixel_cone(fov, height, cone_pixels)
+    for x in range(width):
+        step_counts[y, x] = render_pixel(x, y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, params,
+                                         max_steps, eps, far, omega, cone, normal_mode, seed[y, x], depth, None,
+                                         grad_func)
+
+@njit(fastmath=True, parallel=True)
+def render_seeded_kernel(width, height, ro, lookat, fov, sdf_func, output_buffer, seed, depth, step_counts,
+                         trace=TRACE_DEFAULT, grad_func=None):
+    # One animation frame for an SDF taking triples
+    ro_t = ms.v3(ro[0], ro[1], ro[2])
+    lookat_t = ms.v3(lookat[0], lookat[1], lookat[2])
+    for y in prange(height):
+        render_seeded_row(y, width, height, ro_t, lookat_t, fov, sdf_func, output_buffer, None, trace,
+                          seed, depth, step_counts, grad_func)
+
+def render_animation(cameras, width, height, fov, sdf_func, sdf_params=None, frame_params=None,
+                     trace=TRACE_DEFAULT, seed_fraction=0.95):
+    """
+    Renders one frame per camera (ro, lookat), each starting its rays at the
+    reprojected depth of the previous frame. frame_params, when given, holds
+    the scene SDF params of every frame (e.g. tapes of a twist sweep) in place
+    of sdf_params. Yields (output_buffer, step_counts) per frame; both buffers
+    are reused, copy them to keep a frame.
+    """
+    far = trace[2]
+    output_buffer = np.zeros((height, width, 3), dtype=np.float32)
+    step_counts = np.zeros((height, width), dtype=np.int32)
+    depth = np.zeros((height, width), dtype=np.float32)
+    seed = np.zeros((height, width), dtype=np.float32)
+    
+    prev = None
+    for i, (ro, lookat) in enumerate(cameras):
+        ro = np.asarray(ro, dtype=np.float64)
+        lookat = np.asarray(lookat, dtype=np.float64)
+        if prev is not None:
+            reproject_depth(depth, prev[0], prev[1], ro, lookat, fov, far, seed_fraction, seed)
+        params = frame_params[i] if frame_params is not None else sdf_params
+        if params is not None:
+            scene_kernels(sdf_func).render_seeded(width, height, ro, lookat, fov, params, output_buffer,
+                                                  seed, depth, step_counts, trace)
+        else:
+            render_seeded_kernel(width, height, ro, lookat, fov, sdf_func, output_buffer,
+                                 seed, depth, step_counts, trace)
+        yield output_buffer, step_counts
+        prev = (ro, lookat)
+
+# Batched rendering
+# Ray packets are marched together: each step evaluates every active ray with a
+# single call of a batched SDF, batch_func(points, out), as built from
+# kalpana3d.sdf_batch. Mirrors render_kernel, vectorized with NumPy.
+
+def camera_rays(width, height, ro, lookat, fov):
+    # (height * width, 3) ray directions, same pixel mapping as render_kernel
+    f = lookat - ro
+    f = f / np.linalg.norm(f)
+    r = np.cross(np.array([0.0, 1.0, 0.0]), f)
+    r = r / np.linalg.norm(r)
+    u = np.cross(f, r)
+    zoom = 1.0 / np.tan(np.radians(fov) / 2.0)
+    
+    ys, xs = np.mgrid[0:height, 0:width]
+    uv_y = -((ys / height) * 2.0 - 1.0)
+    uv_x = ((xs / width) * 2.0 - 1.0) * (width / height)
+    rd = f * zoom + uv_x[..., None] * r + uv_y[..., None] * u
+    rd /= np.linalg.norm(rd, axis=-1, keepdims=True)
+    return rd.reshape(-1, 3).astype(np.float32)
+
+def ray_march_batch(ro, rds, batch_func, max_steps=256, eps=0.001, far=100.0):
+    # Distances along rds (N, 3) to the surface, far for misses
+    t = np.zeros(len(rds), dtype=np.float32)
+    active = np.arange(len(rds))
+    d = np.empty(len(rds), dtype=np.float32)
+    
+    for _ in range(max_steps):
+        if len(active) == 0:
+            break
+        p = ro + rds[active] * t[active, None]
+        batch_func(p.astype(np.float32), d[:len(active)])
+        d_active = d[:len(active)]
+        
+        hit = d_active < eps
+        escaped = ~hit & (t[active] > far)
+        t[active[escaped]] = far
+        keep = ~hit & ~escaped
+        active = active[keep]
+        t[active] += d_active[keep]
+        
+    t[active] = far
+    return t
+
+def calc_normals_batch(points, batch_func, eps=0.0001):
+    # Central-difference normals for (N, 3) points, all 6N samples in one call
+    n = len(points)
+    offsets = np.zeros((6, 1, 3), dtype=np.float32)
+    for k in range(3):
+        offsets[2 * k, 0, k] = eps
+        offsets[2 * k + 1, 0, k] = -eps
+    samples = (points[None, :, :] + offsets).reshape(-1, 3)
+    d = np.empty(6 * n, dtype=np.float32)
+    batch_func(samples, d)
+    d = d.reshape(6, n)
+    g = np.stack([d[0] - d[1], d[2] - d[3], d[4] - d[5]], axis=1)
+    l = np.linalg.norm(g, axis=1, keepdims=True)
+    return np.divide(g, l, out=np.zeros_like(g), where=l > 1e-8)
+
+def render_batch(width, height, ro, lookat, fov, batch_func, output_buffer):
+    # render_kernel for a batched SDF
+    rds = camera_rays(width, height, ro, lookat, fov)
+    t = ray_march_batch(ro, rds, batch_func)
+    
+    col = np.empty((len(rds), 3), dtype=np.float32)
+    col[:] = (0.1, 0.1, 0.15) # Background color
+    
+    hit = np.nonzero(t < 100.0)[0]
+    p = (ro + rds[hit] * t[hit, None]).astype(np.float32)
+    n = calc_normals_batch(p, batch_func)
+    
+    # Simple lighting, white material
+    l = np.array([2.0, 4.0, 3.0], dtype=np.float32) - p
+    l /= np.linalg.norm(l, axis=1, keepdims=True)
+    diff = np.maximum((n * l).sum(axis=1), 0.0)
+    col[hit] = (diff + 0.1)[:, None]
+    
+    output_buffer[:] = np.clip(col, 0.0, 1.0).reshape(height, width, 3)
+
+def save_image(output_buffer, filename):
     # Convert to uint8
     img_data = (output_buffer * 255).astype(np.uint8)
     img = Image.fromarray(img_data)
     img.save(filename)
     print(f"Saved {filename}")
+
+def render_image(width, height, ro, lookat, fov, sdf_func, filename, scalar=False, batch=False, sdf_params=None,
+                 trace=TRACE_DEFAULT, step_counts=None, tile_size=TILE_SIZE, cost_map=None):
+    # scalar=True renders with render_kernel_scalar, for SDFs taking triples;
+    # batch=True renders with render_batch, for batched SDFs (points, out);
+    # sdf_params renders a scene SDF sdf_func(p, sdf_params) with its
+    # disk-cached kernel (see kernel_cache).
+    # The last two render in tiles of tile_size (0 renders by rows), cost_map
+    # (cost_map_shape) receives the trace steps per tile. trace (e.g.
+    # TRACE_ENHANCED) and step_counts apply to them as well.
+    output_buffer = np.zeros((height, width, 3), dtype=np.float32)
+    
+    if (trace != TRACE_DEFAULT or step_counts is not None or cost_map is not None) and not (scalar or sdf_params is not None):
+        raise ValueError("trace settings need scalar=True or sdf_params")
+    if cost_map is not None and tile_size <= 0:
+        raise ValueError("cost_map needs tiled rendering")
+    
+    if batch:
+        render_batch(width, height, ro, lookat, fov, sdf_func, output_buffer)
+    elif tile_size > 0 and (scalar or sdf_params is not None):
+        tiles = tile_order(width, height, tile_size)
+        if cost_map is None:
+            cost_map = np.zeros(cost_map_shape(width, height, tile_size), dtype=np.int64)
+        # One tile per chunk, so threads take the next tile as they finish
+        with parallel_chunksize(1):
+            if sdf_params is not None:
+                scene_kernels(sdf_func).render_tiles(width, height, ro, lookat, fov, sdf_params, output_buffer,
+                                                     tiles, tile_size, cost_map, trace, step_counts)
+            else:
+                render_kernel_tiled(width, height, ro, lookat, fov, sdf_func, output_buffer,
+                                    tiles, tile_size, cost_map, trace, step_counts)
+    elif sdf_params is not None:
+        scene_kernels(sdf_func).render_kernel(width, height, ro, lookat, fov, sdf_params, output_buffer,
+                                              trace, step_counts)
+    elif scalar:
+        render_kernel_scalar(width, height, ro, lookat, fov, sdf_func, output_buffer, trace, step_counts)
+    else:
+        # Numba will compile render_kernel for the specific sdf_func
+        render_kernel(width, height, ro, lookat, fov, sdf_func, output_buffer)
+    
+    save_image(output_buffer, filename)
@@ -0,0 +1,174 @@
+import numpy as np
+from numba import njit
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.math_core import vec3
+from kalpana3d.noise import fbm_displace, fbm_displace_grad
+from kalpana3d.noise_volume import bake_noise_volume, volume_bounds, volume_displace
+from kalpana3d.kernel_cache import scene_kernels
+from kalpana3d.render import tile_order, view_tile_order, cost_map_shape, fill_level_blocks, TILE_SIZE, TRACE_DEFAULT
+from kalpana3d.accel import build_bvh, bvh_distance
+from kalpana3d.tape import OP_ROUND_CONE
+from kalpana3d.parser import bake_scene
+from kalpana3d.mesher import mesh_grid, mesh_grid_indexed, slab_offsets, emit_planes, fill_blocks
+
+# Scene SDFs
+# Module-level SDFs of the form sdf_func(p, params): the scene structure is the
+# code, the scene data comes in through params as arrays. Unlike closures over
+# the data, these compile once and are cached on disk by kernel_cache; pass
+# them with sdf_params=params to render_image and the mesher drivers.
+
+@njit(fastmath=True)
+def tree_sdf(p, params):
+    # params = (a, b, r1, r2) round cone arrays, see tree_params
+    rc_a, rc_b, rc_r1, rc_r2 = params
+    p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+
+    d = 1000.0
+    for i in range(rc_r1.shape[0]):
+        d_branch = sdfs.sdRoundCone(p_twisted, rc_a[i], rc_b[i], rc_r1[i], rc_r2[i])
+        if i == 0:
+            d = d_branch
+        else:
+            d = sdfs.opSmoothUnion(d, d_branch, 0.2)
+
+    # Bark detail, a small displacement (Lipschitz-bounded, skipped far away)
+    return fbm_displace(d, p_twisted, 4.0, 3, 0.02)
+
+def tree_params(scene):
+    # tree_sdf params from the round cones of a load_scene result
+    rc = scene['round_cones']
+    return (rc['a'], rc['b'], rc['r1'], rc['r2'])
+
+@njit(fastmath=True)
+def tree_baked_sdf(p, params):
+    # tree_sdf on baked round cones, see tree_baked_params
+    rc_a, rc_ba, rc_l2, rc_rr, rc_a2, rc_il2, rc_r1, rc_r2 = params
+    p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+
+    d = 1000.0
+    for i in range(rc_r1.shape[0]):
+        d_branch = sdfs.sdRoundConeBaked(p_twisted, rc_a[i], rc_ba[i], rc_l2[i], rc_rr[i],
+                                         rc_a2[i], rc_il2[i], rc_r1[i], rc_r2[i])
+        if i == 0:
+            d = d_branch
+        else:
+            d = sdfs.opSmoothUnion(d, d_branch, 0.2)
+
+    # Bark detail, a small displacement (Lipschitz-bounded, skipped far away)
+    return fbm_displace(d, p_twisted, 4.0, 3, 0.02)
+
+@njit(fastmath=True)
+def tree_baked_sdf_grad(p, params):
+    # tree_baked_sdf and its gradient, for NORMAL_GRADIENT normals
+    rc_a, rc_ba, rc_l2, rc_rr, rc_a2, rc_il2, rc_r1, rc_r2 = params
+    p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+
+    d = 1000.0
+    g = (0.0, 0.0, 0.0)
+    for i in range(rc_r1.shape[0]):
+        d_branch, g_branch = sdfs.sdRoundConeBakedGrad(p_twisted, rc_a[i], rc_ba[i], rc_l2[i], rc_rr[i],
+                                                       rc_a2[i], rc_il2[i], rc_r1[i], rc_r2[i])
+        if i == 0:
+            d = d_branch
+            g = g_branch
+        else:
+            d, g = sdfs.opSmoothUnionGrad(d, g, d_branch, g_branch, 0.2)
+
+    # Bark detail
+    d, g = fbm_displace_grad(d, g, p_twisted, 4.0, 3, 0.02)
+
+    return d, sdfs.opTwistGrad(p, 0.5, g)
+
+def tree_baked_params(scene):
+    # tree_baked_sdf params from a load_scene result, baked if needed
+    rc = scene['round_cones']
+    if 'il2' not in rc:
+        bake_scene(scene)
+    return (rc['a'], rc['ba'], rc['l2'], rc['rr'], rc['a2'], rc['il2'], rc['r1'], rc['r2'])
+
+@njit(fastmath=True)
+def tree_volume_sdf(p, params):
+    # tree_baked_sdf with the bark read from a baked noise volume, see tree_volume_params
+    rc_a, rc_ba, rc_l2, rc_rr, rc_a2, rc_il2, rc_r1, rc_r2, volume, period, lo, hi, lipschitz = params
+    p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+
+    d = 1000.0
+    for i in range(rc_r1.shape[0]):
+        d_branch = sdfs.sdRoundConeBaked(p_twisted, rc_a[i], rc_ba[i], rc_l2[i], rc_rr[i],
+                                         rc_a2[i], rc_il2[i], rc_r1[i], rc_r2[i])
+        if i == 0:
+            d = d_branch
+        else:
+            d = sdfs.opSmoothUnion(d, d_branch, 0.2)
+
+    # Bark detail, one trilinear fetch
+    return volume_displace(d, volume, p_twisted, 4.0, period, 0.02, lo, hi, lipschitz)
+
+def tree_volume_params(scene, seed=0, period=8, res=64):
+    # tree_volume_sdf params: baked round cones and the bark volume (cached on disk)
+    volume = bake_noise_volume(3, seed, period, res)
+    return tree_baked_params(scene) + (volume, float(period)) + volume_bounds(volume, period)
+
+@njit(fastmath=True)
+def tree_bvh_sdf(p, params):
+    # tree_sdf with the branches looked up in a BVH, see tree_bvh_params.
+    # Cost grows with log(branches) instead of branches.
+    p_twisted = sdfs.opTwist(p, 0.5) # Gentle twist
+    d = bvh_distance(p_twisted, params)
+
+    # Bark detail, a small displacement (Lipschitz-bounded, skipped far away)
+    return fbm_displace(d, p_twisted, 4.0, 3, 0.02)
+
+def tree_bvh_params(scene, leaf_size=4):
+    # tree_bvh_sdf params: BVH over the round cones of a load_scene result
+    rc = scene['round_cones']
+    cones = [(OP_ROUND_CONE, np.concatenate([rc['a'][i], rc['b'][i], [rc['r1'][i], rc['r2'][i]]]))
+             for i in range(rc['count'])]
+    return build_bvh(cones, smooth=0.2, leaf_size=leaf_size)
+
+def warmup(sdf_func=tree_sdf, params=None):
+    """
+    Compiles (or loads from the disk cache) the render and meshing kernels for a
+    scene SDF and the grid meshing kernels, on a tiny problem.
+    params defaults to a single round cone, matching tree_sdf.
+    """
+    if params is None:
+        params = (np.zeros((1, 3), dtype=np.float32), np.array([[0.0, 1.0, 0.0]], dtype=np.float32),
+                  np.array([0.2], dtype=np.float32), np.array([0.1], dtype=np.float32))
+    kernels = scene_kernels(sdf_func)
+
+    ro = vec3(0.0, 0.5, 2.0)
+    lookat = vec3(0.0, 0.5, 0.0)
+    output_buffer = np.zeros((2, 2, 3), dtype=np.float32)
+    # Same argument types as render_image and render_progressive pass
+    kernels.render_kernel(2, 2, ro, lookat, 60.0, params, output_buffer, TRACE_DEFAULT, None)
+    tiles = tile_order(2, 2)
+    kernels.render_tiles(2, 2, ro, lookat, 60.0, params, output_buffer, tiles, TILE_SIZE,
+                         np.zeros(cost_map_shape(2, 2), dtype=np.int64), TRACE_DEFAULT, None)
+    kernels.render_level(2, 2, ro, lookat, 60.0, params, 1, True, output_buffer,
+                         np.zeros((2, 2), dtype=np.float32), np.zeros((2, 2, 3), dtype=np.float32),
+                         TRACE_DEFAULT, 0.9, 0.9)
+    fill_level_blocks(output_buffer, 2)
+    kernels.render_views(2, 2, np.zeros((1, 2, 3)), 60.0, params, output_buffer[None], view_tile_order(1, 2, 2),
+                         TILE_SIZE, np.zeros((1,) + cost_map_shape(2, 2), dtype=np.int64), TRACE_DEFAULT)
+    frame = np.zeros((2, 2), dtype=np.float32)
+    kernels.render_seeded(2, 2, np.zeros(3), np.ones(3), 60.0, params, output_buffer, frame, frame,
+                          np.zeros((2, 2), dtype=np.int32), TRACE_DEFAULT)
+
+    min_bound = vec3(-1.0, -1.0, -1.0)
+    max_bound = vec3(1.0, 1.0, 1.0)
+    res = np.array([8, 8, 8], dtype=np.int64)
+    step = ((max_bound - min_bound) / res.astype(np.float32)).astype(np.float32)
+    grid = np.empty((9, 9, 9), dtype=np.float32)
+    kernels.sample_planes(min_bound, step, 0, 8, 8, params, grid)
+
+    origins = np.zeros((1, 3), dtype=np.int64)
+    vals = np.empty(1, dtype=np.float32)
+    kernels.classify_blocks(min_bound, step, res, origins, 8, params, 0.0, 0.0, vals)
+    fill_blocks(grid, origins[:0], 8, vals[:0])
+    kernels.sample_blocks(min_bound, step, origins, 8, np.ones((1, 1, 1), dtype=np.bool_), params, grid)
+
+    mesh_grid(grid, min_bound, max_bound, 0.0)
+    mesh_grid_indexed(grid, min_bound, max_bound, 0.0)
+    offsets = slab_offsets(grid, 0.0, 1)
+    emit_planes(grid, 0, min_bound, step, 0.0, offsets, np.empty((offsets[-1], 3, 3), dtype=np.float32), 0)
@@ -18,7 +18,8 @@ def sdBox(p, b):
 
 @njit(fastmath=True)
 def sdCylinder(p, h, r):
-    d_x = length(np.array([p[0], p[2]], dtype=np.float32)) - r
+    # Length in the xz plane (length() reads 3 components)
+    d_x = np.float32(np.sqrt(p[0]*p[0] + p[2]*p[2])) - r
     d_y = np.abs(p[1]) - h
     d_x_clamped = max(d_x, 0.0)
     d_y_clamped = max(d_y, 0.0)
@@ -70,7 +71,7 @@ def sdRoundCone(p, a, b, r1, r2):
 
 @njit(fastmath=True)
 def sdTorus(p, r_main, r_tube):
-    q_x = length(np.array([p[0], p[2]], dtype=np.float32)) - r_main
+    q_x = np.float32(np.sqrt(p[0]*p[0] + p[2]*p[2])) - r_main
     q_y = p[1]
     return np.sqrt(q_x*q_x + q_y*q_y) - r_tube
 
@@ -0,0 +1,89 @@
+import numpy as np
+from numba import njit, prange
+from kalpana3d import sdf_scalar as ss
+
+# Batched versions of kalpana3d.sdf.
+# Primitives take an (N, 3) float32 array of points and fill an (N,) output,
+# operators combine (N,) distance arrays element-wise and space modifiers fill
+# an (N, 3) array of transformed points. Every loop runs under prange and
+# evaluates the allocation-free sdf_scalar forms.
+
+@njit(fastmath=True, parallel=True)
+def eval_sdf(sdf_func, points, out):
+    # Any single-point SDF (vec3 or triple based) over a batch of points
+    for i in prange(points.shape[0]):
+        out[i] = sdf_func(points[i])
+
+@njit(fastmath=True, parallel=True)
+def sdSphere(points, r, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdSphere(points[i], r)
+
+@njit(fastmath=True, parallel=True)
+def sdBox(points, b, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdBox(points[i], b)
+
+@njit(fastmath=True, parallel=True)
+def sdCylinder(points, h, r, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdCylinder(points[i], h, r)
+
+@njit(fastmath=True, parallel=True)
+def sdCapsule(points, a, b, r, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdCapsule(points[i], a, b, r)
+
+@njit(fastmath=True, parallel=True)
+def sdRoundCone(points, a, b, r1, r2, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdRoundCone(points[i], a, b, r1, r2)
+
+@njit(fastmath=True, parallel=True)
+def sdTorus(points, r_main, r_tube, out):
+    for i in prange(points.shape[0]):
+        out[i] = ss.sdTorus(points[i], r_main, r_tube)
+
+@njit(fastmath=True, parallel=True)
+def opUnion(d1, d2, out):
+    for i in prange(d1.shape[0]):
+        out[i] = min(d1[i], d2[i])
+
+@njit(fastmath=True, parallel=True)
+def opSubtraction(d1, d2, out):
+    for i in prange(d1.shape[0]):
+        out[i] = max(-d1[i], d2[i])
+
+@njit(fastmath=True, parallel=True)
+def opIntersection(d1, d2, out):
+    for i in prange(d1.shape[0]):
+        out[i] = max(d1[i], d2[i])
+
+@njit(fastmath=True, parallel=True)
+def opSmoothUnion(d1, d2, k, out):
+    for i in prange(d1.shape[0]):
+        out[i] = ss.opSmoothUnion(d1[i], d2[i], k)
+
+# Space Folding / Modifiers
+
+@njit(fastmath=True, parallel=True)
+def opTwist(points, k, out):
+    for i in prange(points.shape[0]):
+        q = ss.opTwist(points[i], k)
+        out[i, 0] = q[0]
+        out[i, 1] = q[1]
+        out[i, 2] = q[2]
+
+@njit(fastmath=True, parallel=True)
+def opBend(points, k, out):
+    for i in prange(points.shape[0]):
+        q = ss.opBend(points[i], k)
+        out[i, 0] = q[0]
+        out[i, 1] = q[1]
+        out[i, 2] = q[2]
+
+@njit(fastmath=True, parallel=True)
+def opTaper(points, k, out):
+    # Placeholder, prefer RoundCone
+    for i in prange(points.shape[0]):
+        out[i] = points[i]
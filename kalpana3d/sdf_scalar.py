@@ -0,0 +1,247 @@
+import numpy as np
+from numba import njit
+from kalpana3d.math_scalar import dot, length, sub, scale, mix
+
+# Allocation-free versions of kalpana3d.sdf.
+# Points are (x, y, z) triples (see math_scalar); vec3 arrays are accepted too.
+# Space modifiers return triples.
+
+@njit(fastmath=True)
+def sdSphere(p, r):
+    return length(p) - r
+
+@njit(fastmath=True)
+def sdBox(p, b):
+    q_x = abs(p[0]) - b[0]
+    q_y = abs(p[1]) - b[1]
+    q_z = abs(p[2]) - b[2]
+    max_q_x = max(q_x, 0.0)
+    max_q_y = max(q_y, 0.0)
+    max_q_z = max(q_z, 0.0)
+    len_max_q = np.sqrt(max_q_x*max_q_x + max_q_y*max_q_y + max_q_z*max_q_z)
+    inner = min(max(q_x, max(q_y, q_z)), 0.0)
+    return len_max_q + inner
+
+@njit(fastmath=True)
+def sdCylinder(p, h, r):
+    d_x = np.sqrt(p[0]*p[0] + p[2]*p[2]) - r
+    d_y = abs(p[1]) - h
+    d_x_clamped = max(d_x, 0.0)
+    d_y_clamped = max(d_y, 0.0)
+    dist_exterior = np.sqrt(d_x_clamped*d_x_clamped + d_y_clamped*d_y_clamped)
+    dist_interior = min(max(d_x, d_y), 0.0)
+    return dist_exterior + dist_interior
+
+# Capsules and round cones are evaluated by their baked variants: the terms
+# that only depend on the primitive are passed in, precomputed once per scene
+# by kalpana3d.parser.bake_scene, or per call by sdCapsule and sdRoundCone
+
+@njit(fastmath=True)
+def sdCapsuleBaked(p, a, ba, inv_baba, r):
+    # ba = b - a, inv_baba = 1 / dot(ba, ba)
+    pa = sub(p, a)
+    h = dot(pa, ba) * inv_baba
+    h = min(max(h, 0.0), 1.0)
+    return length(sub(pa, scale(ba, h))) - r
+
+@njit(fastmath=True)
+def sdRoundConeBaked(p, a, ba, l2, rr, a2, il2, r1, r2):
+    # ba = b - a, l2 = dot(ba, ba), rr = r1 - r2, a2 = l2 - rr*rr, il2 = 1 / l2
+    pa = sub(p, a)
+    y = dot(pa, ba)
+    z = y - l2
+    
+    v = sub(scale(pa, l2), scale(ba, y))
+    x2 = dot(v, v)
+    y2 = y*y*l2
+    z2 = z*z*l2
+    
+    k = np.sign(rr)*rr*rr*x2
+    
+    if np.sign(z)*a2*z2 > k:
+        return np.sqrt(x2 + z2) * il2 - r2
+    
+    if np.sign(y)*a2*y2 < k:
+        return np.sqrt(x2 + y2) * il2 - r1
+        
+    return (np.sqrt(x2*a2*il2) + y*rr) * il2 - r1
+
+@njit(fastmath=True)
+def sdCapsule(p, a, b, r):
+    ba = sub(b, a)
+    return sdCapsuleBaked(p, a, ba, 1.0 / dot(ba, ba), r)
+
+@njit(fastmath=True)
+def sdRoundCone(p, a, b, r1, r2):
+    # a, b: start and end points
+    # r1, r2: start and end radii
+    ba = sub(b, a)
+    l2 = dot(ba, ba)
+    rr = r1 - r2
+    return sdRoundConeBaked(p, a, ba, l2, rr, l2 - rr*rr, 1.0 / l2, r1, r2)
+
+@njit(fastmath=True)
+def sdTorus(p, r_main, r_tube):
+    q_x = np.sqrt(p[0]*p[0] + p[2]*p[2]) - r_main
+    q_y = p[1]
+    return np.sqrt(q_x*q_x + q_y*q_y) - r_tube
+
+@njit(fastmath=True)
+def opUnion(d1, d2):
+    return min(d1, d2)
+
+@njit(fastmath=True)
+def opSubtraction(d1, d2):
+    return max(-d1, d2)
+
+@njit(fastmath=True)
+def opIntersection(d1, d2):
+    return max(d1, d2)
+
+@njit(fastmath=True)
+def opSmoothUnion(d1, d2, k):
+    h = max(k - abs(d1 - d2), 0.0) / k
+    return min(d1, d2) - h*h*k*(1.0/4.0)
+
+# Space Folding / Modifiers
+
+@njit(fastmath=True)
+def opTwist(p, k):
+    c = np.cos(k * p[1])
+    s = np.sin(k * p[1])
+    # Rotate xz
+    return (c * p[0] - s * p[2], float(p[1]), s * p[0] + c * p[2])
+
+@njit(fastmath=True)
+def opBend(p, k):
+    c = np.cos(k * p[0])
+    s = np.sin(k * p[0])
+    # Rotate xy
+    return (c * p[0] - s * p[1], s * p[0] + c * p[1], float(p[2]))
+
+@njit(fastmath=True)
+def opTaper(p, k):
+    # Placeholder, prefer RoundCone
+    return (float(p[0]), float(p[1]), float(p[2]))
+
+# Gradient variants
+# Return (d, g) with g the gradient of d at p as a triple, so a normal costs one
+# evaluation instead of 4-6 (see render.NORMAL_GRADIENT). Combiners take and
+# return (d, g) pairs; opTwistGrad pulls a gradient taken in twisted space back
+# to p.
+
+@njit(fastmath=True)
+def sdSphereGrad(p, r):
+    l = length(p)
+    inv = 1.0 / l if l > 1e-12 else 0.0
+    return l - r, scale(p, inv)
+
+@njit(fastmath=True)
+def sdBoxGrad(p, b):
+    q_x = abs(p[0]) - b[0]
+    q_y = abs(p[1]) - b[1]
+    q_z = abs(p[2]) - b[2]
+    s_x = 1.0 if p[0] >= 0.0 else -1.0
+    s_y = 1.0 if p[1] >= 0.0 else -1.0
+    s_z = 1.0 if p[2] >= 0.0 else -1.0
+    m = max(q_x, max(q_y, q_z))
+    if m > 0.0:
+        max_q_x = max(q_x, 0.0)
+        max_q_y = max(q_y, 0.0)
+        max_q_z = max(q_z, 0.0)
+        l = np.sqrt(max_q_x*max_q_x + max_q_y*max_q_y + max_q_z*max_q_z)
+        inv = 1.0 / l
+        return l, (s_x * max_q_x * inv, s_y * max_q_y * inv, s_z * max_q_z * inv)
+    # Inside: the nearest face
+    if m == q_x:
+        return m, (s_x, 0.0, 0.0)
+    if m == q_y:
+        return m, (0.0, s_y, 0.0)
+    return m, (0.0, 0.0, s_z)
+
+@njit(fastmath=True)
+def sdCapsuleGrad(p, a, b, r):
+    pa = sub(p, a)
+    ba = sub(b, a)
+    h = dot(pa, ba) / dot(ba, ba)
+    h = min(max(h, 0.0), 1.0)
+    v = sub(pa, scale(ba, h))
+    l = length(v)
+    inv = 1.0 / l if l > 1e-12 else 0.0
+    return l - r, scale(v, inv)
+
+@njit(fastmath=True)
+def sdRoundConeBakedGrad(p, a, ba, l2, rr, a2, il2, r1, r2):
+    # sdRoundConeBaked and its gradient
+    pa = sub(p, a)
+    y = dot(pa, ba)
+    z = y - l2
+    
+    v = sub(scale(pa, l2), scale(ba, y))
+    x2 = dot(v, v)
+    y2 = y*y*l2
+    z2 = z*z*l2
+    
+    k = np.sign(rr)*rr*rr*x2
+    
+    if np.sign(z)*a2*z2 > k:
+        # Sphere around b
+        pb = sub(pa, ba)
+        l = length(pb)
+        inv = 1.0 / l if l > 1e-12 else 0.0
+        return np.sqrt(x2 + z2) * il2 - r2, scale(pb, inv)
+    
+    if np.sign(y)*a2*y2 < k:
+        # Sphere around a
+        l = length(pa)
+        inv = 1.0 / l if l > 1e-12 else 0.0
+        return np.sqrt(x2 + y2) * il2 - r1, scale(pa, inv)
+    
+    # Cone side: v is perpendicular to ba, and the gradient of x2 is 2 * l2 * v
+    sx = np.sqrt(x2*a2*il2)
+    w = sx * l2 / x2 if x2 > 1e-24 else 0.0
+    g = ((w * v[0] + rr * ba[0]) * il2, (w * v[1] + rr * ba[1]) * il2, (w * v[2] + rr * ba[2]) * il2)
+    return (sx + y*rr) * il2 - r1, g
+
+@njit(fastmath=True)
+def sdRoundConeGrad(p, a, b, r1, r2):
+    ba = sub(b, a)
+    l2 = dot(ba, ba)
+    rr = r1 - r2
+    return sdRoundConeBakedGrad(p, a, ba, l2, rr, l2 - rr*rr, 1.0 / l2, r1, r2)
+
+@njit(fastmath=True)
+def sdTorusGrad(p, r_main, r_tube):
+    l_xz = np.sqrt(p[0]*p[0] + p[2]*p[2])
+    q_x = l_xz - r_main
+    q_y = p[1]
+    l = np.sqrt(q_x*q_x + q_y*q_y)
+    inv = 1.0 / l if l > 1e-12 else 0.0
+    inv_xz = 1.0 / l_xz if l_xz > 1e-12 else 0.0
+    return l - r_tube, (q_x * inv * p[0] * inv_xz, q_y * inv, q_x * inv * p[2] * inv_xz)
+
+@njit(fastmath=True)
+def opUnionGrad(d1, g1, d2, g2):
+    if d1 < d2:
+        return d1, g1
+    return d2, g2
+
+@njit(fastmath=True)
+def opSmoothUnionGrad(d1, g1, d2, g2, k):
+    # The blend weighs the farther gradient by h / 2
+    h = max(k - abs(d1 - d2), 0.0) / k
+    w = 0.5 * h
+    if d1 < d2:
+        return d1 - h*h*k*(1.0/4.0), mix(g1, g2, w)
+    return d2 - h*h*k*(1.0/4.0), mix(g2, g1, w)
+
+@njit(fastmath=True)
+def opTwistGrad(p, k, g):
+    # Gradient at p of f(opTwist(p, k)), given g, the gradient of f at opTwist(p, k)
+    c = np.cos(k * p[1])
+    s = np.sin(k * p[1])
+    q_x = c * p[0] - s * p[2]
+    q_z = s * p[0] + c * p[2]
+    return (c * g[0] + s * g[2],
+            g[1] + k * (q_x * g[2] - q_z * g[0]),
+            c * g[2] - s * g[0])
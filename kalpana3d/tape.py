@@ -0,0 +1,139 @@
+import numpy as np
+from numba import njit
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d import math_scalar as ms
+from kalpana3d.noise import fbm_displace
+
+# Scene tape
+# A scene is a flat list of instructions run by one interpreter, so any scene
+# renders and meshes with the same compiled kernel. The tape is (code, consts):
+# code is an (N, 2) int32 array of (opcode, offset into consts) and consts a
+# float32 array of operands. The interpreter keeps three registers: the current
+# point q, the accumulated distance d and the last primitive distance dp.
+# Primitives set dp, combiners fold dp into d, modifiers transform q or d.
+# eval_tape has the sdf_func(p, params) form, so tapes use the disk-cached
+# kernels of kernel_cache (pass sdf_params=tape).
+
+# Primitives, dp = distance at q. Operands:
+OP_SPHERE = 0       # center (3), r
+OP_BOX = 1          # center (3), half size (3)
+OP_CAPSULE = 2      # a (3), b (3), r
+OP_ROUND_CONE = 3   # a (3), b (3), r1, r2
+OP_TORUS = 4        # center (3), r_main, r_tube
+# Combiners, d = op(d, dp). d starts far away, so the first combine yields dp.
+OP_UNION = 10
+OP_SMOOTH_UNION = 11    # k
+OP_SUBTRACTION = 12     # d = max(-dp, d), cuts the last primitive out of d
+OP_INTERSECTION = 13
+# Modifiers
+OP_TWIST = 20       # k; q = twist(q) for the instructions that follow
+OP_FBM = 21         # scale, octaves, amplitude; d += fbm(q * scale) * amplitude, see noise.fbm_displace
+
+# Operand count of every opcode
+OPERANDS = {
+    OP_SPHERE: 4, OP_BOX: 6, OP_CAPSULE: 7, OP_ROUND_CONE: 8, OP_TORUS: 5,
+    OP_UNION: 0, OP_SMOOTH_UNION: 1, OP_SUBTRACTION: 0, OP_INTERSECTION: 0,
+    OP_TWIST: 1, OP_FBM: 3,
+}
+
+FAR = 1e10
+
+@njit(fastmath=True)
+def eval_primitive(op, q, consts, o):
+    # Distance from q to primitive op with operands consts[o:]
+    if op == OP_SPHERE:
+        return sdfs.sdSphere(ms.sub(q, consts[o:o + 3]), consts[o + 3])
+    elif op == OP_BOX:
+        return sdfs.sdBox(ms.sub(q, consts[o:o + 3]), consts[o + 3:o + 6])
+    elif op == OP_CAPSULE:
+        return sdfs.sdCapsule(q, consts[o:o + 3], consts[o + 3:o + 6], consts[o + 6])
+    elif op == OP_ROUND_CONE:
+        return sdfs.sdRoundCone(q, consts[o:o + 3], consts[o + 3:o + 6], consts[o + 6], consts[o + 7])
+    elif op == OP_TORUS:
+        return sdfs.sdTorus(ms.sub(q, consts[o:o + 3]), consts[o + 3], consts[o + 4])
+    return FAR
+
+@njit(fastmath=True)
+def eval_tape(p, tape):
+    code, consts = tape
+    q = ms.v3(p[0], p[1], p[2])
+    d = FAR
+    dp = FAR
+    for i in range(code.shape[0]):
+        op = code[i, 0]
+        o = code[i, 1]
+        if op < OP_UNION:
+            dp = eval_primitive(op, q, consts, o)
+        elif op == OP_UNION:
+            d = sdfs.opUnion(d, dp)
+        elif op == OP_SMOOTH_UNION:
+            d = sdfs.opSmoothUnion(d, dp, consts[o])
+        elif op == OP_SUBTRACTION:
+            d = sdfs.opSubtraction(dp, d)
+        elif op == OP_INTERSECTION:
+            d = sdfs.opIntersection(d, dp)
+        elif op == OP_TWIST:
+            q = sdfs.opTwist(q, consts[o])
+        elif op == OP_FBM:
+            d = fbm_displace(d, q, consts[o], int(consts[o + 1]), consts[o + 2])
+    return d
+
+def assemble(instructions):
+    """
+    Builds a tape from a list of (opcode, operands) pairs.
+    """
+    code = np.zeros((len(instructions), 2), dtype=np.int32)
+    consts = []
+    for i, (op, operands) in enumerate(instructions):
+        operands = np.asarray(operands, dtype=np.float32).ravel()
+        if len(operands) != OPERANDS[op]:
+            raise ValueError(f"Opcode {op} takes {OPERANDS[op]} operands, got {len(operands)}")
+        code[i] = (op, len(consts))
+        consts.extend(operands)
+    return code, np.array(consts, dtype=np.float32)
+
+def scene_primitives(scene):
+    """
+    Lists the primitives of a load_scene result as (opcode, operands) pairs,
+    spheres, capsules, boxes, round cones then torus.
+    """
+    primitives = []
+    def add(op, *operands):
+        primitives.append((op, np.concatenate([np.ravel(v) for v in operands])))
+
+    s = scene['spheres']
+    for i in range(s['count']):
+        add(OP_SPHERE, s['pos'][i], s['radius'][i])
+    c = scene['capsules']
+    for i in range(c['count']):
+        add(OP_CAPSULE, c['a'][i], c['b'][i], c['radius'][i])
+    b = scene['boxes']
+    for i in range(b['count']):
+        add(OP_BOX, b['pos'][i], b['dims'][i])
+    rc = scene['round_cones']
+    for i in range(rc['count']):
+        add(OP_ROUND_CONE, rc['a'][i], rc['b'][i], rc['r1'][i], rc['r2'][i])
+    t = scene['torus']
+    for i in range(t['count']):
+        add(OP_TORUS, t['pos'][i], t['r_main'][i], t['r_tube'][i])
+    return primitives
+
+def compile_scene(scene, smooth=0.0, twist=0.0, fbm_amplitude=0.0, fbm_scale=4.0, fbm_octaves=3):
+    """
+    Compiles a load_scene result into a tape: every primitive, in the parser's
+    order, joined by union (smooth union with k=smooth when smooth > 0).
+    twist is applied to the point first; fbm_amplitude > 0 adds bark-style
+    fbm displacement at the end.
+    """
+    instructions = []
+    if twist != 0.0:
+        instructions.append((OP_TWIST, [twist]))
+
+    join = (OP_SMOOTH_UNION, [smooth]) if smooth > 0.0 else (OP_UNION, [])
+    for primitive in scene_primitives(scene):
+        instructions.append(primitive)
+        instructions.append(join)
+
+    if fbm_amplitude != 0.0:
+        instructions.append((OP_FBM, [fbm_scale, fbm_octaves, fbm_amplitude]))
+    return assemble(instructions)
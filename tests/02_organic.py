@@ -7,7 +7,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from kalpana3d.math_core import vec3
 from kalpana3d.sdf import sdSphere, opSmoothUnion
-from kalpana3d.noise import fbm
+from kalpana3d.noise import fbm_displace
 from kalpana3d.render import render_image
 
 @njit(fastmath=True)
@@ -20,14 +20,8 @@ def scene_sdf(p):
     d = opSmoothUnion(s1, s2, 0.5)
     
     # Add noise
-    # Use fbm for texture
-    # Ensure p is float32
-    n = fbm(p * 2.0, 3)
-    
-    # Displacement
-    d += n * 0.1
-    
-    return d
+    # Use fbm for texture, scaled down so the field stays safe to trace
+    return fbm_displace(d, p, 2.0, 3, 0.1)
 
 def main():
     width = 640
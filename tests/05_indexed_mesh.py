@@ -0,0 +1,53 @@
+import sys
+import os
+import numpy as np
+from numba import njit
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.sdf import sdSphere, opSmoothUnion
+from kalpana3d.noise import fbm
+from kalpana3d.mesher import generate_indexed_mesh, generate_mesh_cached
+from kalpana3d.export import export_obj
+
+@njit(fastmath=True)
+def scene_sdf(p):
+    # Same as Phase 3
+    s1 = sdSphere(p - vec3(-0.8, 0.0, 0.0), 1.0)
+    s2 = sdSphere(p - vec3(0.8, 0.0, 0.0), 0.8)
+    d = opSmoothUnion(s1, s2, 0.5)
+    n = fbm(p * 2.0, 3)
+    d += n * 0.1
+    return d
+
+def main():
+    min_bound = vec3(-2.5, -2.0, -2.0)
+    max_bound = vec3(2.5, 2.0, 2.0)
+    res = 64
+    resolution = vec3(res, res, res)
+    iso_level = 0.0
+    
+    print("Indexed meshing...")
+    start_time = time.time()
+    vertices, faces = generate_indexed_mesh(min_bound, max_bound, resolution, scene_sdf, iso_level)
+    print(f"Meshing took {time.time() - start_time:.2f} seconds.")
+    print(f"{len(faces)} triangles, {len(vertices)} vertices.")
+    
+    # Every face must reference a valid vertex
+    assert faces.min() >= 0 and faces.max() < len(vertices)
+    
+    # Welded output must describe the same surface as the triangle soup
+    soup = generate_mesh_cached(min_bound, max_bound, resolution, scene_sdf, iso_level)
+    assert len(soup) == len(faces) * 3
+    err = np.abs(vertices[faces].reshape(-1, 3) - soup).max()
+    print(f"Max deviation from triangle soup: {err:.2e}")
+    print(f"Vertex reduction: {len(soup) / len(vertices):.2f}x")
+    
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../gallery/models'))
+    os.makedirs(output_dir, exist_ok=True)
+    export_obj(vertices, os.path.join(output_dir, 'organic_indexed.obj'), faces)
+
+if __name__ == "__main__":
+    main()
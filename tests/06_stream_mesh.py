@@ -0,0 +1,55 @@
+import sys
+import os
+import numpy as np
+from numba import njit
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.sdf import sdSphere, opSmoothUnion
+from kalpana3d.noise import fbm
+from kalpana3d.mesher import iter_mesh_bricks, generate_indexed_mesh
+from kalpana3d.export import export_obj_stream
+
+@njit(fastmath=True)
+def scene_sdf(p):
+    # Same as Phase 3
+    s1 = sdSphere(p - vec3(-0.8, 0.0, 0.0), 1.0)
+    s2 = sdSphere(p - vec3(0.8, 0.0, 0.0), 0.8)
+    d = opSmoothUnion(s1, s2, 0.5)
+    n = fbm(p * 2.0, 3)
+    d += n * 0.1
+    return d
+
+def main():
+    min_bound = vec3(-2.5, -2.0, -2.0)
+    max_bound = vec3(2.5, 2.0, 2.0)
+    res = 64
+    resolution = vec3(res, res, res)
+    iso_level = 0.0
+    
+    # Small bricks so that plenty of seams are crossed
+    print("Brick meshing...")
+    start_time = time.time()
+    chunks = list(iter_mesh_bricks(min_bound, max_bound, resolution, scene_sdf, iso_level, brick_size=24))
+    print(f"Meshing took {time.time() - start_time:.2f} seconds ({len(chunks)} chunks).")
+    
+    vertices = np.concatenate([c[0] for c in chunks])
+    faces = np.concatenate([c[1] for c in chunks])
+    assert faces.min() >= 0 and faces.max() < len(vertices)
+    
+    # Seam vertices are shared, so the totals match the single-grid mesher
+    ref_vertices, ref_faces = generate_indexed_mesh(min_bound, max_bound, resolution, scene_sdf, iso_level)
+    print(f"Bricks: {len(faces)} triangles, {len(vertices)} vertices")
+    print(f"Grid:   {len(ref_faces)} triangles, {len(ref_vertices)} vertices")
+    assert len(vertices) == len(ref_vertices)
+    assert len(faces) == len(ref_faces)
+    
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../gallery/models'))
+    os.makedirs(output_dir, exist_ok=True)
+    chunks = iter_mesh_bricks(min_bound, max_bound, resolution, scene_sdf, iso_level, brick_size=24)
+    export_obj_stream(chunks, os.path.join(output_dir, 'organic_stream.obj'))
+
+if __name__ == "__main__":
+    main()
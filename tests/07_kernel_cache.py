@@ -0,0 +1,88 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import numpy as np
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_sdf, tree_params, warmup
+from kalpana3d.kernel_cache import scene_kernels
+from kalpana3d.render import render_kernel_scalar
+from kalpana3d.mesher import generate_mesh_sparse, generate_indexed_mesh
+from final_demo import make_tree_sdf_scalar
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Warms up the tree kernels and prints the disk cache hits of each generated kernel used
+WARMUP_SCRIPT = '''
+import sys, json
+sys.path.insert(0, sys.argv[1])
+from numba.core.registry import CPUDispatcher
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_sdf, tree_params, warmup
+from kalpana3d.kernel_cache import scene_kernels
+warmup(tree_sdf, tree_params(load_scene(sys.argv[2], cache=False)))
+kernels = scene_kernels(tree_sdf)
+print(json.dumps({name: sum(k.stats.cache_hits.values()) for name, k in vars(kernels).items()
+                  if isinstance(k, CPUDispatcher) and k.py_func.__module__ == kernels.__name__ and k.signatures}))
+'''
+
+def warmup_hits(yaml_path, cache_dir):
+    # Disk cache hits per kernel of a warmup in a fresh process using cache_dir
+    env = dict(os.environ, KALPANA3D_CACHE_DIR=cache_dir)
+    start_time = time.time()
+    out = subprocess.run([sys.executable, '-c', WARMUP_SCRIPT, ROOT, yaml_path], env=env,
+                         check=True, capture_output=True, text=True).stdout
+    hits = json.loads(out.strip().splitlines()[-1])
+    print(f"Warmup took {time.time() - start_time:.2f} seconds, disk cache hits {hits}")
+    return hits
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    scene = load_scene(yaml_path)
+    params = tree_params(scene)
+    
+    # A second process loads every kernel the first one compiled from the disk cache
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = warmup_hits(yaml_path, cache_dir)
+        warm = warmup_hits(yaml_path, cache_dir)
+    assert 'render_kernel' in warm and set(warm) == set(cold)
+    assert all(hits == 0 for hits in cold.values())
+    assert all(hits > 0 for hits in warm.values())
+
+    print("Warmup...")
+    start_time = time.time()
+    warmup(tree_sdf, params)
+    print(f"Warmup took {time.time() - start_time:.2f} seconds.")
+    
+    # Cached kernels must match the closure-based tree exactly
+    rc = scene['round_cones']
+    closure_sdf = make_tree_sdf_scalar(rc['a'], rc['b'], rc['r1'], rc['r2'], rc['count'])
+    
+    width, height = 80, 60
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    img_cached = np.zeros((height, width, 3), dtype=np.float32)
+    img_closure = np.zeros((height, width, 3), dtype=np.float32)
+    scene_kernels(tree_sdf).render_kernel(width, height, ro, lookat, 60.0, params, img_cached)
+    render_kernel_scalar(width, height, ro, lookat, 60.0, closure_sdf, img_closure)
+    print(f"Max pixel difference: {np.abs(img_cached - img_closure).max():.2e}")
+    assert np.abs(img_cached - img_closure).max() < 1e-5
+    
+    min_bound = vec3(-2.0, -0.5, -2.0)
+    max_bound = vec3(2.0, 3.5, 2.0)
+    resolution = vec3(32, 32, 32)
+    vertices, faces = generate_mesh_sparse(min_bound, max_bound, resolution, tree_sdf, 0.0,
+                                           margin=0.05, sdf_params=params)
+    ref_vertices, ref_faces = generate_indexed_mesh(min_bound, max_bound, resolution, closure_sdf, 0.0)
+    print(f"{len(faces)} triangles (cached), {len(ref_faces)} triangles (closure)")
+    assert np.array_equal(faces, ref_faces)
+    assert np.abs(vertices - ref_vertices).max() < 1e-5
+
+if __name__ == "__main__":
+    main()
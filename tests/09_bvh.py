@@ -0,0 +1,64 @@
+import sys
+import os
+import numpy as np
+from numba import njit
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.tape import eval_tape, compile_scene
+from kalpana3d.accel import bvh_sdf, build_scene_bvh
+from kalpana3d.scenes import tree_sdf, tree_params, tree_bvh_sdf, tree_bvh_params
+
+def make_forest(count, seed=0):
+    # load_scene-style scene of count random round cones over a 40x40 area
+    rng = np.random.default_rng(seed)
+    a = np.zeros((count, 3), dtype=np.float32)
+    a[:, 0] = rng.uniform(-20.0, 20.0, count)
+    a[:, 1] = rng.uniform(0.0, 2.0, count)
+    a[:, 2] = rng.uniform(-20.0, 20.0, count)
+    b = a + rng.normal(0.0, 1.0, (count, 3)).astype(np.float32)
+    b[:, 1] = a[:, 1] + rng.uniform(0.5, 2.0, count)
+    r1 = rng.uniform(0.1, 0.3, count).astype(np.float32)
+    r2 = (r1 * 0.5).astype(np.float32)
+    empty = {'count': 0}
+    return {'spheres': empty, 'capsules': empty, 'boxes': empty, 'torus': empty,
+            'round_cones': {'a': a, 'b': b, 'r1': r1, 'r2': r2, 'count': count}}
+
+@njit(fastmath=True)
+def eval_points(sdf_func, points, params, out):
+    for i in range(points.shape[0]):
+        out[i] = sdf_func(points[i], params)
+
+def time_per_sample(sdf_func, points, params, out):
+    eval_points(sdf_func, points[:1], params, out)
+    start = time.perf_counter()
+    eval_points(sdf_func, points, params, out)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+def main():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-20.0, 20.0, (20000, 3)).astype(np.float32)
+    points[:, 1] = rng.uniform(-1.0, 4.0, len(points))
+    ref = np.empty(len(points))
+    out = np.empty(len(points))
+    
+    for count in (10, 300, 3000):
+        forest = make_forest(count)
+        
+        # Plain union: culling must not change the result
+        eval_points(eval_tape, points, compile_scene(forest), ref)
+        eval_points(bvh_sdf, points, build_scene_bvh(forest), out)
+        assert np.array_equal(ref, out)
+        # Also with one primitive per leaf, the deepest tree
+        eval_points(bvh_sdf, points, build_scene_bvh(forest, leaf_size=1), out)
+        assert np.array_equal(ref, out)
+        
+        # Tree scene: smooth union, blended in BVH order instead of list order
+        t_brute = time_per_sample(tree_sdf, points, tree_params(forest), ref)
+        t_bvh = time_per_sample(tree_bvh_sdf, points, tree_bvh_params(forest), out)
+        print(f"{count:5d} cones: brute {t_brute:7.2f} us, bvh {t_bvh:6.2f} us per sample "
+              f"({t_brute / t_bvh:.1f}x), max difference {np.abs(ref - out).max():.2e}")
+
+if __name__ == "__main__":
+    main()
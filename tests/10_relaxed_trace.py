@@ -0,0 +1,45 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params
+from kalpana3d.kernel_cache import scene_kernels
+from kalpana3d.render import TRACE_DEFAULT, TRACE_ENHANCED
+
+def trace(params, width, height, ro, lookat, settings):
+    img = np.zeros((height, width, 3), dtype=np.float32)
+    steps = np.zeros((height, width), dtype=np.int32)
+    scene_kernels(tree_baked_sdf).render_kernel(width, height, ro, lookat, 60.0, params, img, settings, steps)
+    return img, steps
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    params = tree_baked_params(load_scene(yaml_path))
+    
+    width, height = 160, 120
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    img_plain, steps_plain = trace(params, width, height, ro, lookat, TRACE_DEFAULT)
+    img_fast, steps_fast = trace(params, width, height, ro, lookat, TRACE_ENHANCED)
+    
+    print(f"Plain trace: {steps_plain.mean():.1f} steps per ray, {steps_plain.max()} max")
+    print(f"Enhanced trace: {steps_fast.mean():.1f} steps per ray, {steps_fast.max()} max")
+    assert steps_fast.mean() < steps_plain.mean()
+    assert steps_fast.max() < steps_plain.max()
+    
+    # Silhouettes may move by a pixel, shading elsewhere should barely change
+    hit_plain = img_plain.sum(axis=2) != img_plain[0, 0].sum()
+    hit_fast = img_fast.sum(axis=2) != img_fast[0, 0].sum()
+    mismatch = np.mean(hit_plain != hit_fast)
+    both = hit_plain & hit_fast
+    diff = np.abs(img_plain - img_fast)[both].mean()
+    print(f"Hit mask mismatch: {mismatch:.2%}, mean color difference on hits: {diff:.4f}")
+    assert mismatch < 0.01
+    assert diff < 0.02
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import sys
+import os
+import heapq
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params, warmup
+from kalpana3d.kernel_cache import scene_kernels
+from kalpana3d.render import tile_order, cost_map_shape, TILE_SIZE
+
+def busiest_thread(costs, threads):
+    # Load of the busiest thread when each takes the next job as it finishes
+    loads = [0] * threads
+    for c in costs:
+        heapq.heappush(loads, heapq.heappop(loads) + c)
+    return max(loads)
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    params = tree_baked_params(load_scene(yaml_path))
+    warmup(tree_baked_sdf, params)
+    kernels = scene_kernels(tree_baked_sdf)
+    
+    width, height = 200, 150
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    img_rows = np.zeros((height, width, 3), dtype=np.float32)
+    img_tiles = np.zeros((height, width, 3), dtype=np.float32)
+    steps = np.zeros((height, width), dtype=np.int32)
+    cost_map = np.zeros(cost_map_shape(width, height), dtype=np.int64)
+    tiles = tile_order(width, height)
+    
+    kernels.render_kernel(width, height, ro, lookat, 60.0, params, img_rows)
+    kernels.render_tiles(width, height, ro, lookat, 60.0, params, img_tiles, tiles, TILE_SIZE, cost_map,
+                         step_counts=steps)
+    assert np.array_equal(img_rows, img_tiles)
+    assert cost_map.sum() == steps.sum()
+    assert len(tiles) == cost_map.size
+    
+    # Work per thread, in trace steps, for 8 threads: rows split into 8 equal
+    # blocks (static prange) against shuffled tiles taken one at a time
+    threads = 8
+    row_cost = steps.sum(axis=1)
+    rows = max(block.sum() for block in np.array_split(row_cost, threads))
+    tiled = busiest_thread([cost_map[y // TILE_SIZE, x // TILE_SIZE] for x, y in tiles], threads)
+    ideal = steps.sum() / threads
+    print(f"Busiest thread vs ideal: rows {rows / ideal:.2f}x, tiles {tiled / ideal:.2f}x")
+    assert tiled < rows
+
+if __name__ == "__main__":
+    main()
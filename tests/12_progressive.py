@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params, warmup
+from kalpana3d.kernel_cache import scene_kernels
+from kalpana3d.render import render_progressive, tile_order, cost_map_shape, TILE_SIZE, TRACE_DEFAULT
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    params = tree_baked_params(load_scene(yaml_path))
+    warmup(tree_baked_sdf, params)
+    
+    width, height = 320, 240
+    ro = vec3(0.0, 1.5, 4.0)
+    lookat = vec3(0.0, 1.5, 0.0)
+    
+    start_time = time.time()
+    full = np.zeros((height, width, 3), dtype=np.float32)
+    cost_map = np.zeros(cost_map_shape(width, height), dtype=np.int64)
+    scene_kernels(tree_baked_sdf).render_tiles(width, height, ro, lookat, 60.0, params, full,
+                                               tile_order(width, height), TILE_SIZE, cost_map, TRACE_DEFAULT, None)
+    print(f"Full render: {width * height} rays in {time.time() - start_time:.3f} seconds.")
+    
+    start_time = time.time()
+    total = 0
+    scales = []
+    for img, scale, traced in render_progressive(width, height, ro, lookat, 60.0, tree_baked_sdf, params):
+        total += traced
+        scales.append(scale)
+        err = np.abs(img - full).max(axis=2)
+        print(f"  1/{scale}: {traced} rays, {np.mean(err > 0.05):.2%} pixels off by > 0.05 "
+              f"({time.time() - start_time:.3f} seconds)")
+    print(f"Progressive render: {total} rays.")
+    
+    assert scales == [8, 4, 2, 1]
+    assert total < 0.6 * width * height
+    # Interpolated pixels only differ from a full render by shading detail
+    assert np.mean(err > 0.05) < 0.02
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params, warmup
+from kalpana3d.render import render_views, render_image, turntable_cameras
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    params = tree_baked_params(load_scene(yaml_path))
+    warmup(tree_baked_sdf, params)
+    
+    width, height = 160, 120
+    views = 12
+    cameras = turntable_cameras(views, 4.0, 0.5, vec3(0.0, 1.5, 0.0))
+    with tempfile.TemporaryDirectory() as out_dir:
+        paths = [os.path.join(out_dir, f"view_{i:03d}.png") for i in range(views)]
+        
+        start_time = time.time()
+        for (ro, lookat), path in zip(cameras, paths):
+            render_image(width, height, ro, lookat, 60.0, tree_baked_sdf, path, sdf_params=params)
+        t_single = time.time() - start_time
+        single = [np.asarray(Image.open(path)) for path in paths]
+        
+        start_time = time.time()
+        # 5 views per launch: two full batches and a partial one
+        cost_maps = render_views(cameras, width, height, 60.0, tree_baked_sdf, paths, sdf_params=params,
+                                 views_per_launch=5)
+        t_views = time.time() - start_time
+        print(f"{views} views: {t_single:.2f} seconds one by one, {t_views:.2f} seconds with render_views")
+        
+        for path, ref in zip(paths, single):
+            assert np.array_equal(np.asarray(Image.open(path)), ref)
+        assert cost_maps.shape[0] == views
+        assert (cost_maps.sum(axis=(1, 2)) > 0).all()
+
+if __name__ == "__main__":
+    main()
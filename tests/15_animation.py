@@ -0,0 +1,40 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.scenes import tree_baked_sdf, tree_baked_params, warmup
+from kalpana3d.render import render_animation, turntable_cameras
+
+def main():
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    params = tree_baked_params(load_scene(yaml_path))
+    warmup(tree_baked_sdf, params)
+    
+    width, height = 200, 150
+    # A slow orbit, 2 degrees per frame
+    cameras = turntable_cameras(180, 4.0, 0.5, vec3(0.0, 1.5, 0.0))[:8]
+    
+    frames = []
+    for img, steps in render_animation(cameras, width, height, 60.0, tree_baked_sdf, sdf_params=params):
+        frames.append((img.copy(), steps.copy()))
+    # Reference: every frame traced from the camera
+    refs = []
+    for camera in cameras:
+        for img, steps in render_animation([camera], width, height, 60.0, tree_baked_sdf, sdf_params=params):
+            refs.append((img.copy(), steps.copy()))
+    
+    for i, ((img, steps), (ref, ref_steps)) in enumerate(zip(frames, refs)):
+        hit = ref.sum(axis=2) != ref[0, 0].sum()
+        off = np.mean(np.abs(img - ref).max(axis=2) > 0.05)
+        print(f"Frame {i}: {steps.mean():.2f} steps per ray ({ref_steps.mean():.2f} from the camera, "
+              f"{steps[hit].mean():.2f} vs {ref_steps[hit].mean():.2f} on hits), {off:.2%} pixels off by > 0.05")
+        assert off < 0.005
+        if i > 0:
+            assert steps[hit].mean() < 0.8 * ref_steps[hit].mean()
+
+if __name__ == "__main__":
+    main()
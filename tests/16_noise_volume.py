@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.parser import load_scene
+from kalpana3d.noise import fbm_tiled
+from kalpana3d.noise_volume import bake_noise_volume, sample_volume, volume_path, loaded_volumes
+from kalpana3d.scenes import tree_volume_sdf, tree_volume_params, tree_baked_sdf, tree_baked_params, warmup
+from kalpana3d.mesher import generate_mesh_sparse
+
+def eval_points(sdf_func, points, params):
+    return np.array([sdf_func((p[0], p[1], p[2]), params) for p in points])
+
+def main():
+    period, res = 8, 64
+    start_time = time.time()
+    volume = bake_noise_volume(3, 0, period, res)
+    print(f"Volume ready in {time.time() - start_time:.2f} seconds ({volume_path(3, 0, period, res, np.float32)})")
+    
+    # Loaded again from disk it must be identical
+    loaded_volumes.clear()
+    assert np.array_equal(bake_noise_volume(3, 0, period, res), volume)
+    
+    # fbm_tiled repeats every period, and the volume follows it
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-20.0, 20.0, (2000, 3))
+    err = 0.0
+    for p in points:
+        v = fbm_tiled(p, 3, period, 0)
+        assert abs(v - fbm_tiled(p + period, 3, period, 0)) < 1e-9
+        err = max(err, abs(v - sample_volume(volume, p, float(period))))
+    print(f"Max volume lookup error: {err:.4f}")
+    assert err < 0.05
+    
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/tree.yaml'))
+    scene = load_scene(yaml_path)
+    params = tree_volume_params(scene, period=period, res=res)
+    warmup(tree_volume_sdf, params)
+    
+    # The bark only adds up to 0.02, both trees share the branches
+    points = rng.uniform(-2.0, 3.0, (2000, 3))
+    diff = np.abs(eval_points(tree_volume_sdf, points, params) - eval_points(tree_baked_sdf, points, tree_baked_params(scene)))
+    assert diff.max() < 0.02
+    
+    min_bound = vec3(-2.0, -0.5, -2.0)
+    max_bound = vec3(2.0, 3.5, 2.0)
+    vertices, faces = generate_mesh_sparse(min_bound, max_bound, vec3(32, 32, 32), tree_volume_sdf, 0.0,
+                                           margin=0.05, sdf_params=params)
+    print(f"{len(faces)} triangles")
+    assert len(faces) > 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import numpy as np
+from numba import njit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.noise import fbm, fbm_grad, fbm_range, fbm_lipschitz, fbm_displace, displace_bounds
+from kalpana3d.noise_volume import bake_noise_volume, sample_volume, volume_bounds
+
+@njit(fastmath=True)
+def base_sdf(p):
+    s1 = sdfs.sdSphere((p[0] + 0.8, p[1], p[2]), 1.0)
+    s2 = sdfs.sdSphere((p[0] - 0.8, p[1], p[2]), 0.8)
+    return sdfs.opSmoothUnion(s1, s2, 0.5)
+
+@njit(fastmath=True)
+def raw_sdf(p):
+    # 02_organic before the bound: the sum overshoots
+    return base_sdf(p) + fbm((p[0] * 2.0, p[1] * 2.0, p[2] * 2.0), 3) * 0.1
+
+@njit(fastmath=True)
+def bounded_sdf(p):
+    return fbm_displace(base_sdf(p), p, 2.0, 3, 0.1)
+
+def max_slope(sdf_func, a, b):
+    return max(abs(sdf_func(p) - sdf_func(q)) / np.linalg.norm(p - q) for p, q in zip(a, b))
+
+def main():
+    rng = np.random.default_rng(0)
+    
+    # fbm stays within its reported range and gradient bound
+    lo, hi = fbm_range(3)
+    lipschitz = fbm_lipschitz(3)
+    slope = 0.0
+    for p in rng.uniform(-50.0, 50.0, (20000, 3)):
+        v, g = fbm_grad(p, 3)
+        assert lo <= v < hi
+        slope = max(slope, np.sqrt(g[0]**2 + g[1]**2 + g[2]**2))
+    print(f"fbm: steepest gradient {slope:.3f}, bound {lipschitz:.3f}")
+    assert slope <= lipschitz
+    
+    # So does a baked volume, between its voxels too
+    period = 8
+    volume = bake_noise_volume(3, 0, period, 64)
+    v_lo, v_hi, v_lipschitz = volume_bounds(volume, period)
+    a = rng.uniform(-20.0, 20.0, (20000, 3))
+    b = a + rng.normal(0.0, 0.01, a.shape)
+    values = np.array([sample_volume(volume, p, float(period)) for p in a])
+    assert values.min() >= v_lo and values.max() <= v_hi
+    slope = max(abs(sample_volume(volume, p, float(period)) - sample_volume(volume, q, float(period))) / np.linalg.norm(p - q)
+                for p, q in zip(a, b))
+    print(f"volume: steepest slope {slope:.3f}, bound {v_lipschitz:.3f}")
+    assert slope <= v_lipschitz * (1.0 + 1e-4)
+    
+    # The bounded field is Lipschitz-1 and keeps the surface of the plain sum
+    a = rng.uniform(-2.5, 2.5, (20000, 3))
+    b = a + rng.normal(0.0, 0.01, a.shape)
+    raw_slope = max_slope(raw_sdf, a, b)
+    bounded_slope = max_slope(bounded_sdf, a, b)
+    print(f"Displaced spheres: steepest slope {raw_slope:.3f} plain, {bounded_slope:.3f} bounded")
+    assert bounded_slope <= 1.0 + 1e-4
+    for p in a:
+        assert (raw_sdf(p) > 0.0) == (bounded_sdf(p) > 0.0)
+    
+    # Far enough out fbm is skipped and the base distance (plus the lowest
+    # displacement, 0 for fbm) is returned
+    far_distance = displace_bounds(0.1, lo, hi, lipschitz, 2.0)[2]
+    far = [p for p in a if base_sdf(p) >= far_distance]
+    assert all(bounded_sdf(p) == base_sdf(p) for p in far)
+    print(f"fbm skipped on {len(far) / len(a):.0%} of the samples")
+
+if __name__ == "__main__":
+    main()
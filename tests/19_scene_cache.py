@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+import yaml
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.parser import load_scene, bake_scene, scene_cache_path, SCENE_FIELDS, YAML_LOADER
+
+def write_forest(filename, count, seed=0):
+    # Scene file of count random round cones
+    rng = np.random.default_rng(seed)
+    a = rng.uniform(-20.0, 20.0, (count, 3))
+    b = a + rng.normal(0.0, 1.0, (count, 3))
+    r1 = rng.uniform(0.1, 0.3, count)
+    with open(filename, 'w') as f:
+        f.write("scene:\n  round_cones:\n")
+        for i in range(count):
+            f.write(f"    - a: [{a[i, 0]:.5f}, {a[i, 1]:.5f}, {a[i, 2]:.5f}]\n"
+                    f"      b: [{b[i, 0]:.5f}, {b[i, 1]:.5f}, {b[i, 2]:.5f}]\n"
+                    f"      r1: {r1[i]:.5f}\n      r2: {r1[i] * 0.5:.5f}\n")
+
+def reference_scene(filename):
+    # Element by element from yaml.safe_load, as load_scene used to
+    with open(filename) as f:
+        data = yaml.safe_load(f)
+    scene = {}
+    for kind, fields in SCENE_FIELDS.items():
+        items = data['scene'].get(kind, [])
+        scene[kind] = {'count': len(items)}
+        for name, key, width in fields:
+            values = np.zeros((len(items), width) if width > 1 else len(items), dtype=np.float32)
+            for i, item in enumerate(items):
+                values[i] = item[key]
+            scene[kind][name] = values
+    return scene
+
+def assert_same(scene, ref):
+    for kind, fields in SCENE_FIELDS.items():
+        assert scene[kind]['count'] == ref[kind]['count']
+        if ref[kind]['count'] > 0:
+            for name, _, _ in fields:
+                assert scene[kind][name].dtype == np.float32
+                assert np.array_equal(scene[kind][name], ref[kind][name])
+
+def main():
+    print(f"YAML loader: {YAML_LOADER.__name__}")
+    examples = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples'))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every primitive type, parsed and from the cache
+        path = os.path.join(tmp, 'test_scene.yaml')
+        shutil.copy(os.path.join(examples, 'test_scene.yaml'), path)
+        ref = reference_scene(path)
+        assert_same(load_scene(path, cache=False), ref)
+        assert_same(load_scene(path), ref)
+        assert os.path.exists(scene_cache_path(path))
+        assert_same(load_scene(path), ref)
+        scene = load_scene(path, mmap=True)
+        assert isinstance(scene['spheres']['pos'], np.memmap)
+        assert_same(scene, ref)
+        bake_scene(scene)
+
+        # An edited file is parsed again
+        with open(path, 'a') as f:
+            f.write("  torus:\n    - p: [0.0, 1.0, 0.0]\n      r_main: 1.0\n      r_tube: 0.25\n")
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        assert load_scene(path)['torus']['count'] == 1
+
+        # An empty list gives zero-length arrays, a missing one only a count
+        path = os.path.join(tmp, 'empty.yaml')
+        with open(path, 'w') as f:
+            f.write("scene:\n  spheres: []\n  boxes:\n    - p: [0.0, 0.0, 0.0]\n      b: [1.0, 1.0, 1.0]\n")
+        for scene in (load_scene(path, cache=False), load_scene(path), load_scene(path), load_scene(path, mmap=True)):
+            assert scene['spheres']['count'] == 0
+            assert scene['spheres']['pos'].shape == (0, 3) and scene['spheres']['radius'].shape == (0,)
+            assert scene['spheres']['pos'].dtype == np.float32
+            assert scene['capsules'] == {'count': 0}
+            assert scene['boxes']['count'] == 1
+
+        # A large scene
+        path = os.path.join(tmp, 'forest.yaml')
+        write_forest(path, 5000)
+        start = time.perf_counter()
+        ref = reference_scene(path)
+        t_ref = time.perf_counter() - start
+        start = time.perf_counter()
+        assert_same(load_scene(path), ref)
+        t_parse = time.perf_counter() - start
+        start = time.perf_counter()
+        assert_same(load_scene(path, mmap=True), ref)
+        t_cached = time.perf_counter() - start
+        print(f"5000 round cones: {t_ref:.2f} s safe_load, {t_parse:.2f} s bulk load, {t_cached * 1e3:.1f} ms from the cache")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+import yaml
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.parser import load_scene, stream_scene, write_scene_jsonl, SCENE_FIELDS
+
+def random_scene(counts, seed=0):
+    # YAML document with counts[kind] random primitives of each type
+    rng = np.random.default_rng(seed)
+    scene = {}
+    for kind, n in counts.items():
+        scene[kind] = [{key: rng.uniform(0.1, 2.0, width).round(4).tolist() if width > 1 else round(float(rng.uniform(0.1, 2.0)), 4)
+                        for _, key, width in SCENE_FIELDS[kind]} for _ in range(n)]
+    return {'scene': scene}
+
+def traced(fn, *args, **kwargs):
+    # fn(*args, **kwargs), its wall time and peak traced allocation
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def assert_same(scene, ref):
+    for kind, fields in SCENE_FIELDS.items():
+        assert scene[kind]['count'] == ref[kind]['count']
+        if ref[kind]['count'] > 0:
+            for name, _, _ in fields:
+                assert scene[kind][name].dtype == np.float32
+                assert np.array_equal(scene[kind][name], ref[kind][name])
+
+def main():
+    counts = {'spheres': 300, 'capsules': 200, 'boxes': 100, 'round_cones': 20000}
+    with tempfile.TemporaryDirectory() as tmp:
+        yaml_path = os.path.join(tmp, 'scene.yaml')
+        with open(yaml_path, 'w') as f:
+            yaml.dump(random_scene(counts), f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+
+        ref, t_parse, peak_parse = traced(load_scene, yaml_path, cache=False)
+        scene, t_stream, peak_stream = traced(stream_scene, yaml_path)
+        assert_same(scene, ref)
+        assert scene['torus']['count'] == 0
+        print(f"YAML: {t_parse:.2f} s, {peak_parse / 1e6:.1f} MB peak parsed; "
+              f"{t_stream:.2f} s, {peak_stream / 1e6:.1f} MB peak streamed")
+        assert peak_stream < peak_parse / 4
+
+        # Buffers grown from small chunks, or preallocated, hold the same
+        assert_same(stream_scene(yaml_path, chunk_size=100), ref)
+        assert_same(stream_scene(yaml_path, capacity=counts), ref)
+
+        # JSON lines
+        jsonl_path = os.path.join(tmp, 'scene.jsonl')
+        write_scene_jsonl(ref, jsonl_path)
+        scene, t_jsonl, peak_jsonl = traced(stream_scene, jsonl_path)
+        assert_same(scene, ref)
+        print(f"JSON lines: {t_jsonl:.2f} s, {peak_jsonl / 1e6:.1f} MB peak")
+        assert_same(load_scene(jsonl_path), ref)
+        assert_same(load_scene(jsonl_path), ref)
+
+        # An empty list gives zero-length arrays, as when parsed
+        path = os.path.join(tmp, 'empty.yaml')
+        with open(path, 'w') as f:
+            f.write("scene:\n  spheres: []\n  boxes:\n    - p: [0.0, 0.0, 0.0]\n      b: [1.0, 1.0, 1.0]\n")
+        scene = stream_scene(path)
+        assert scene['spheres']['count'] == 0
+        assert scene['spheres']['pos'].shape == (0, 3) and scene['spheres']['radius'].shape == (0,)
+        assert scene['capsules'] == {'count': 0}
+        assert_same(scene, load_scene(path, cache=False))
+
+        # Non-numeric values outside the primitive fields are skipped, as when parsed
+        path = os.path.join(tmp, 'tagged.yaml')
+        with open(path, 'w') as f:
+            f.write("tags: [a, b]\nscene:\n  spheres:\n    - p: [0.0, 1.0, 0.0]\n      r: 0.5\n      material: bark\n")
+        scene = stream_scene(path)
+        assert scene['spheres']['count'] == 1 and scene['spheres']['radius'][0] == 0.5
+        assert_same(scene, load_scene(path, cache=False))
+        assert_same(load_scene(path, cache=False, stream=True), scene)
+
+        # And so are lists of other types
+        path = os.path.join(tmp, 'lights.yaml')
+        with open(path, 'w') as f:
+            f.write("scene:\n  lights:\n    - p: [0, 1, 0]\n  spheres:\n    - p: [0.0, 1.0, 0.0]\n      r: 0.5\n")
+        scene = stream_scene(path)
+        assert scene['spheres']['count'] == 1
+        assert_same(scene, load_scene(path, cache=False))
+        jsonl_path = os.path.join(tmp, 'lights.jsonl')
+        with open(jsonl_path, 'w') as f:
+            f.write('{"type": "lights", "p": [0, 1, 0]}\n{"type": "spheres", "p": [0.0, 1.0, 0.0], "r": 0.5}\n')
+        assert_same(stream_scene(jsonl_path), scene)
+
+if __name__ == "__main__":
+    main()
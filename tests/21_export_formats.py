@@ -0,0 +1,122 @@
+import sys
+import os
+import tempfile
+import numpy as np
+from numba import njit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.sdf import sdSphere, opSmoothUnion
+from kalpana3d.mesher import generate_indexed_mesh
+from kalpana3d.export import export_obj, export_ply, export_stl, export_mesh, export_obj_stream
+from kalpana3d.mesh_file import STL_DTYPE, PLY_FACE_DTYPE
+
+@njit(fastmath=True)
+def scene_sdf(p):
+    s1 = sdSphere(p - vec3(-0.8, 0.0, 0.0), 1.0)
+    s2 = sdSphere(p - vec3(0.8, 0.0, 0.0), 0.8)
+    return opSmoothUnion(s1, s2, 0.5)
+
+def reference_obj(vertices, filename):
+    # The OBJ exporter before the block formatting, one f-string per row
+    with open(filename, 'w') as f:
+        f.write("# Kalpana3D OBJ Export\n")
+        f.write(f"# Vertices: {len(vertices)}\n")
+        for v in vertices:
+            f.write(f"v {v[0]:.6f} {v[1]:.6f} {v[2]:.6f}\n")
+        num_triangles = len(vertices) // 3
+        for i in range(num_triangles):
+            idx = i * 3 + 1
+            f.write(f"f {idx} {idx+1} {idx+2}\n")
+
+def read_ply(filename):
+    # (vertices, faces) of a binary PLY written by export_ply
+    with open(filename, 'rb') as f:
+        header = b""
+        while not header.endswith(b"end_header\n"):
+            header += f.readline()
+        counts = {}
+        for line in header.decode('ascii').splitlines():
+            if line.startswith("element"):
+                _, name, count = line.split()
+                counts[name] = int(count)
+        assert len(header) % 4 == 0
+        vertices = np.fromfile(f, dtype='<f4', count=3 * counts['vertex']).reshape(-1, 3)
+        faces = np.fromfile(f, dtype=PLY_FACE_DTYPE, count=counts['face'])
+        assert f.read() == b""
+    assert np.all(faces['n'] == 3)
+    return vertices, faces['idx']
+
+def read_stl(filename):
+    # (triangle count in the header, records) of a binary STL
+    with open(filename, 'rb') as f:
+        f.read(80)
+        count = int(np.fromfile(f, dtype='<u4', count=1)[0])
+        records = np.fromfile(f, dtype=STL_DTYPE)
+    return count, records
+
+def check_stl(filename, tris):
+    count, records = read_stl(filename)
+    assert count == len(tris) == len(records)
+    assert np.array_equal(records['v'], tris)
+    # Unit facet normals, along the winding of each triangle
+    n = records['normal']
+    assert np.allclose(np.linalg.norm(n, axis=1), 1.0, atol=1e-5)
+    cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    assert np.all(np.einsum('ij,ij->i', n, cross) >= 0.0)
+
+def main():
+    min_bound = vec3(-2.5, -2.0, -2.0)
+    max_bound = vec3(2.5, 2.0, 2.0)
+    resolution = vec3(32, 32, 32)
+    vertices, faces = generate_indexed_mesh(min_bound, max_bound, resolution, scene_sdf, 0.0)
+    soup = vertices[faces].reshape(-1, 3)
+    print(f"{len(faces)} triangles, {len(vertices)} vertices")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # OBJ: byte-identical to the per-row exporter, soup and indexed
+        path = os.path.join(tmp, 'soup.obj')
+        reference_obj(soup, os.path.join(tmp, 'ref.obj'))
+        export_obj(soup, path)
+        with open(path, 'rb') as f, open(os.path.join(tmp, 'ref.obj'), 'rb') as g:
+            assert f.read() == g.read()
+        export_obj(vertices, os.path.join(tmp, 'indexed.obj'), faces)
+        with open(os.path.join(tmp, 'indexed.obj')) as f:
+            lines = f.read().splitlines()
+        face_lines = [l for l in lines if l.startswith("f ")]
+        assert len(face_lines) == len(faces)
+        assert np.array_equal(np.array([l.split()[1:] for l in face_lines], dtype=np.int64) - 1, faces)
+
+        # Streamed OBJ: the same vertex and face lines as one export_obj, chunk by chunk
+        half = len(faces) // 2 * 3
+        chunks = [(soup[:half], np.arange(half).reshape(-1, 3)),
+                  (soup[half:], np.arange(half, len(soup)).reshape(-1, 3))]
+        export_obj_stream(chunks, os.path.join(tmp, 'stream.obj'))
+        with open(os.path.join(tmp, 'stream.obj')) as f, open(os.path.join(tmp, 'ref.obj')) as g:
+            lines, ref_lines = f.read().splitlines(), g.read().splitlines()
+        for tag in ("v ", "f "):
+            assert [l for l in lines if l.startswith(tag)] == [l for l in ref_lines if l.startswith(tag)]
+
+        # PLY: indexed and soup round trips
+        export_ply(vertices, os.path.join(tmp, 'indexed.ply'), faces)
+        v, fc = read_ply(os.path.join(tmp, 'indexed.ply'))
+        assert np.array_equal(v, vertices) and np.array_equal(fc, faces)
+        export_mesh(soup, os.path.join(tmp, 'soup.ply'))
+        v, fc = read_ply(os.path.join(tmp, 'soup.ply'))
+        assert np.array_equal(v, soup) and np.array_equal(fc, np.arange(len(soup)).reshape(-1, 3))
+
+        # STL: indexed and soup give the same records
+        export_stl(vertices, os.path.join(tmp, 'indexed.stl'), faces)
+        check_stl(os.path.join(tmp, 'indexed.stl'), vertices[faces])
+        export_mesh(soup, os.path.join(tmp, 'soup.stl'))
+        check_stl(os.path.join(tmp, 'soup.stl'), soup.reshape(-1, 3, 3))
+
+        try:
+            export_mesh(soup, os.path.join(tmp, 'mesh.xyz'))
+            assert False
+        except ValueError:
+            pass
+
+if __name__ == "__main__":
+    main()
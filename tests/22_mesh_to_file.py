@@ -0,0 +1,92 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from numba import njit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d.sdf import sdSphere, opSmoothUnion
+from kalpana3d.noise import fbm
+from kalpana3d.mesher import generate_mesh_cached, generate_mesh_to_file
+from kalpana3d.mesh_file import STL_DTYPE, PLY_FACE_DTYPE
+
+@njit(fastmath=True)
+def scene_sdf(p):
+    # Same as Phase 3
+    s1 = sdSphere(p - vec3(-0.8, 0.0, 0.0), 1.0)
+    s2 = sdSphere(p - vec3(0.8, 0.0, 0.0), 0.8)
+    d = opSmoothUnion(s1, s2, 0.5)
+    n = fbm(p * 2.0, 3)
+    d += n * 0.1
+    return d
+
+def read_ply(filename):
+    # (header vertex count, header face count, vertices, faces) of a binary PLY
+    with open(filename, 'rb') as f:
+        header = b""
+        while not header.endswith(b"end_header\n"):
+            header += f.readline()
+        counts = {}
+        for line in header.decode('ascii').splitlines():
+            if line.startswith("element"):
+                _, name, count = line.split()
+                counts[name] = int(count)
+        vertices = np.fromfile(f, dtype='<f4', count=3 * counts['vertex']).reshape(-1, 3)
+        faces = np.fromfile(f, dtype=PLY_FACE_DTYPE, count=counts['face'])
+        assert f.read() == b""
+    assert np.all(faces['n'] == 3)
+    return counts['vertex'], counts['face'], vertices, faces['idx']
+
+def read_stl(filename):
+    # (header triangle count, records) of a binary STL
+    with open(filename, 'rb') as f:
+        f.read(80)
+        count = int(np.fromfile(f, dtype='<u4', count=1)[0])
+        records = np.fromfile(f, dtype=STL_DTYPE)
+    return count, records
+
+def main():
+    min_bound = vec3(-2.5, -2.0, -2.0)
+    max_bound = vec3(2.5, 2.0, 2.0)
+    resolution = vec3(64, 64, 64)
+    # Small bands and capacity, so the file is grown several times
+    max_grid_bytes = 16 * 65 * 65 * 4
+    soup = generate_mesh_cached(min_bound, max_bound, resolution, scene_sdf, 0.0, max_grid_bytes, n_slabs=4)
+    tris = soup.reshape(-1, 3, 3)
+    print(f"In RAM: {len(tris)} triangles")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'organic.ply')
+        start_time = time.time()
+        count = generate_mesh_to_file(min_bound, max_bound, resolution, scene_sdf, 0.0, path,
+                                      max_grid_bytes, n_slabs=4, capacity=1000)
+        print(f"PLY: {count} triangles in {time.time() - start_time:.2f} seconds")
+        num_vertices, num_faces, vertices, faces = read_ply(path)
+        assert count == num_faces == len(tris) and num_vertices == 3 * count
+        assert np.array_equal(vertices, soup)
+        assert np.array_equal(faces, np.arange(3 * count).reshape(-1, 3))
+
+        path = os.path.join(tmp, 'organic.stl')
+        count = generate_mesh_to_file(min_bound, max_bound, resolution, scene_sdf, 0.0, path,
+                                      max_grid_bytes, n_slabs=4, capacity=1000)
+        num_triangles, records = read_stl(path)
+        print(f"STL: {num_triangles} triangles in the header")
+        assert count == num_triangles == len(records) == len(tris)
+        assert np.array_equal(records['v'], tris)
+        n = records['normal']
+        cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+        area = np.linalg.norm(cross, axis=1) > 1e-12
+        assert np.allclose(np.linalg.norm(n[area], axis=1), 1.0, atol=1e-5)
+        assert np.all(np.einsum('ij,ij->i', n, cross) >= 0.0)
+
+        try:
+            generate_mesh_to_file(min_bound, max_bound, resolution, scene_sdf, 0.0, os.path.join(tmp, 'organic.obj'))
+            assert False
+        except ValueError:
+            pass
+
+if __name__ == "__main__":
+    main()
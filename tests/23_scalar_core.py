@@ -0,0 +1,77 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.math_core import vec3
+from kalpana3d import math_core as mc
+from kalpana3d import math_scalar as ms
+from kalpana3d import sdf
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.noise import fbm, noise
+
+def triple(v):
+    return (float(v[0]), float(v[1]), float(v[2]))
+
+def main():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2.0, 2.0, (500, 3)).astype(np.float32)
+    a = vec3(-0.3, -0.5, 0.2)
+    b = vec3(0.4, 0.9, -0.1)
+    dims = vec3(0.6, 0.4, 0.8)
+
+    # Every primitive and operator of sdf.py on vec3 against sdf_scalar on triples.
+    # sdf.py works in float32, so they agree to float32 rounding.
+    primitives = (
+        ("sdSphere", lambda m, p, ta, tb, tdims: m.sdSphere(p, 0.7)),
+        ("sdBox", lambda m, p, ta, tb, tdims: m.sdBox(p, tdims)),
+        ("sdCylinder", lambda m, p, ta, tb, tdims: m.sdCylinder(p, 0.8, 0.5)),
+        ("sdCapsule", lambda m, p, ta, tb, tdims: m.sdCapsule(p, ta, tb, 0.3)),
+        ("sdRoundCone", lambda m, p, ta, tb, tdims: m.sdRoundCone(p, ta, tb, 0.4, 0.15)),
+        ("sdTorus", lambda m, p, ta, tb, tdims: m.sdTorus(p, 1.0, 0.25)),
+    )
+    worst = 0.0
+    for name, fn in primitives:
+        for p in points:
+            ref = fn(sdf, p, a, b, dims)
+            d = fn(sdfs, triple(p), triple(a), triple(b), triple(dims))
+            # vec3 arrays are accepted where triples are expected
+            assert abs(d - fn(sdfs, p, a, b, dims)) < 1e-6
+            err = abs(d - ref)
+            assert err < 1e-5 * max(1.0, abs(ref)), (name, p, d, ref)
+            worst = max(worst, err)
+    print(f"Primitives: max deviation {worst:.2e}")
+
+    for d1, d2 in rng.uniform(-1.0, 1.0, (100, 2)):
+        for name in ("opUnion", "opSubtraction", "opIntersection"):
+            assert getattr(sdfs, name)(d1, d2) == getattr(sdf, name)(d1, d2)
+        assert abs(sdfs.opSmoothUnion(d1, d2, 0.3) - sdf.opSmoothUnion(d1, d2, 0.3)) < 1e-12
+
+    for p in points[:100]:
+        for name in ("opTwist", "opBend", "opTaper"):
+            q = getattr(sdfs, name)(triple(p), 0.5)
+            assert np.allclose(q, getattr(sdf, name)(p, 0.5), atol=1e-5), name
+
+    # math_scalar against math_core
+    for p, q in zip(points[:100], points[100:200]):
+        tp, tq = triple(p), triple(q)
+        assert abs(ms.dot(tp, tq) - mc.dot(p, q)) < 1e-5
+        assert abs(ms.length(tp) - mc.length(p)) < 1e-5
+        assert np.allclose(ms.normalize(tp), mc.normalize(p), atol=1e-6)
+        assert np.allclose(ms.cross(tp, tq), mc.cross(p, q), atol=1e-5)
+        assert np.allclose(ms.mix(tp, tq, 0.3), mc.mix(p, q, 0.3), atol=1e-6)
+
+    # fbm on triples against vec3: the same float64 lattice arithmetic
+    worst = 0.0
+    for p in points:
+        for octaves in (1, 3, 5):
+            worst = max(worst, abs(fbm(triple(p), octaves) - fbm(p, octaves)))
+    print(f"fbm: max deviation {worst:.2e}")
+    assert worst < 1e-12
+    # A single octave of a float32 vec3 may be narrowed by fastmath
+    for p in points:
+        assert abs(noise(triple(p)) - noise(p)) < 1e-6
+
+if __name__ == "__main__":
+    main()
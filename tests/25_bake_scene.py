@@ -0,0 +1,57 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kalpana3d.parser import load_scene, bake_scene
+from kalpana3d import sdf_scalar as sdfs
+from kalpana3d.scenes import tree_sdf, tree_params, tree_baked_sdf, tree_baked_params
+
+def main():
+    examples = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples'))
+
+    # Baked terms, float32 like the rest of the scene
+    scene = bake_scene(load_scene(os.path.join(examples, 'test_scene.yaml'), cache=False))
+    caps = scene['capsules']
+    ba = caps['b'] - caps['a']
+    assert np.array_equal(caps['ba'], ba)
+    assert np.allclose(caps['inv_baba'], 1.0 / (ba * ba).sum(axis=1))
+    assert caps['ba'].dtype == np.float32 and caps['inv_baba'].dtype == np.float32
+    print(f"Baked capsules: ba {caps['ba'].tolist()}, inv_baba {caps['inv_baba'].tolist()}")
+
+    scene = bake_scene(load_scene(os.path.join(examples, 'tree.yaml'), cache=False))
+    rc = scene['round_cones']
+    ba = rc['b'] - rc['a']
+    l2 = (ba * ba).sum(axis=1)
+    rr = rc['r1'] - rc['r2']
+    assert np.allclose(rc['l2'], l2) and np.array_equal(rc['rr'], rr)
+    assert np.allclose(rc['a2'], l2 - rr * rr) and np.allclose(rc['il2'], 1.0 / l2)
+    for name in ('ba', 'l2', 'rr', 'a2', 'il2'):
+        assert rc[name].dtype == np.float32, name
+
+    # Baked and unbaked primitives agree
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1.0, 3.0, (2000, 3))
+    for p in points:
+        q = (p[0], p[1], p[2])
+        for i in range(rc['count']):
+            ref = sdfs.sdRoundCone(q, rc['a'][i], rc['b'][i], rc['r1'][i], rc['r2'][i])
+            d = sdfs.sdRoundConeBaked(q, rc['a'][i], rc['ba'][i], rc['l2'][i], rc['rr'][i],
+                                      rc['a2'][i], rc['il2'][i], rc['r1'][i], rc['r2'][i])
+            assert abs(d - ref) < 1e-5
+    for p in points[:200]:
+        for i in range(caps['count']):
+            ref = sdfs.sdCapsule(p, caps['a'][i], caps['b'][i], caps['radius'][i])
+            d = sdfs.sdCapsuleBaked(p, caps['a'][i], caps['ba'][i], caps['inv_baba'][i], caps['radius'][i])
+            assert abs(d - ref) < 1e-5
+
+    # And so do the tree scenes built on them
+    plain = tree_params(scene)
+    baked = tree_baked_params(scene)
+    worst = max(abs(tree_sdf(p, plain) - tree_baked_sdf(p, baked)) for p in points.astype(np.float32))
+    print(f"Tree scene: max difference baked vs plain {worst:.2e}")
+    assert worst < 1e-5
+
+if __name__ == "__main__":
+    main()